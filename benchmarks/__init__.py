@@ -0,0 +1 @@
+"""Benchmarks for taskhuddler, run with ``python -m benchmarks``."""
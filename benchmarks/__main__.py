@@ -0,0 +1,257 @@
+"""Run the taskhuddler benchmarks.
+
+Graphs are generated by taskhuddler.synthetic and served by
+taskhuddler.fakequeue, so the whole client stack is exercised without network
+access::
+
+    python -m benchmarks --tasks 1000,10000 --repeat 3
+    python -m benchmarks --tasks 100000 --only load_sync,aggregate
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import asdict
+
+from taskhuddler.aio.graph import TaskGraph as AsyncTaskGraph
+from taskhuddler.aio.task import TaskArtifact as AsyncTaskArtifact
+from taskhuddler.aio.task import fetch_artifacts
+from taskhuddler.cassette import Cassette
+from taskhuddler.fakequeue import FakeQueue
+from taskhuddler.graph import TaskGraph
+from taskhuddler.scan import scan_tasks
+from taskhuddler.sharded import fetch_sharded
+from taskhuddler.snapshot import open_snapshot
+from taskhuddler.synthetic import generate_task_group
+from taskhuddler.utils import Range, merge_date_list
+
+AGGREGATES = [
+    "completed",
+    "current_states",
+    "earliest_start_time",
+    "latest_finished_time",
+    "total_compute_time",
+    "total_compute_wall_time",
+    "task_timings",
+    "to_dataframe",
+    "kinds",
+    "tasks_with_failures",
+]
+ARTIFACT_FETCHES = 50
+
+BENCHMARKS = list()
+
+
+def benchmark(name):
+    """Register a benchmark function taking the benchmark context."""
+
+    def register(func):
+        BENCHMARKS.append((name, func))
+        return func
+
+    return register
+
+
+@contextmanager
+def environ(**values):
+    """Temporarily set or unset environment variables."""
+    previous = {key: os.environ.get(key) for key in values}
+    for key, value in values.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+@benchmark("load_sync")
+def load_sync(context):
+    """Load a graph from the queue with the sync TaskGraph."""
+    with environ(TC_CACHE_DIR=None):
+        TaskGraph(context["groupid"])
+
+
+@benchmark("load_aio")
+def load_aio(context):
+    """Load a graph from the queue with the aio TaskGraph."""
+
+    async def load():
+        await AsyncTaskGraph(context["groupid"])
+
+    with environ(TC_CACHE_DIR=None):
+        asyncio.run(load())
+
+
+@benchmark("load_sharded")
+def load_sharded(context):
+    """Load a graph from the queue, summarising pages in worker processes."""
+    fetch_sharded(context["groupid"]).summary()
+
+
+@benchmark("load_replay")
+def load_replay(context):
+    """Load a graph from a recorded cassette with the sync TaskGraph."""
+    with Cassette(context["cassette"], mode="replay"), environ(TC_CACHE_DIR=None):
+        TaskGraph(context["groupid"])
+
+
+@benchmark("cache_write")
+def cache_write(context):
+    """Write the graph to the file cache."""
+    graph = context["graph"]
+    graph.cache_file = os.path.join(context["cache_dir"], "{}.json".format(graph.groupid))
+    try:
+        graph._write_file_cache()
+    finally:
+        graph.cache_file = None
+
+
+@benchmark("cache_read")
+def cache_read(context):
+    """Load the graph from the file cache."""
+    with environ(TC_CACHE_DIR=context["cache_dir"]):
+        TaskGraph(context["groupid"])
+
+
+@benchmark("snapshot_read")
+def snapshot_read(context):
+    """Open a snapshot of the graph and compute its summary."""
+    with open_snapshot(context["snapshot"]) as graph:
+        graph.current_states()
+        graph.total_compute_time()
+
+
+@benchmark("aggregate")
+def aggregates(context):
+    """Time each TaskGraph aggregate."""
+    graph = context["graph"]
+    results = dict()
+    for name in AGGREGATES:
+        start = time.perf_counter()
+        value = getattr(graph, name)
+        if callable(value):
+            value = value()
+        if hasattr(value, "__next__"):
+            list(value)
+        results[name] = time.perf_counter() - start
+    return results
+
+
+@benchmark("simulate")
+def simulate(context):
+    """Simulate the graph with a limited worker pool per worker type."""
+    context["graph"].simulate(default_workers=100)
+
+
+@benchmark("merge_date_list")
+def merge_dates(context):
+    """Merge the run intervals of every completed task."""
+    graph = context["graph"]
+    merge_date_list([Range(start=task.status.started, end=task.status.resolved) for task in graph.tasklist if task.status.completed])
+
+
+@benchmark("artifact_fetch_sync")
+def artifact_fetch_sync(context):
+    """Fetch artifacts one at a time."""
+    for task in context["graph"].tasklist[:ARTIFACT_FETCHES]:
+        task.artifact_store = list()
+        task.artifacts()[0].fetch()
+
+
+@benchmark("artifact_fetch_aio")
+def artifact_fetch_aio(context):
+    """Fetch artifacts concurrently."""
+
+    async def fetch():
+        artifacts = [AsyncTaskArtifact(**asdict(task.artifacts()[0])) for task in context["graph"].tasklist[:ARTIFACT_FETCHES]]
+        async for _ in fetch_artifacts(artifacts):
+            pass
+
+    asyncio.run(fetch())
+
+
+def artifact_name(data):
+    """Extract the name of a synthetic JSON artifact."""
+    return data["name"]
+
+
+@benchmark("artifact_scan")
+def artifact_scan(context):
+    """Download JSON artifacts concurrently and decode them in a process pool."""
+    scan_tasks(context["graph"].tasklist[:ARTIFACT_FETCHES], ".json", artifact_name)
+
+
+def run_benchmark(func, context, repeat):
+    """Run func repeat times, returning timings keyed by benchmark part."""
+    timings = dict()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parts = func(context)
+        elapsed = time.perf_counter() - start
+        for name, value in (parts or {"": elapsed}).items():
+            timings.setdefault(name, list()).append(value)
+    return timings
+
+
+def main(argv=None):
+    """Run the benchmarks and print a result per line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", default="1000,10000", help="comma separated task counts")
+    parser.add_argument("--runs-per-task", type=int, default=1)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--artifacts", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.0, help="queue latency per request, in seconds")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", help="comma separated benchmark names")
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    args = parser.parse_args(argv)
+
+    only = set(args.only.split(",")) if args.only else None
+    for task_count in [int(count) for count in args.tasks.split(",")]:
+        group = generate_task_group(task_count=task_count, runs_per_task=args.runs_per_task, fanout=args.fanout, artifact_count=args.artifacts)
+        cache_dir = tempfile.mkdtemp()
+        try:
+            fake = FakeQueue(latency=args.latency).add_group(group["groupid"], group["tasks"], artifacts=group["artifacts"])
+            with fake.serve_in_thread() as root_url, environ(TASKCLUSTER_ROOT_URL=root_url, TC_CACHE_DIR=None):
+                context = {
+                    "groupid": group["groupid"],
+                    "graph": TaskGraph.from_data(group["groupid"], group["tasks"]),
+                    "cache_dir": cache_dir,
+                    "cassette": os.path.join(cache_dir, "cassette.zip"),
+                    "snapshot": os.path.join(cache_dir, "graph.snapshot"),
+                }
+                cache_write(context)
+                context["graph"].to_snapshot(context["snapshot"])
+                with Cassette(context["cassette"], mode="record"):
+                    load_sync(context)
+                for name, func in BENCHMARKS:
+                    if only and name not in only:
+                        continue
+                    for part, timings in run_benchmark(func, context, args.repeat).items():
+                        label = "{}:{}".format(name, part) if part else name
+                        result = {"tasks": task_count, "benchmark": label, "min": min(timings), "median": statistics.median(timings)}
+                        if args.json:
+                            print(json.dumps(result))
+                        else:
+                            print("{tasks:>8} {benchmark:<40} min {min:10.4f}s  median {median:10.4f}s".format(**result))
+                        sys.stdout.flush()
+        finally:
+            shutil.rmtree(cache_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Import time benchmark.
+
+Each module is imported in a fresh interpreter and the time of an empty
+interpreter start is subtracted. With --max-ms, exits non-zero when any
+import is slower, so it can guard against import time regressions::
+
+    python -m benchmarks.imports --repeat 10 --max-ms 50
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+MODULES = ["taskhuddler", "taskhuddler.aio", "taskhuddler.cli", "taskhuddler.graph", "taskhuddler.aio.graph"]
+
+
+def time_command(code, repeat):
+    """Return the median wall time of running code in a new interpreter, in ms."""
+    timings = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main(argv=None):
+    """Print the import time of each module."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, help="fail if any import takes longer")
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    args = parser.parse_args(argv)
+
+    baseline = time_command("pass", args.repeat)
+    failed = False
+    for module in args.modules:
+        elapsed = max(time_command("import {}".format(module), args.repeat) - baseline, 0.0)
+        print("{:<30} {:8.1f}ms".format(module, elapsed))
+        if args.max_ms is not None and elapsed > args.max_ms:
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -27,7 +27,8 @@ setup(
     zip_safe=False,
     license="MPL 2.0",
     install_requires=["aiofiles", "aiohttp", "async-timeout<4.0", "asyncinit", "certifi", "idna-ssl", "python-dateutil", "taskcluster",],
-    extras_require={"pandas": ["pandas"]},
+    entry_points={"console_scripts": ["taskhuddler = taskhuddler.cli:main"]},
+    extras_require={"pandas": ["pandas"], "arrow": ["pandas", "pyarrow"]},
     classifiers=[
         "Intended Audience :: Developers",
         "Natural Language :: English",
@@ -1,6 +1,31 @@
-"""Taskhuddler."""
+"""Taskhuddler.
 
-from .graph import TaskGraph
-from .task import Task, TaskArtifact, TaskDefinition, TaskStatus
+The classes below are imported on first use, so that ``import taskhuddler``
+doesn't pull in taskcluster and its dependencies.
+"""
+
+import importlib
 
 __all__ = ["TaskGraph", "Task", "TaskStatus", "TaskDefinition", "TaskArtifact"]
+
+_LAZY_ATTRIBUTES = {
+    "TaskGraph": ".graph",
+    "Task": ".task",
+    "TaskStatus": ".task",
+    "TaskDefinition": ".task",
+    "TaskArtifact": ".task",
+}
+
+
+def __getattr__(name):
+    """Import the module providing name on first access."""
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    """List the lazily imported names too."""
+    return sorted(set(globals()) | set(__all__))
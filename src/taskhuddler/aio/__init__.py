@@ -1,6 +1,30 @@
-"""Taskhuddler."""
+"""Taskhuddler, asyncio version.
 
-from taskhuddler.aio.graph import TaskGraph
-from taskhuddler.aio.task import Task, TaskArtifact, TaskDefinition, TaskStatus
+The classes below are imported on first use.
+"""
+
+import importlib
 
 __all__ = ["TaskGraph", "Task", "TaskDefinition", "TaskStatus", "TaskArtifact"]
+
+_LAZY_ATTRIBUTES = {
+    "TaskGraph": ".graph",
+    "Task": ".task",
+    "TaskDefinition": ".task",
+    "TaskStatus": ".task",
+    "TaskArtifact": ".task",
+}
+
+
+def __getattr__(name):
+    """Import the module providing name on first access."""
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    """List the lazily imported names too."""
+    return sorted(set(globals()) | set(__all__))
@@ -1,28 +1,49 @@
 """Helpful wrapper around release related taskcluster operations."""
 
+import asyncio
+import functools
 import json
 import logging
 import os
+from dataclasses import asdict
 
-import aiofiles
-import aiohttp
 from asyncinit import asyncinit
-from taskcluster.aio import Queue
+from taskhuddler import instrumentation
+from taskhuddler.graph import FIRST_PAGE_SIZE, MAX_PAGE_SIZE
 from taskhuddler.graph import TaskGraph as SyncTaskGraph
+from taskhuddler.graph import _cached_graph_path
 from taskhuddler.task import Task
 from taskhuddler.utils import tc_options
 
 log = logging.getLogger(__name__)
 
 
+# Number of tasks turned into Task objects per executor job.
+BUILD_BATCH_SIZE = 500
+
+
+def _build_tasks(graphdata, interner=None):
+    return [Task.from_dict(data, interner=interner) for data in graphdata]
+
+
 @asyncinit
 class TaskGraph(SyncTaskGraph):
-    """Helper class for dealing with Task Graphs, asyncio version."""
+    """Helper class for dealing with Task Graphs, asyncio version.
+
+    CPU heavy work (decoding the cache, building Task objects and the
+    aggregate methods suffixed with ``_async``) runs in ``executor``, so the
+    event loop stays responsive while large graphs are loaded. ``None``
+    means the loop's default executor. Graphs loaded with an interner need a
+    thread executor, as values interned in another process aren't shared.
+    """
 
-    async def __init__(self, groupid, limit=None):
+    executor = None
+
+    async def __init__(self, groupid, limit=None, interner=None):
         """init."""
         self.groupid = groupid
         self.tasklist = None
+        self.interner = interner
 
         if "TC_CACHE_DIR" in os.environ:
             self.cache_file = os.path.join(os.environ.get("TC_CACHE_DIR"), "{}.json".format(self.groupid))
@@ -31,11 +52,26 @@ class TaskGraph(SyncTaskGraph):
 
         await self.fetch_tasks(limit=limit)
 
+    @classmethod
+    async def from_data(cls, groupid, graphdata, interner=None):
+        """Create a TaskGraph from already fetched task data.
+
+        Awaitable version of the synchronous from_data, building the Task
+        objects in the executor.
+        """
+        # Bypass the asynchronous constructor, which fetches the tasks.
+        graph = object.__new__(cls)
+        graph.groupid = groupid
+        graph.cache_file = None
+        graph.interner = interner
+        graph.tasklist = await graph._build_tasks(graphdata)
+        return graph
+
     async def _fetch_tasks_from_queue(self, limit=None):
         query = {}
         if limit:
             # Default taskcluster-client api asks for 1000 tasks.
-            query["limit"] = min(limit, 1000)
+            query["limit"] = min(limit, MAX_PAGE_SIZE)
 
         def under_limit(length):
             """Indicate if we've returned enough tasks."""
@@ -43,31 +79,42 @@ class TaskGraph(SyncTaskGraph):
                 return True
             return False
 
+        import aiohttp
+        from taskcluster.aio import Queue
+
         async with aiohttp.ClientSession() as session:
             queue = Queue(options=tc_options(), session=session)
-            outcome = await queue.listTaskGroup(self.groupid, query=query)
+            outcome = await instrumentation.call_api_async("listTaskGroup", queue.listTaskGroup, self.groupid, query=query)
             tasks = outcome.get("tasks", [])
 
             while under_limit(len(tasks)) and outcome.get("continuationToken"):
                 query.update({"continuationToken": outcome.get("continuationToken")})
-                outcome = await queue.listTaskGroup(self.groupid, query=query)
+                if limit:
+                    # Only ask for the tasks still missing.
+                    query["limit"] = min(limit - len(tasks), MAX_PAGE_SIZE)
+                outcome = await instrumentation.call_api_async("listTaskGroup", queue.listTaskGroup, self.groupid, query=query)
                 tasks.extend(outcome.get("tasks", []))
+                # Let other coroutines run between pages.
+                await asyncio.sleep(0)
 
         if limit:
             tasks = tasks[:limit]
 
         return tasks
 
-    async def fetch_tasks(self, limit=None):
+    async def fetch_tasks(self, limit=None, refresh=False):
         """Return tasks with the associated group ID.
 
         Handles continuationToken without the user being aware of it.
 
         Enforces the limit parameter as a limit of the total number of tasks
         to be returned.
+
+        refresh fetches the tasks from the queue even if the group is in the
+        TC_CACHE_DIR cache, and updates the cache.
         """
         graphdata = list()
-        if self.cache_file:
+        if self.cache_file and not refresh:
             graphdata = await self._read_file_cache()
 
         refreshed = False
@@ -75,23 +122,165 @@ class TaskGraph(SyncTaskGraph):
             graphdata = await self._fetch_tasks_from_queue(limit)
             refreshed = True
 
-        self.tasklist = [Task.from_dict(data) for data in graphdata]
+        self.tasklist = await self._build_tasks(graphdata)
 
         if self.cache_file and refreshed:
             await self._write_file_cache()
 
+    async def _run_in_executor(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def _build_tasks(self, graphdata):
+        """Build Task objects in batches, off the event loop."""
+        tasklist = list()
+        with instrumentation.timed("build_tasks", tasks=len(graphdata)):
+            for start in range(0, len(graphdata), BUILD_BATCH_SIZE):
+                end = start + BUILD_BATCH_SIZE
+                tasklist.extend(await self._run_in_executor(_build_tasks, graphdata[start:end], self.interner))
+        return tasklist
+
     async def _write_file_cache(self):
-        async with aiofiles.open(self.cache_file, mode="w") as f:
-            await f.write(json.dumps(self.tasks(raw=True)))
+        import aiofiles
+
+        with instrumentation.timed("cache_write", path=self.cache_file) as event:
+            data = await self._run_in_executor(lambda: json.dumps([asdict(t) for t in self.tasklist]))
+            async with aiofiles.open(self.cache_file, mode="w") as f:
+                await f.write(data)
+            event["bytes"] = len(data)
 
     async def _read_file_cache(self):
+        import aiofiles
+
         tasks = list()
         if not os.path.isfile(self.cache_file):
             return tasks
         try:
-            async with aiofiles.open(self.cache_file, mode="r") as f:
-                tasks = json.loads(await f.read())
+            with instrumentation.timed("cache_read", path=self.cache_file) as event:
+                async with aiofiles.open(self.cache_file, mode="r") as f:
+                    data = await f.read()
+                event["bytes"] = len(data)
+                tasks = await self._run_in_executor(json.loads, data)
         except Exception as e:
             log.debug(e)
 
         return tasks
+
+    async def summary_async(self):
+        """Awaitable version of ``summary``."""
+        return await self._run_in_executor(self.summary)
+
+    async def concurrency_timelines_async(self, key=None):
+        """Awaitable version of ``concurrency_timelines``."""
+        return await self._run_in_executor(self.concurrency_timelines, key)
+
+    async def failure_report_async(self):
+        """Awaitable version of ``failure_report``."""
+        return await self._run_in_executor(self.failure_report)
+
+    async def completed_async(self):
+        """Awaitable version of ``completed``."""
+        return await self._run_in_executor(lambda: self.completed)
+
+    async def current_states_async(self):
+        """Awaitable version of ``current_states``."""
+        return await self._run_in_executor(self.current_states)
+
+    async def earliest_start_time_async(self):
+        """Awaitable version of ``earliest_start_time``."""
+        return await self._run_in_executor(lambda: self.earliest_start_time)
+
+    async def latest_finished_time_async(self):
+        """Awaitable version of ``latest_finished_time``."""
+        return await self._run_in_executor(lambda: self.latest_finished_time)
+
+    async def total_compute_time_async(self):
+        """Awaitable version of ``total_compute_time``."""
+        return await self._run_in_executor(self.total_compute_time)
+
+    async def total_wall_time_async(self):
+        """Awaitable version of ``total_wall_time``."""
+        return await self._run_in_executor(self.total_wall_time)
+
+    async def total_compute_wall_time_async(self):
+        """Awaitable version of ``total_compute_wall_time``."""
+        return await self._run_in_executor(self.total_compute_wall_time)
+
+    async def task_timings_async(self):
+        """Awaitable version of ``task_timings``, returning a list."""
+        return await self._run_in_executor(lambda: list(self.task_timings()))
+
+    async def to_dataframe_async(self):
+        """Awaitable version of ``to_dataframe``."""
+        return await self._run_in_executor(self.to_dataframe)
+
+    async def kinds_async(self):
+        """Awaitable version of ``kinds``."""
+        return await self._run_in_executor(lambda: self.kinds)
+
+    async def tasks_with_failures_async(self):
+        """Awaitable version of ``tasks_with_failures``, returning a list."""
+        return await self._run_in_executor(lambda: list(self.tasks_with_failures()))
+
+
+async def _cached_graph_data(groupid):
+    """Read the group from the TC_CACHE_DIR cache, decoding it in TaskGraph.executor."""
+    import aiofiles
+
+    path = _cached_graph_path(groupid)
+    if path is None:
+        return None
+    try:
+        async with aiofiles.open(path, mode="r") as f:
+            data = await f.read()
+        return await asyncio.get_running_loop().run_in_executor(TaskGraph.executor, json.loads, data)
+    except ValueError as e:
+        log.debug(e)
+        return None
+
+
+async def iter_task_group(groupid, first_page_size=FIRST_PAGE_SIZE, queue=None):
+    """Yield the tasks of a group in listTaskGroup format, a page at a time.
+
+    Asyncio version of taskhuddler.graph.iter_task_group. queue is a
+    taskcluster.aio Queue, see taskhuddler.aio.task.queue_session.
+    """
+    from taskhuddler.aio.task import queue_session
+
+    cached = await _cached_graph_data(groupid)
+    if cached:
+        for data in cached:
+            yield data
+        return
+
+    async with queue_session(queue) as queue:
+        query = {"limit": min(first_page_size, MAX_PAGE_SIZE)}
+        while True:
+            outcome = await instrumentation.call_api_async("listTaskGroup", queue.listTaskGroup, groupid, query=dict(query))
+            for data in outcome.get("tasks", []):
+                yield data
+            if not outcome.get("continuationToken"):
+                return
+            query = {"continuationToken": outcome["continuationToken"], "limit": min(query["limit"] * 2, MAX_PAGE_SIZE)}
+
+
+async def find_tasks(groupid, predicate, limit=None, first_page_size=FIRST_PAGE_SIZE, queue=None):
+    """Return the Tasks of a group for which predicate is true.
+
+    Asyncio version of taskhuddler.graph.find_tasks.
+    """
+    found = list()
+    if limit is not None and limit <= 0:
+        return found
+    pages = iter_task_group(groupid, first_page_size=first_page_size, queue=queue)
+    try:
+        async for data in pages:
+            task = Task.from_dict(data)
+            if predicate(task):
+                found.append(task)
+                if limit is not None and len(found) >= limit:
+                    break
+    finally:
+        # Close the queue session now rather than when the generator is collected.
+        await pages.aclose()
+    return found
@@ -0,0 +1,91 @@
+"""A process-wide cache of TaskGraph instances, asyncio version.
+
+See taskhuddler.graphcache. Concurrent misses for the same key, on the same
+event loop, await a single load::
+
+    from taskhuddler.aio.graphcache import get_graph
+
+    graph = await get_graph(groupid)
+"""
+
+import functools
+import logging
+import threading
+
+from taskhuddler.aio.graph import TaskGraph
+from taskhuddler.aio.task import SingleFlight
+from taskhuddler.graphcache import GraphCache
+
+log = logging.getLogger(__name__)
+
+
+class AsyncGraphCache(GraphCache):
+    """Least recently used taskhuddler.aio TaskGraph instances, within a memory budget.
+
+    Takes the same arguments as taskhuddler.graphcache.GraphCache. Graphs
+    are sized in their executor.
+    """
+
+    graph_class = TaskGraph
+
+    def __init__(self, *args, **kwargs):
+        """init."""
+        super().__init__(*args, **kwargs)
+        self._loads = SingleFlight()
+
+    async def get(self, groupid, limit=None):
+        """Return the TaskGraph of a group, loading it on a miss."""
+        key = self.key(groupid, limit)
+        graph, entry = self._lookup(key)
+        if graph is not None:
+            return graph
+        return await self._loads.do(key, functools.partial(self._load, key, entry))
+
+    async def _load(self, key, stale):
+        # Another caller may have loaded the graph since we looked.
+        graph, entry = self._lookup(key, stale)
+        if graph is not None:
+            return graph
+        groupid, limit, _ = key
+        if entry is None:
+            self._count("misses")
+            graph = await self.graph_class(groupid, limit=limit, interner=self.interner)
+        else:
+            self._count("refreshes")
+            try:
+                # A new instance, as callers may be using the cached one.
+                # copy.copy would call the asynchronous constructor.
+                graph = object.__new__(type(entry.graph))
+                graph.__dict__.update(vars(entry.graph))
+                await graph.fetch_tasks(limit=limit, refresh=True)
+            except Exception as e:
+                self._count("refresh_errors")
+                log.warning("Unable to refresh %s, keeping the cached graph: %s", groupid, e)
+                return entry.graph
+        self._insert(key, await graph._run_in_executor(self._entry, graph))
+        return graph
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache():
+    """Return the process-wide AsyncGraphCache, creating it with the default settings."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = AsyncGraphCache()
+        return _default_cache
+
+
+def set_default_cache(cache):
+    """Replace the process-wide AsyncGraphCache, or reset it to the default settings when None."""
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = cache
+
+
+async def get_graph(groupid, limit=None):
+    """Return the TaskGraph of a group from the process-wide AsyncGraphCache."""
+    return await default_cache().get(groupid, limit=limit)
@@ -1,9 +1,13 @@
 """Helpful wrapper around release related taskcluster operations."""
 
+import asyncio
+import functools
+import json
 import logging
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
 
-from taskcluster.aio import Queue
+from taskhuddler import instrumentation
 from taskhuddler.task import Task as SyncTask
 from taskhuddler.task import TaskArtifact as SyncTaskArtifact
 from taskhuddler.task import TaskDefinition as SyncTaskDefinition
@@ -12,6 +16,90 @@ from taskhuddler.utils import tc_options
 
 log = logging.getLogger(__name__)
 
+# Concurrent artifact fetches per fetch_artifacts call.
+DEFAULT_CONCURRENCY = 8
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class SingleFlight(object):
+    """Run one coroutine per key at a time on each event loop, sharing its outcome with concurrent callers.
+
+    The shared call is shielded, so a caller being cancelled doesn't cancel
+    it for the others.
+    """
+
+    def __init__(self):
+        """init."""
+        self._calls = dict()
+
+    def _done(self, key, call):
+        self._calls.pop(key, None)
+        if not call.cancelled():
+            # Mark the exception retrieved, in case every caller went away.
+            call.exception()
+
+    async def do(self, key, func):
+        """Return await func(), or wait for the call already running for key."""
+        key = (asyncio.get_running_loop(), key)
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = asyncio.ensure_future(func())
+            call.add_done_callback(functools.partial(self._done, key))
+        return await asyncio.shield(call)
+
+
+_artifact_listings = SingleFlight()
+
+
+@asynccontextmanager
+async def queue_session(queue=None, options=None):
+    """Yield queue, or a new Queue whose client session is closed on exit.
+
+    Sharing one Queue, and so one aiohttp session, across calls reuses its
+    connections. options default to tc_options().
+    """
+    if queue is not None:
+        yield queue
+        return
+    import aiohttp
+    from taskcluster.aio import Queue
+
+    async with aiohttp.ClientSession() as session:
+        yield Queue(options or tc_options(), session=session)
+
+
+@asynccontextmanager
+async def _client_session(queue):
+    if queue.session is not None:
+        yield queue.session
+        return
+    import aiohttp
+
+    async with aiohttp.ClientSession() as session:
+        yield session
+
+
+async def fetch_artifacts(artifacts, queue=None, concurrency=DEFAULT_CONCURRENCY):
+    """Fetch artifacts concurrently, yielding (artifact, content) as each completes.
+
+    At most concurrency fetches are in flight, all sharing one session.
+    Fetches still pending when the caller stops iterating are cancelled.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(artifact):
+        async with semaphore:
+            return artifact, await artifact.fetch(queue=queue)
+
+    async with queue_session(queue) as queue:
+        futures = [asyncio.ensure_future(fetch(artifact)) for artifact in artifacts]
+        try:
+            for future in asyncio.as_completed(futures):
+                yield await future
+        finally:
+            for future in futures:
+                future.cancel()
+
 
 @dataclass
 class TaskDefinition(SyncTaskDefinition):
@@ -19,8 +107,10 @@ class TaskDefinition(SyncTaskDefinition):
 
     @classmethod
     async def from_task_id(cls, task_id):
+        from taskcluster.aio import Queue
+
         queue = Queue(tc_options())
-        taskdef = await queue.task(task_id)
+        taskdef = await instrumentation.call_api_async("task", queue.task, task_id)
         return cls(taskId=task_id, **taskdef)
 
 
@@ -30,8 +120,10 @@ class TaskStatus(SyncTaskStatus):
 
     @classmethod
     async def from_task_id(cls, task_id):
+        from taskcluster.aio import Queue
+
         queue = Queue(tc_options())
-        status = await queue.status(task_id)
+        status = await instrumentation.call_api_async("status", queue.status, task_id)
         return cls(**status["status"])
 
 
@@ -39,23 +131,163 @@ class TaskStatus(SyncTaskStatus):
 class TaskArtifact(SyncTaskArtifact):
     """Understanding task artifacts."""
 
+    async def _get(self, queue, *args):
+        """Download the artifact, reading its whole body while the connection is open.
+
+        args are the arguments of the getArtifact or getLatestArtifact call
+        this stands for, so a Cassette records it under the same key.
+        """
+        import aiohttp
+        from taskhuddler.cassette import AsyncRecordedResponse
+
+        # Server errors and dropped connections are retried like Queue calls.
+        retries = queue.options.get("maxRetries", 5)
+        async with _client_session(queue) as session:
+            for attempt in range(retries + 1):
+                if attempt:
+                    await asyncio.sleep(attempt * attempt / 10.0)
+                try:
+                    async with session.get(self.url(queue)) as response:
+                        if response.status >= 500 and attempt < retries:
+                            continue
+                        response.raise_for_status()
+                        content = await response.read()
+                        return {"response": AsyncRecordedResponse(content, response.headers.get("Content-Type"), response.status)}
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    if attempt == retries:
+                        raise
+
+    async def _fetch_outcome(self, queue):
+        async with queue_session(queue) as queue:
+            get = functools.partial(self._get, queue)
+            if self.run_id is not None:
+                return await instrumentation.call_api_async("getArtifact", get, self.task_id, self.run_id, self.name)
+            return await instrumentation.call_api_async("getLatestArtifact", get, self.task_id, self.name)
+
     async def fetch(self, queue=None):
-        self.queue = queue
-        if self.queue is None:
-            self.queue = Queue(tc_options())
-        if self.run_id:
-            return await self.queue.getArtifact(self.task_id, self.run_id, self.name)
-        else:
-            return await self.queue.getLatestArtifact(self.task_id, self.name)
+        """Return the artifact's content, through a new managed session when no queue is given.
+
+        JSON artifacts are decoded. Others are returned as {"response":
+        response}, whose read(), text() and json() return the body already
+        downloaded.
+        """
+        outcome = await self._fetch_outcome(queue)
+        response = outcome.get("response")
+        if response is None or not (response.headers.get("Content-Type") or "").startswith("application/json"):
+            return outcome
+        try:
+            return await response.json()
+        except ValueError:
+            return outcome
+
+    async def read(self, queue=None):
+        """Return the artifact's content as bytes, as fetch downloads it."""
+        outcome = await self._fetch_outcome(queue)
+        if "response" not in outcome:
+            # Recorded as decoded JSON by an earlier version of the cassette.
+            return json.dumps(outcome).encode("utf-8")
+        return await outcome["response"].read()
+
+    def url(self, queue):
+        """Return the URL of the artifact, signed if queue has credentials."""
+        credentials = queue.options.get("credentials") or {}
+        build = queue.buildSignedUrl if credentials.get("clientId") and credentials.get("accessToken") else queue.buildUrl
+        if self.run_id is not None:
+            return build("getArtifact", self.task_id, self.run_id, self.name)
+        return build("getLatestArtifact", self.task_id, self.name)
+
+    async def stream(self, queue=None, chunk_size=STREAM_CHUNK_SIZE):
+        """Yield the artifact's content in chunks of bytes, without holding all of it.
+
+        The download isn't made through taskhuddler.instrumentation.call_api_async,
+        so it is neither recorded nor replayed by a Cassette. Use fetch or
+        read for that.
+        """
+        async with queue_session(queue) as queue, _client_session(queue) as session:
+            with instrumentation.timed("api_call", method="streamArtifact") as event:
+                size = 0
+                async with session.get(self.url(queue)) as response:
+                    response.raise_for_status()
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        size += len(chunk)
+                        yield chunk
+                event["bytes"] = size
+
+    async def save(self, destination, queue=None, chunk_size=STREAM_CHUNK_SIZE):
+        """Stream the artifact to the destination file."""
+        import aiofiles
+
+        async with aiofiles.open(destination, mode="wb") as f:
+            async for chunk in self.stream(queue=queue, chunk_size=chunk_size):
+                await f.write(chunk)
 
 
 @dataclass(repr=False)
 class Task(SyncTask):
     """Helper class for dealing with Tasks, asyncio version."""
 
+    @classmethod
+    def from_sync(cls, task):
+        """Return an asyncio Task sharing the data of a synchronous one."""
+        return cls(task.task, task.status, artifact_store=task.artifact_store)
+
     @classmethod
     async def from_task_id(cls, task_id):
+        from taskcluster.aio import Queue
+
         queue = Queue(tc_options())
-        status = await queue.status(task_id)
-        taskdef = await queue.task(task_id)
+        status = await instrumentation.call_api_async("status", queue.status, task_id)
+        taskdef = await instrumentation.call_api_async("task", queue.task, task_id)
         return cls(TaskDefinition.from_dict(task_id, taskdef), TaskStatus.from_dict(status["status"]))
+
+    async def _list_artifacts(self, run_id, queue):
+        if self.artifact_store:
+            return self.artifact_store
+        artifacts = list()
+        query = {}
+        async with queue_session(queue) as queue:
+            while True:
+                outcome = await instrumentation.call_api_async("listArtifacts", queue.listArtifacts, self.task_id, run_id, query=dict(query))
+                artifacts.extend(TaskArtifact.from_dict(a, task_id=self.task_id, run_id=run_id) for a in outcome["artifacts"])
+                if not outcome.get("continuationToken"):
+                    break
+                query["continuationToken"] = outcome["continuationToken"]
+        self.artifact_store = artifacts
+        return artifacts
+
+    async def artifacts(self, queue=None):
+        """List the artifacts of the latest run, following continuation tokens.
+
+        Concurrent calls for the same task and run through the same client
+        session share a single listing, made with the first caller's queue.
+        """
+        if not self.status:
+            return list()
+        if not self.artifact_store:
+            run_id = self.status.latest_runid
+            # Callers without a queue share a listing made in a managed session.
+            session = id(queue.session) if queue else None
+            self.artifact_store = await _artifact_listings.do((self.task_id, run_id, session), functools.partial(self._list_artifacts, run_id, queue))
+        return self.artifact_store
+
+    async def artifacts_matching(self, pattern, queue=None):
+        """Return the artifacts whose name contains pattern."""
+        if not self.status:
+            return list()
+        return [artifact for artifact in await self.artifacts(queue=queue) if artifact.simple_name_match(pattern)]
+
+    async def fetch_artifact(self, name, destination=None, queue=None):
+        """Fetch the first artifact matching name, or stream it to destination."""
+        async with queue_session(queue) as queue:
+            for artifact in await self.artifacts_matching(name, queue=queue):
+                if destination:
+                    await artifact.save(destination, queue=queue)
+                    return
+                return await artifact.fetch(queue=queue)
+
+    async def fetch_artifacts_matching(self, pattern, queue=None, concurrency=DEFAULT_CONCURRENCY):
+        """Fetch every artifact matching pattern, yielding (artifact, content) as each completes."""
+        async with queue_session(queue) as queue:
+            artifacts = await self.artifacts_matching(pattern, queue=queue)
+            async for result in fetch_artifacts(artifacts, queue=queue, concurrency=concurrency):
+                yield result
@@ -0,0 +1,214 @@
+"""Record and replay Queue API responses.
+
+While a Cassette is active, every Queue call made through
+taskhuddler.instrumentation.call_api or call_api_async (listTaskGroup pages,
+status, task, listArtifacts, getArtifact and getLatestArtifact) is looked up
+in, or recorded to, a zip archive. Replaying an archive reproduces a run
+exactly, at disk speed and without network access:
+
+.. code-block:: python
+
+    from taskhuddler.cassette import Cassette
+
+    with Cassette("groups.zip", mode="auto"):
+        graph = TaskGraph(groupid)
+
+Each response is stored as a deflated member named after a hash of the
+method and its arguments. Artifacts that aren't JSON are stored as raw bytes
+and replayed as RecordedResponse or AsyncRecordedResponse objects in place
+of the requests or aiohttp response. Failed calls are not recorded.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import zipfile
+from collections import Counter
+
+from . import instrumentation
+
+log = logging.getLogger(__name__)
+
+MODES = ("record", "replay", "auto")
+
+
+class CassetteMiss(KeyError):
+    """A call was not found in a cassette opened in replay mode."""
+
+
+class RecordedResponse(object):
+    """Stand-in for the requests.Response of a non-JSON artifact."""
+
+    def __init__(self, content, content_type=None, status=200):
+        """init."""
+        self.content = content
+        self.status_code = status
+        self.headers = {"Content-Type": content_type} if content_type else {}
+
+    @property
+    def text(self):
+        """Return the body as a string."""
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        """Decode the body as JSON."""
+        return json.loads(self.content)
+
+
+class AsyncRecordedResponse(object):
+    """Stand-in for the aiohttp.ClientResponse of a non-JSON artifact.
+
+    taskhuddler.aio.task.TaskArtifact.fetch returns one too, holding the
+    body it read before the connection was released.
+    """
+
+    def __init__(self, content, content_type=None, status=200):
+        """init."""
+        self.content = content
+        self.status = status
+        self.headers = {"Content-Type": content_type} if content_type else {}
+
+    async def read(self):
+        """Return the body."""
+        return self.content
+
+    async def text(self):
+        """Return the body as a string."""
+        return self.content.decode("utf-8", errors="replace")
+
+    async def json(self):
+        """Decode the body as JSON."""
+        return json.loads(self.content)
+
+    def release(self):
+        """Do nothing, there is no connection to release."""
+
+
+def call_key(method, args, kwargs):
+    """Return the archive member name for a call."""
+    signature = json.dumps([method, list(args), kwargs], sort_keys=True, default=str)
+    return hashlib.sha1(signature.encode("utf-8")).hexdigest()
+
+
+class Cassette(object):
+    """A zip archive of Queue API responses.
+
+    Arguments:
+        path: the archive file.
+        mode: "record" to make every call and replace the archive,
+            "replay" to answer every call from the archive, raising
+            CassetteMiss for unknown calls, or "auto" to replay known calls
+            and record the others.
+
+    Used as a context manager, the cassette is active for every thread and
+    event loop until it exits.
+    """
+
+    def __init__(self, path, mode="auto"):
+        """init."""
+        if mode not in MODES:
+            raise ValueError("Unknown cassette mode {}, expected one of {}".format(mode, ", ".join(MODES)))
+        self.path = path
+        self.mode = mode
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        if mode == "record":
+            self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+        elif mode == "replay":
+            self._zip = zipfile.ZipFile(path, "r")
+        else:
+            self._zip = zipfile.ZipFile(path, "a", compression=zipfile.ZIP_DEFLATED)
+        self._names = set(self._zip.namelist())
+
+    def __len__(self):
+        """Return the number of recorded calls."""
+        return len([name for name in self._names if not name.endswith(".body")])
+
+    def __enter__(self):
+        """Activate the cassette."""
+        instrumentation.set_cassette(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        """Deactivate and close the cassette."""
+        instrumentation.set_cassette(None)
+        self.close()
+        return False
+
+    def close(self):
+        """Close the archive, writing its index."""
+        with self._lock:
+            self._zip.close()
+
+    def _load(self, key):
+        with self._lock:
+            if key not in self._names:
+                return None
+            entry = json.loads(self._zip.read(key))
+            if entry.get("raw"):
+                entry["content"] = self._zip.read(key + ".body")
+        return entry
+
+    def _store(self, key, method, args, kwargs, outcome, content=None):
+        entry = {"method": method, "args": list(args), "kwargs": kwargs}
+        if content is None:
+            entry["outcome"] = outcome
+        else:
+            response = outcome["response"]
+            entry.update(raw=True, content_type=response.headers.get("Content-Type"), status=getattr(response, "status_code", getattr(response, "status", 200)))
+        with self._lock:
+            if key in self._names:
+                return
+            self._zip.writestr(key, json.dumps(entry, default=str))
+            if content is not None:
+                self._zip.writestr(key + ".body", content)
+            self._names.add(key)
+
+    def _lookup(self, method, args, kwargs):
+        key = call_key(method, args, kwargs)
+        if self.mode == "record":
+            return key, None
+        entry = self._load(key)
+        if entry is None:
+            if self.mode == "replay":
+                self.stats["misses"] += 1
+                raise CassetteMiss("{}{!r} is not in {}".format(method, tuple(args), self.path))
+            return key, None
+        self.stats["hits"] += 1
+        return key, entry
+
+    def play(self, method, func, *args, **kwargs):
+        """Return the recorded outcome of a call, or make and record it."""
+        key, entry = self._lookup(method, args, kwargs)
+        if entry is not None:
+            if entry.get("raw"):
+                return {"response": RecordedResponse(entry["content"], entry["content_type"], entry["status"])}
+            return entry["outcome"]
+        outcome = func(*args, **kwargs)
+        self.stats["recorded"] += 1
+        if isinstance(outcome, dict) and "response" in outcome:
+            self._store(key, method, args, kwargs, outcome, content=outcome["response"].content)
+        else:
+            self._store(key, method, args, kwargs, outcome)
+        return outcome
+
+    async def play_async(self, method, func, *args, **kwargs):
+        """Return the recorded outcome of a call, or await and record it."""
+        key, entry = self._lookup(method, args, kwargs)
+        if entry is not None:
+            if entry.get("raw"):
+                return {"response": AsyncRecordedResponse(entry["content"], entry["content_type"], entry["status"])}
+            return entry["outcome"]
+        outcome = await func(*args, **kwargs)
+        self.stats["recorded"] += 1
+        if isinstance(outcome, dict) and "response" in outcome:
+            response = outcome["response"]
+            try:
+                content = await response.read()
+            except Exception as e:
+                raise RuntimeError("Unable to record {}{!r}, its body can't be read".format(method, tuple(args))) from e
+            self._store(key, method, args, kwargs, outcome, content=content)
+        else:
+            self._store(key, method, args, kwargs, outcome)
+        return outcome
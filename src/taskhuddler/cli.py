@@ -0,0 +1,207 @@
+"""Command line reports over task graphs.
+
+Graphs are fetched concurrently through taskhuddler.aio and cached in
+TC_CACHE_DIR, defaulting to ~/.cache/taskhuddler. Only graphs whose tasks
+have all resolved are served from the cache, others are fetched again. Heavy
+dependencies are only imported by the subcommands that need them.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")), "taskhuddler")
+
+
+async def _fetch_graphs(groupids, concurrency):
+    import asyncio
+
+    from .aio.graph import TaskGraph
+    from .graph import _cached_graph_path
+    from .graphcache import graph_resolved
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(groupid):
+        async with semaphore:
+            cached = _cached_graph_path(groupid) is not None
+            graph = await TaskGraph(groupid)
+            if cached and not graph_resolved(graph):
+                # The cached copy may be out of date.
+                await graph.fetch_tasks(refresh=True)
+            return graph
+
+    return await asyncio.gather(*[fetch(groupid) for groupid in groupids])
+
+
+def fetch_graphs(groupids, concurrency=8):
+    """Fetch the task graphs of groupids concurrently, returning them in order."""
+    import asyncio
+
+    return asyncio.run(_fetch_graphs(groupids, concurrency))
+
+
+def states_report(graphs, args):
+    """Count current task states per graph."""
+    rows = list()
+    for graph in graphs:
+        for state, count in sorted(graph.current_states().items()):
+            rows.append({"groupid": graph.groupid, "state": state, "count": count})
+    return rows
+
+
+def timings_report(graphs, args):
+    """Queue wait and run time percentiles, across all graphs."""
+    from .timings import TimingAnalyzer
+
+    analyzer = TimingAnalyzer(group_by=args.group_by.split(","))
+    for graph in graphs:
+        analyzer.add_graph(graph)
+    return analyzer.rows()
+
+
+def failures_report(graphs, args):
+    """List every unsuccessful run."""
+    from dataclasses import asdict
+
+    rows = list()
+    for graph in graphs:
+        for failure in graph.failure_report().failures:
+            rows.append(dict(groupid=graph.groupid, **asdict(failure)))
+    return rows
+
+
+def critical_path_report(graphs, args):
+    """List the tasks on each graph's observed critical path."""
+    rows = list()
+    for graph in graphs:
+        for position, task in enumerate(graph.critical_path()):
+            started, resolved = task.status.started, task.status.resolved
+            rows.append(
+                {
+                    "groupid": graph.groupid,
+                    "position": position,
+                    "task_id": task.taskId,
+                    "label": task.label,
+                    "started": started.isoformat() if started else None,
+                    "resolved": resolved.isoformat() if resolved else None,
+                    "duration": (resolved - started).total_seconds() if started and resolved else None,
+                }
+            )
+    return rows
+
+
+async def _fetch_artifacts(tasks, pattern, output_dir, concurrency):
+    import asyncio
+
+    from .aio.task import Task, fetch_artifacts, queue_session
+
+    semaphore = asyncio.Semaphore(concurrency)
+    groupids = dict()
+    rows = list()
+
+    async with queue_session() as queue:
+
+        async def list_matching(groupid, task):
+            async with semaphore:
+                artifacts = await Task.from_sync(task).artifacts_matching(pattern, queue=queue)
+            for artifact in artifacts:
+                groupids[id(artifact)] = groupid
+            return artifacts
+
+        listings = await asyncio.gather(*[list_matching(groupid, task) for groupid, task in tasks])
+        artifacts = [artifact for listing in listings for artifact in listing]
+        async for artifact, content in fetch_artifacts(artifacts, queue=queue, concurrency=concurrency):
+            if isinstance(content, dict) and "response" in content:
+                # Not JSON, save the body as it is.
+                data = await content["response"].read()
+            else:
+                data = json.dumps(content, indent=4).encode("utf-8")
+            path = os.path.join(output_dir, artifact.task_id, artifact.name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+            rows.append({"groupid": groupids[id(artifact)], "task_id": artifact.task_id, "artifact": artifact.name, "path": path})
+    return rows
+
+
+def artifacts_report(graphs, args):
+    """Download matching artifacts from the latest run of matching tasks."""
+    import asyncio
+
+    tasks = [(graph.groupid, task) for graph in graphs for task in graph.filter_tasks_by_kind(args.kind) if task.status.runs]
+    return asyncio.run(_fetch_artifacts(tasks, args.name, args.output_dir, args.concurrency))
+
+
+REPORTS = {
+    "states": states_report,
+    "timings": timings_report,
+    "failures": failures_report,
+    "critical-path": critical_path_report,
+    "artifacts": artifacts_report,
+}
+
+
+def write_rows(rows, output_format, stream):
+    """Write report rows as JSON or CSV."""
+    if output_format == "json":
+        json.dump(rows, stream, indent=2, default=str)
+        stream.write("\n")
+        return
+    fieldnames = list()
+    for row in rows:
+        fieldnames.extend(name for name in row if name not in fieldnames)
+    writer = csv.DictWriter(stream, fieldnames=fieldnames)
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def parse_args(argv=None):
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(prog="taskhuddler", description="Reports over Taskcluster task groups.")
+    parser.add_argument("--format", choices=["json", "csv"], default="json", help="output format")
+    parser.add_argument("--cache-dir", default=os.environ.get("TC_CACHE_DIR", DEFAULT_CACHE_DIR), help="graph cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="always fetch graphs from the queue")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent requests")
+    parser.add_argument("--cassette", help="archive to record queue responses to, or replay them from")
+    parser.add_argument("--cassette-mode", choices=["record", "replay", "auto"], default="auto", help="how to use the cassette")
+    subparsers = parser.add_subparsers(dest="report", required=True)
+
+    for name, func in REPORTS.items():
+        subparser = subparsers.add_parser(name, help=func.__doc__)
+        subparser.add_argument("groupids", nargs="+", metavar="groupid")
+        if name == "timings":
+            subparser.add_argument("--group-by", default="kind,platform", help="comma separated grouping")
+        if name == "artifacts":
+            subparser.add_argument("--name", required=True, help="artifact name substring")
+            subparser.add_argument("--kind", help="task kind regex")
+            subparser.add_argument("--output-dir", default=".", help="directory to save artifacts to")
+    return parser.parse_args(argv)
+
+
+def run_report(args):
+    """Fetch the graphs and return the rows of the report."""
+    graphs = fetch_graphs(args.groupids, args.concurrency)
+    return REPORTS[args.report](graphs, args)
+
+
+def main(argv=None):
+    """Run a report."""
+    args = parse_args(argv)
+    if args.no_cache:
+        os.environ.pop("TC_CACHE_DIR", None)
+    else:
+        os.makedirs(args.cache_dir, exist_ok=True)
+        os.environ["TC_CACHE_DIR"] = args.cache_dir
+
+    if args.cassette:
+        from .cassette import Cassette
+
+        with Cassette(args.cassette, mode=args.cassette_mode):
+            rows = run_report(args)
+    else:
+        rows = run_report(args)
+    write_rows(rows, args.format, sys.stdout)
+    return 0
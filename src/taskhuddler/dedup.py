@@ -0,0 +1,246 @@
+"""Share identical parts of task definitions, in memory and on disk.
+
+Graphs for the same branch repeat the same scopes, routes, tags, metadata and
+most of the payload of their tasks. An Interner hash-conses JSON values, so
+equal values loaded into one process are the same object::
+
+    from taskhuddler.dedup import Interner
+
+    interner = Interner()
+    graphs = [TaskGraph(groupid, interner=interner) for groupid in groupids]
+
+A DedupStore keeps graphs on disk with each distinct sub-object of their
+definitions stored once, in a table shared by every graph of the store::
+
+    from taskhuddler.dedup import DedupStore
+
+    store = DedupStore("/tmp/dedup")
+    store.add(graph)
+    graph = store.load(groupid)
+
+Interned values are shared between tasks and graphs, and must not be
+modified.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+
+from .utils import cache_dir_path, cached_groupids
+
+log = logging.getLogger(__name__)
+
+# Definition fields whose values, or the values of whose keys for the dict
+# fields, are stored once in the object table.
+WHOLE_FIELDS = ("scopes", "routes")
+SPLIT_FIELDS = ("payload", "metadata", "tags", "extra")
+OBJECTS_FILENAME = "objects.jsonl.gz"
+REF_LENGTH = 16
+
+
+def _identity(value):
+    """Key interned strings and containers by identity, other values by type and value."""
+    if isinstance(value, (str, dict, list)):
+        return id(value)
+    return (type(value), value)
+
+
+class Interner(object):
+    """Hash-cons JSON values: equal values are returned as the same object."""
+
+    def __init__(self):
+        """init."""
+        self._table = dict()
+
+    def __len__(self):
+        """Return the number of distinct strings and containers held."""
+        return len(self._table)
+
+    def clear(self):
+        """Forget every interned value."""
+        self._table.clear()
+
+    def intern(self, value):
+        """Return the canonical object equal to value.
+
+        Containers are interned bottom up and keyed by the identity of their
+        interned children, so each level is only hashed once.
+        """
+        if isinstance(value, str):
+            return self._table.setdefault(value, value)
+        if isinstance(value, dict):
+            items = [(self.intern(key), self.intern(item)) for key, item in value.items()]
+            key = ("d", tuple((key, _identity(item)) for key, item in items))
+            if key not in self._table:
+                self._table[key] = dict(items)
+            return self._table[key]
+        if isinstance(value, list):
+            items = [self.intern(item) for item in value]
+            key = ("l", tuple(_identity(item) for item in items))
+            if key not in self._table:
+                self._table[key] = items
+            return self._table[key]
+        return value
+
+    def intern_fields(self, data):
+        """Return a copy of a dictionary with each of its values interned."""
+        return {key: self.intern(value) for key, value in data.items()}
+
+
+def object_ref(value):
+    """Return the reference of a JSON value in the object table."""
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()[:REF_LENGTH], encoded
+
+
+class DedupStore(object):
+    """Graphs stored with their definitions split into shared objects.
+
+    Each graph is a gzipped {groupid}.json.gz file in the store directory,
+    where the fields in WHOLE_FIELDS and the keys of the fields in
+    SPLIT_FIELDS are replaced by references to the object table. The object
+    table is only ever appended to, one gzip member per stored graph, and is
+    read once per store.
+    """
+
+    def __init__(self, path=None):
+        """init.
+
+        path defaults to the dedup directory of TC_CACHE_DIR.
+        """
+        if path is None:
+            path = os.path.join(cache_dir_path(), "dedup")
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._objects = None
+        self._interner = Interner()
+
+    @property
+    def objects_path(self):
+        """Return the path of the object table."""
+        return os.path.join(self.path, OBJECTS_FILENAME)
+
+    def _graph_path(self, groupid):
+        return os.path.join(self.path, "{}.json.gz".format(groupid))
+
+    def groupids(self):
+        """Return the group ids of the stored graphs."""
+        return sorted(name[: -len(".json.gz")] for name in os.listdir(self.path) if name.endswith(".json.gz"))
+
+    def __contains__(self, groupid):
+        """Is the graph stored."""
+        return os.path.isfile(self._graph_path(groupid))
+
+    def _load_objects(self):
+        if self._objects is not None:
+            return self._objects
+        self._objects = dict()
+        if not os.path.isfile(self.objects_path):
+            return self._objects
+        try:
+            with gzip.open(self.objects_path, "rt") as f:
+                for line in f:
+                    ref, value = json.loads(line)
+                    self._objects[ref] = self._interner.intern(value)
+        except (EOFError, ValueError) as e:
+            # An interrupted append leaves a truncated last member.
+            log.warning("Object table %s is damaged, ignoring the rest: %s", self.objects_path, e)
+        return self._objects
+
+    def _encode_task(self, data, new_objects):
+        objects = self._load_objects()
+
+        def ref(value):
+            found, encoded = object_ref(value)
+            if found not in objects:
+                objects[found] = self._interner.intern(value)
+                new_objects.append('["{}",{}]\n'.format(found, encoded))
+            return found
+
+        definition = dict(data["task"])
+        refs = dict()
+        for name in WHOLE_FIELDS + SPLIT_FIELDS:
+            if name not in definition:
+                continue
+            value = definition.pop(name)
+            if name in SPLIT_FIELDS and isinstance(value, dict):
+                refs[name] = {key: ref(item) for key, item in value.items()}
+            else:
+                refs[name] = ref(value)
+        return {"status": data["status"], "task": definition, "refs": refs}
+
+    def _decode_task(self, data):
+        objects = self._load_objects()
+        definition = dict(data["task"])
+        for name, ref in data["refs"].items():
+            if isinstance(ref, dict):
+                definition[name] = {key: objects[item] for key, item in ref.items()}
+            else:
+                definition[name] = objects[ref]
+        return {"status": data["status"], "task": definition}
+
+    def put(self, groupid, graphdata):
+        """Store a graph given as a list of tasks in listTaskGroup format."""
+        new_objects = list()
+        encoded = [self._encode_task(data, new_objects) for data in graphdata]
+        if new_objects:
+            with gzip.open(self.objects_path, "at") as f:
+                f.write("".join(new_objects))
+        path = self._graph_path(groupid)
+        with gzip.open(path + ".tmp", "wt") as f:
+            json.dump(encoded, f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+        return len(new_objects)
+
+    def add(self, graph):
+        """Store a TaskGraph."""
+        return self.put(graph.groupid, graph.tasks(raw=True))
+
+    def get(self, groupid):
+        """Return a stored graph as a list of tasks in listTaskGroup format.
+
+        Values from the object table are shared between every graph read
+        from this store. Raises KeyError for graphs that aren't stored.
+        """
+        try:
+            with gzip.open(self._graph_path(groupid), "rt") as f:
+                encoded = json.loads(f.read())
+        except FileNotFoundError:
+            raise KeyError(groupid)
+        return [self._decode_task(data) for data in encoded]
+
+    def load(self, groupid, interner=None):
+        """Return a stored graph as a TaskGraph.
+
+        interner additionally shares the remaining definition fields, such
+        as dependencies and worker types.
+        """
+        from .graph import TaskGraph
+
+        return TaskGraph.from_data(groupid, self.get(groupid), interner=interner)
+
+    def import_cache(self, cache_dir=None):
+        """Store every graph of a TC_CACHE_DIR cache that isn't stored yet.
+
+        Returns the group ids imported.
+        """
+        cache_dir = cache_dir_path(cache_dir)
+        imported = list()
+        for groupid in cached_groupids(cache_dir):
+            if groupid in self:
+                continue
+            try:
+                with open(os.path.join(cache_dir, "{}.json".format(groupid)), "r") as f:
+                    graphdata = json.loads(f.read())
+            except (OSError, ValueError) as e:
+                log.warning("Unable to import cached graph %s: %s", groupid, e)
+                continue
+            self.put(groupid, graphdata)
+            imported.append(groupid)
+        return imported
+
+    def disk_usage(self):
+        """Return the size of the store on disk, in bytes."""
+        return sum(os.path.getsize(os.path.join(self.path, name)) for name in os.listdir(self.path))
@@ -0,0 +1,118 @@
+"""Ancestor and descendant queries over the dependencies of a task graph.
+
+Tasks are numbered by their position in the graph's task list, and the
+dependencies within the graph are kept as lists of positions. The transitive
+closure of a task is a bitset, an int with one bit per position, computed
+from the closures of its neighbours and memoized, so that repeated queries
+on large graphs only touch each task once::
+
+    graph.ancestors(task_id)
+    graph.descendants(task_id)
+    graph.blocking_failures(task_id)
+    graph.unresolved_upstream(task_id)
+
+Dependencies on tasks outside the graph are ignored. Task groups are
+acyclic; should a cycle be found, the closures of its tasks are incomplete.
+"""
+
+FAILED_STATES = ("failed", "exception")
+RESOLVED_STATES = ("completed", "failed", "exception")
+
+
+def bit_positions(bits):
+    """Return the positions of the set bits of an int, in increasing order."""
+    digits = bin(bits)[:1:-1]
+    positions = list()
+    position = digits.find("1")
+    while position != -1:
+        positions.append(position)
+        position = digits.find("1", position + 1)
+    return positions
+
+
+class DependencyIndex(object):
+    """Integer-indexed dependencies of a list of tasks, with memoized closures."""
+
+    def __init__(self, tasks):
+        """init."""
+        self.task_ids = [task.task_id for task in tasks]
+        self.states = [task.status.state for task in tasks]
+        self._positions = {task_id: position for position, task_id in enumerate(self.task_ids)}
+        self.parents = list()
+        self.children = [list() for _ in self.task_ids]
+        for position, task in enumerate(tasks):
+            parents = sorted({self._positions[dependency] for dependency in task.task.dependencies if self._positions.get(dependency, position) != position})
+            self.parents.append(parents)
+            for parent in parents:
+                self.children[parent].append(position)
+        self._ancestors = dict()
+        self._descendants = dict()
+        self._state_masks = dict()
+
+    def __len__(self):
+        """Return the number of tasks."""
+        return len(self.task_ids)
+
+    def position(self, task_id):
+        """Return the position of a task, raising KeyError if it's not in the graph."""
+        return self._positions[task_id]
+
+    def clear(self):
+        """Forget the memoized closures."""
+        self._ancestors.clear()
+        self._descendants.clear()
+
+    @staticmethod
+    def _closure(position, edges, memo):
+        """Return the bitset of the tasks reachable from position through edges.
+
+        Walks depth first without recursion, filling memo for every task
+        reached on the way.
+        """
+        if position in memo:
+            return memo[position]
+        stack = [(position, iter(edges[position]))]
+        on_stack = {position}
+        while stack:
+            node, pending = stack[-1]
+            for neighbour in pending:
+                if neighbour not in memo and neighbour not in on_stack:
+                    stack.append((neighbour, iter(edges[neighbour])))
+                    on_stack.add(neighbour)
+                    break
+            else:
+                stack.pop()
+                on_stack.discard(node)
+                bits = 0
+                for neighbour in edges[node]:
+                    bits |= memo.get(neighbour, 0) | (1 << neighbour)
+                memo[node] = bits
+        return memo[position]
+
+    def ancestors(self, position):
+        """Return the bitset of the tasks a task depends on, directly or not."""
+        return self._closure(position, self.parents, self._ancestors)
+
+    def descendants(self, position):
+        """Return the bitset of the tasks depending on a task, directly or not."""
+        return self._closure(position, self.children, self._descendants)
+
+    def state_mask(self, states):
+        """Return the bitset of the tasks in one of states."""
+        key = frozenset(states)
+        if key not in self._state_masks:
+            self._state_masks[key] = sum(1 << position for position, state in enumerate(self.states) if state in key)
+        return self._state_masks[key]
+
+    def blocking_failures(self, position):
+        """Return the bitset of the failed ancestors that no failed task is upstream of.
+
+        These are the failures that kept a task from running, rather than
+        their consequences.
+        """
+        failed = self.state_mask(FAILED_STATES)
+        return sum(1 << ancestor for ancestor in bit_positions(self.ancestors(position) & failed) if not self.ancestors(ancestor) & failed)
+
+    def unresolved_upstream(self, position):
+        """Return the bitset of the ancestors that haven't resolved yet."""
+        return self.ancestors(position) & ~self.state_mask(RESOLVED_STATES)
@@ -0,0 +1,107 @@
+"""Compare two task graphs, matching tasks by label.
+
+Both graphs are indexed by label once, so the comparison is linear in the
+number of tasks.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from .utils import parse_datetime
+
+
+@dataclass
+class DurationChange:
+    """Run time of the latest run of a task in both graphs, in seconds."""
+
+    label: str
+    old: float
+    new: float
+
+    @property
+    def delta(self):
+        """Return the change in seconds."""
+        return self.new - self.old
+
+    @property
+    def ratio(self):
+        """Return the new duration relative to the old one."""
+        if not self.old:
+            return None
+        return self.new / self.old
+
+
+@dataclass
+class GraphDiff:
+    """Differences between an old and a new task graph.
+
+    Dependencies are reported as labels when the dependency is in the same
+    graph, and as task ids otherwise.
+    """
+
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    dependencies: Dict[str, dict] = field(default_factory=dict)
+    worker_types: Dict[str, tuple] = field(default_factory=dict)
+    durations: List[DurationChange] = field(default_factory=list)
+
+    def regressions(self, ratio=1.2, min_seconds=60):
+        """Return duration changes slower by both ratio and min_seconds, slowest first."""
+        found = [change for change in self.durations if change.delta >= min_seconds and change.new >= change.old * ratio]
+        return sorted(found, key=lambda change: change.delta, reverse=True)
+
+    def to_dict(self, ratio=1.2, min_seconds=60):
+        """Return a JSON serializable dictionary, including regressions."""
+        return {
+            "added": list(self.added),
+            "removed": list(self.removed),
+            "dependencies": dict(self.dependencies),
+            "worker_types": {label: list(change) for label, change in self.worker_types.items()},
+            "regressions": [
+                {"label": change.label, "old": change.old, "new": change.new, "delta": change.delta} for change in self.regressions(ratio, min_seconds)
+            ],
+        }
+
+
+def _index(graph):
+    labels = dict()
+    by_label = dict()
+    for task in graph.tasklist:
+        labels[task.taskId] = task.label
+        by_label[task.label] = task
+    return labels, by_label
+
+
+def _duration(task):
+    if not task.status.completed or not task.status.runs:
+        return None
+    run = task.status.runs[-1]
+    if not run.get("started") or not run.get("resolved"):
+        return None
+    return (parse_datetime(run["resolved"]) - parse_datetime(run["started"])).total_seconds()
+
+
+def diff_graphs(old, new):
+    """Return a GraphDiff between two TaskGraphs."""
+    old_labels, old_tasks = _index(old)
+    new_labels, new_tasks = _index(new)
+    result = GraphDiff(
+        added=sorted(label for label in new_tasks if label not in old_tasks),
+        removed=sorted(label for label in old_tasks if label not in new_tasks),
+    )
+
+    for label, new_task in new_tasks.items():
+        old_task = old_tasks.get(label)
+        if old_task is None:
+            continue
+        old_deps = {old_labels.get(dep, dep) for dep in old_task.task.dependencies}
+        new_deps = {new_labels.get(dep, dep) for dep in new_task.task.dependencies}
+        if old_deps != new_deps:
+            result.dependencies[label] = {"added": sorted(new_deps - old_deps), "removed": sorted(old_deps - new_deps)}
+        if old_task.task.workerType != new_task.task.workerType:
+            result.worker_types[label] = (old_task.task.workerType, new_task.task.workerType)
+        old_duration, new_duration = _duration(old_task), _duration(new_task)
+        if old_duration is not None and new_duration is not None:
+            result.durations.append(DurationChange(label=label, old=old_duration, new=new_duration))
+
+    return result
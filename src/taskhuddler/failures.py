@@ -0,0 +1,146 @@
+"""Retry and failure analysis across task runs.
+
+Every run of every task is classified in a single pass, using its state and
+the queue's reasonCreated/reasonResolved values.
+"""
+
+import datetime
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from .utils import parse_datetime
+
+# reasonCreated values of runs created because an earlier run did not succeed.
+RETRY_REASONS = {"retry", "task-retry", "rerun"}
+
+# Categories for runs resolved as exception, keyed by reasonResolved.
+EXCEPTION_CATEGORIES = {
+    "worker-shutdown": "worker-shutdown",
+    "claim-expired": "worker-shutdown",
+    "intermittent-task": "intermittent",
+    "deadline-exceeded": "deadline-exceeded",
+    "canceled": "canceled",
+    "superseded": "canceled",
+}
+
+
+def classify_run(run):
+    """Return the category of a run.
+
+    One of completed, failed, worker-shutdown, intermittent,
+    deadline-exceeded, canceled, exception, or the run's state when it has
+    not resolved yet.
+    """
+    state = run.get("state")
+    if state in ("completed", "failed"):
+        return state
+    if state == "exception":
+        return EXCEPTION_CATEGORIES.get(run.get("reasonResolved"), "exception")
+    return state
+
+
+@dataclass
+class RunFailure:
+    """A run that did not complete successfully."""
+
+    task_id: str
+    label: str
+    kind: str
+    worker_type: str
+    run_id: int
+    category: str
+    reason_created: str
+    reason_resolved: str
+    duration: Optional[float]
+
+
+@dataclass
+class FailureReport:
+    """Failure analysis of a set of tasks.
+
+    wasted_compute holds the seconds spent running unsuccessful runs, keyed
+    by (kind, worker_type). Flaky tasks completed after an unsuccessful run.
+    """
+
+    run_count: int = 0
+    retry_count: int = 0
+    categories: Dict[str, int] = field(default_factory=dict)
+    wasted_compute: Dict[tuple, float] = field(default_factory=dict)
+    failures: List[RunFailure] = field(default_factory=list)
+    flaky_tasks: List[str] = field(default_factory=list)
+    failed_tasks: List[str] = field(default_factory=list)
+
+    @property
+    def total_wasted_compute(self):
+        """Return the compute time of every unsuccessful run, as timedelta."""
+        return datetime.timedelta(seconds=sum(self.wasted_compute.values()))
+
+    def to_dict(self):
+        """Return a JSON serializable dictionary."""
+        return {
+            "run_count": self.run_count,
+            "retry_count": self.retry_count,
+            "categories": dict(self.categories),
+            "wasted_compute": [{"kind": kind, "worker_type": worker_type, "seconds": seconds} for (kind, worker_type), seconds in self.wasted_compute.items()],
+            "failures": [asdict(failure) for failure in self.failures],
+            "flaky_tasks": list(self.flaky_tasks),
+            "failed_tasks": list(self.failed_tasks),
+        }
+
+
+def _duration(run):
+    started, resolved = run.get("started"), run.get("resolved")
+    if not started or not resolved:
+        return None
+    return (parse_datetime(resolved) - parse_datetime(started)).total_seconds()
+
+
+def analyse_failures(tasks):
+    """Return a FailureReport for an iterable of Task objects."""
+    report = FailureReport()
+    categories = defaultdict(int)
+    wasted = defaultdict(float)
+
+    for task in tasks:
+        runs = task.status.runs
+        if not runs:
+            continue
+        definition = task.task
+        kind = definition.tags.get("kind", "")
+        worker_type = task.status.workerType
+        unsuccessful = False
+        for run in runs:
+            report.run_count += 1
+            if run.get("reasonCreated") in RETRY_REASONS:
+                report.retry_count += 1
+            category = classify_run(run)
+            categories[category] += 1
+            if run.get("state") not in ("failed", "exception"):
+                continue
+            unsuccessful = True
+            duration = _duration(run)
+            if duration:
+                wasted[(kind, worker_type)] += duration
+            report.failures.append(
+                RunFailure(
+                    task_id=definition.taskId,
+                    label=definition.label,
+                    kind=kind,
+                    worker_type=worker_type,
+                    run_id=run.get("runId"),
+                    category=category,
+                    reason_created=run.get("reasonCreated"),
+                    reason_resolved=run.get("reasonResolved"),
+                    duration=duration,
+                )
+            )
+        if unsuccessful:
+            if task.status.state == "completed":
+                report.flaky_tasks.append(definition.taskId)
+            elif task.status.state in ("failed", "exception"):
+                report.failed_tasks.append(definition.taskId)
+
+    report.categories = dict(categories)
+    report.wasted_compute = dict(wasted)
+    return report
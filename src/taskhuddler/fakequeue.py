@@ -0,0 +1,287 @@
+"""Local stand-in for the Taskcluster Queue service.
+
+FakeQueue serves recorded or synthetic task groups over HTTP with aiohttp,
+implementing the queue routes taskhuddler uses: listTaskGroup, status, task,
+listArtifacts, getArtifact and getLatestArtifact. Point TASKCLUSTER_ROOT_URL
+at it to exercise the real taskcluster clients end to end::
+
+    fake = FakeQueue(latency=0.05, page_size=500, throttle_rate=0.01)
+    fake.add_synthetic(task_count=10000)
+    with fake.serve_in_thread() as root_url:
+        os.environ["TASKCLUSTER_ROOT_URL"] = root_url
+        graph = TaskGraph(fake.groupids()[0])
+
+Latency, page sizes and failures are configurable. Injected errors are
+answered with a 500, which the taskcluster clients retry, and injected
+throttling with a 429 and a Retry-After header, which they don't.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from .synthetic import artifact_content, generate_task_group
+
+log = logging.getLogger(__name__)
+
+API_PREFIX = "/api/queue/v1"
+
+# Default artifact listing for recorded tasks without one.
+DEFAULT_ARTIFACTS = [{"storageType": "s3", "name": "public/logs/live_backing.log", "expires": "", "contentType": "text/plain"}]
+
+
+class FakeQueue(object):
+    """Serve task groups and artifacts the way the Queue service does.
+
+    Arguments:
+        latency: seconds to wait before answering each request.
+        jitter: extra random latency, up to this many seconds.
+        page_size: the largest page listTaskGroup and listArtifacts return,
+            whatever limit the client asks for.
+        error_rate: fraction of requests answered with a 500.
+        throttle_rate: fraction of requests answered with a 429.
+        retry_after: the Retry-After header of 429 responses, in seconds.
+        artifact_size: approximate size of generated artifacts, in bytes.
+        seed: seeds latency jitter and failure injection.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, page_size=1000, error_rate=0.0, throttle_rate=0.0, retry_after=1, artifact_size=1024, seed=0):
+        """init."""
+        self.latency = latency
+        self.jitter = jitter
+        self.page_size = page_size
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.artifact_size = artifact_size
+        self.rng = random.Random(seed)
+        self.groups = dict()
+        self.tasks = dict()
+        self.artifacts = dict()
+        self.artifact_data = dict()
+        self.calls = Counter()
+        self.host = "127.0.0.1"
+        self.port = None
+        self._runner = None
+
+    @property
+    def root_url(self):
+        """Root URL to use as TASKCLUSTER_ROOT_URL."""
+        if self.port is None:
+            raise RuntimeError("FakeQueue is not running")
+        return "http://{}:{}".format(self.host, self.port)
+
+    def groupids(self):
+        """Return the ids of the served task groups."""
+        return list(self.groups)
+
+    def add_group(self, groupid, tasks, artifacts=None, artifact_data=None):
+        """Serve a task group.
+
+        Arguments:
+            groupid: the task group id.
+            tasks: tasks in listTaskGroup format, as stored in TC_CACHE_DIR.
+            artifacts: artifact listings keyed by task id. Tasks without
+                one list a single log.
+            artifact_data: artifact contents keyed by (task_id, name), as
+                dictionaries for JSON artifacts or strings. Other artifacts
+                are generated.
+        """
+        self.groups[groupid] = list(tasks)
+        for task in tasks:
+            task_id = task["status"]["taskId"]
+            self.tasks[task_id] = task
+            self.artifacts[task_id] = (artifacts or {}).get(task_id, DEFAULT_ARTIFACTS)
+        self.artifact_data.update(artifact_data or {})
+        return self
+
+    def add_synthetic(self, **kwargs):
+        """Serve a task group from taskhuddler.synthetic.generate_task_group."""
+        group = generate_task_group(**kwargs)
+        return self.add_group(group["groupid"], group["tasks"], artifacts=group["artifacts"])
+
+    def add_cached_groups(self, cache_dir=None):
+        """Serve every graph cached in cache_dir, defaulting to TC_CACHE_DIR."""
+        cache_dir = cache_dir or os.environ["TC_CACHE_DIR"]
+        for name in sorted(os.listdir(cache_dir)):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(cache_dir, name), "r") as f:
+                self.add_group(name[: -len(".json")], json.loads(f.read()))
+        return self
+
+    def _page(self, items, request):
+        limit = min(int(request.query.get("limit", self.page_size)), self.page_size)
+        offset = int(request.query.get("continuationToken", 0))
+        end = offset + limit
+        page = items[offset:end]
+        token = str(end) if end < len(items) else None
+        return page, token
+
+    async def list_task_group(self, request):
+        """Serve listTaskGroup, paged by continuation token."""
+        from aiohttp import web
+
+        groupid = request.match_info["groupid"]
+        if groupid not in self.groups:
+            raise web.HTTPNotFound()
+        tasks, token = self._page(self.groups[groupid], request)
+        body = {"taskGroupId": groupid, "tasks": tasks}
+        if token:
+            body["continuationToken"] = token
+        return web.json_response(body)
+
+    def _task(self, request):
+        from aiohttp import web
+
+        task = self.tasks.get(request.match_info["task_id"])
+        if task is None:
+            raise web.HTTPNotFound()
+        return task
+
+    async def status(self, request):
+        """Serve a task's status."""
+        from aiohttp import web
+
+        return web.json_response({"status": self._task(request)["status"]})
+
+    async def task(self, request):
+        """Serve a task's definition."""
+        from aiohttp import web
+
+        return web.json_response(self._task(request)["task"])
+
+    async def list_artifacts(self, request):
+        """Serve a run's artifact listing, paged by continuation token."""
+        from aiohttp import web
+
+        self._task(request)
+        artifacts, token = self._page(self.artifacts[request.match_info["task_id"]], request)
+        body = {"artifacts": artifacts}
+        if token:
+            body["continuationToken"] = token
+        return web.json_response(body)
+
+    async def get_artifact(self, request):
+        """Serve an artifact, from artifact_data or generated."""
+        from aiohttp import web
+
+        self._task(request)
+        task_id, name = request.match_info["task_id"], request.match_info["name"]
+        content = self.artifact_data.get((task_id, name))
+        if content is None:
+            content = artifact_content(task_id, name, self.artifact_size)
+            if name.endswith(".json"):
+                return web.Response(text=content, content_type="application/json")
+        if isinstance(content, (dict, list)):
+            return web.json_response(content)
+        return web.Response(text=content, content_type="text/plain")
+
+    def make_app(self):
+        """Return the aiohttp application."""
+        from aiohttp import web
+
+        @web.middleware
+        async def inject(request, handler):
+            self.calls[request.match_info.route.name] += 1
+            delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+            if delay:
+                await asyncio.sleep(delay)
+            roll = self.rng.random()
+            if roll < self.throttle_rate:
+                return web.json_response(
+                    {"code": "TooManyRequests", "message": "injected throttling"}, status=429, headers={"Retry-After": str(self.retry_after)}
+                )
+            if roll < self.throttle_rate + self.error_rate:
+                return web.json_response({"code": "InternalServerError", "message": "injected error"}, status=500)
+            return await handler(request)
+
+        app = web.Application(middlewares=[inject])
+        app.router.add_get(API_PREFIX + "/task-group/{groupid}/list", self.list_task_group, name="listTaskGroup")
+        app.router.add_get(API_PREFIX + "/task/{task_id}/status", self.status, name="status")
+        app.router.add_get(API_PREFIX + "/task/{task_id}", self.task, name="task")
+        app.router.add_get(API_PREFIX + "/task/{task_id}/runs/{run_id:\\d+}/artifacts", self.list_artifacts, name="listArtifacts")
+        app.router.add_get(API_PREFIX + "/task/{task_id}/runs/{run_id:\\d+}/artifacts/{name:.+}", self.get_artifact, name="getArtifact")
+        app.router.add_get(API_PREFIX + "/task/{task_id}/artifacts/{name:.+}", self.get_artifact, name="getLatestArtifact")
+        return app
+
+    async def start(self, port=0):
+        """Start serving on localhost, on a free port by default."""
+        from aiohttp import web
+
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        log.debug("FakeQueue serving on %s", self.root_url)
+        return self
+
+    async def close(self):
+        """Stop serving."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+        self._runner = None
+        self.port = None
+
+    async def __aenter__(self):
+        """Start serving."""
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        """Stop serving."""
+        await self.close()
+
+    @contextmanager
+    def serve_in_thread(self, port=0):
+        """Serve from an event loop in a background thread, yielding the root URL.
+
+        For use with the synchronous classes, which block the calling thread.
+        """
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, name="FakeQueue", daemon=True)
+        thread.start()
+        try:
+            asyncio.run_coroutine_threadsafe(self.start(port), loop).result()
+            yield self.root_url
+        finally:
+            asyncio.run_coroutine_threadsafe(self.close(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+
+def main(argv=None):
+    """Serve synthetic or cached task groups until interrupted."""
+    import argparse
+
+    from aiohttp import web
+
+    parser = argparse.ArgumentParser(prog="python -m taskhuddler.fakequeue", description="Serve task groups as a local Taskcluster Queue.")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--cache-dir", help="serve the graphs cached in this directory")
+    parser.add_argument("--tasks", type=int, default=1000, help="size of the synthetic task group, when no cache directory is given")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    fake = FakeQueue(latency=args.latency, jitter=args.jitter, page_size=args.page_size, error_rate=args.error_rate, throttle_rate=args.throttle_rate)
+    if args.cache_dir:
+        fake.add_cached_groups(args.cache_dir)
+    else:
+        fake.add_synthetic(task_count=args.tasks)
+    for groupid in fake.groupids():
+        print("Serving task group {}".format(groupid))
+    web.run_app(fake.make_app(), host=fake.host, port=args.port, print=print)
+
+
+if __name__ == "__main__":
+    main()
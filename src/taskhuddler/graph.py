@@ -7,21 +7,36 @@ import os
 from collections import defaultdict
 from dataclasses import asdict
 
-from taskcluster import Queue
-
+from . import instrumentation
 from .task import Task
 from .utils import Range, merge_date_list, tc_options
 
 log = logging.getLogger(__name__)
 
+DATAFRAME_COLUMNS = ["name", "taskid", "kind", "platform", "worker_type", "worker_id", "run_id", "scheduled", "started", "resolved", "state"]
+DATAFRAME_CATEGORICAL_COLUMNS = ["kind", "platform", "worker_type", "state"]
+DATAFRAME_TIMESTAMP_COLUMNS = ["scheduled", "started", "resolved"]
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+# listTaskGroup returns at most MAX_PAGE_SIZE tasks per page. Searches start
+# with FIRST_PAGE_SIZE and double the page size from there.
+FIRST_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
 
 class TaskGraph(object):
-    """Helper class for dealing with Task Graphs."""
+    """Helper class for dealing with Task Graphs.
+
+    With a taskhuddler.dedup.Interner, the task definitions of every graph
+    loaded with it share their equal parts.
+    """
+
+    interner = None
 
-    def __init__(self, groupid, limit=None):
+    def __init__(self, groupid, limit=None, interner=None):
         """init."""
         self.groupid = groupid
         self.tasklist = None
+        self.interner = interner
 
         if "TC_CACHE_DIR" in os.environ:
             self.cache_file = os.path.join(os.environ.get("TC_CACHE_DIR"), "{}.json".format(self.groupid))
@@ -30,6 +45,20 @@ class TaskGraph(object):
 
         self.fetch_tasks(limit=limit)
 
+    @classmethod
+    def from_data(cls, groupid, graphdata, interner=None):
+        """Create a TaskGraph from already fetched task data.
+
+        graphdata is a list of tasks as returned by listTaskGroup, or as
+        stored in the TC_CACHE_DIR cache. The queue is not contacted.
+        """
+        graph = cls.__new__(cls)
+        graph.groupid = groupid
+        graph.cache_file = None
+        graph.interner = interner
+        graph.tasklist = graph._build_tasks(graphdata)
+        return graph
+
     def __repr__(self):
         """repr."""
         return "<TaskGraph {}>".format(self.groupid)
@@ -42,7 +71,7 @@ class TaskGraph(object):
         query = {}
         if limit:
             # Default taskcluster-client api asks for 1000 tasks.
-            query["limit"] = min(limit, 1000)
+            query["limit"] = min(limit, MAX_PAGE_SIZE)
 
         def under_limit(length):
             """Indicate if we've returned enough tasks."""
@@ -50,19 +79,24 @@ class TaskGraph(object):
                 return True
             return False
 
+        from taskcluster import Queue
+
         queue = Queue(options=tc_options())
-        outcome = queue.listTaskGroup(self.groupid, query=query)
+        outcome = instrumentation.call_api("listTaskGroup", queue.listTaskGroup, self.groupid, query=query)
         tasks = outcome.get("tasks", [])
         while under_limit(len(tasks)) and outcome.get("continuationToken"):
             query.update({"continuationToken": outcome.get("continuationToken")})
-            outcome = queue.listTaskGroup(self.groupid, query=query)
+            if limit:
+                # Only ask for the tasks still missing.
+                query["limit"] = min(limit - len(tasks), MAX_PAGE_SIZE)
+            outcome = instrumentation.call_api("listTaskGroup", queue.listTaskGroup, self.groupid, query=query)
             tasks.extend(outcome.get("tasks", []))
 
         if limit:
             tasks = tasks[:limit]
         return tasks
 
-    def fetch_tasks(self, limit=None):
+    def fetch_tasks(self, limit=None, refresh=False):
         """
         Return tasks with the associated group ID.
 
@@ -70,9 +104,12 @@ class TaskGraph(object):
 
         Enforces the limit parameter as a limit of the total number of tasks
         to be returned.
+
+        refresh fetches the tasks from the queue even if the group is in the
+        TC_CACHE_DIR cache, and updates the cache.
         """
         graphdata = list()
-        if self.cache_file:
+        if self.cache_file and not refresh:
             graphdata = self._read_file_cache()
 
         refreshed = False
@@ -80,22 +117,32 @@ class TaskGraph(object):
             graphdata = self._fetch_tasks_from_queue(limit)
             refreshed = True
 
-        self.tasklist = [Task.from_dict(data) for data in graphdata]
+        self.tasklist = self._build_tasks(graphdata)
 
         if self.cache_file and refreshed:
             self._write_file_cache()
 
+    def _build_tasks(self, graphdata):
+        with instrumentation.timed("build_tasks", tasks=len(graphdata)):
+            return [Task.from_dict(data, interner=self.interner) for data in graphdata]
+
     def _write_file_cache(self):
-        with open(self.cache_file, "w") as f:
-            f.write(json.dumps(self.tasks(raw=True)))
+        with instrumentation.timed("cache_write", path=self.cache_file) as event:
+            data = json.dumps(self.tasks(raw=True))
+            with open(self.cache_file, "w") as f:
+                f.write(data)
+            event["bytes"] = len(data)
 
     def _read_file_cache(self):
         tasks = list()
         if not os.path.isfile(self.cache_file):
             return tasks
         try:
-            with open(self.cache_file, "r") as f:
-                tasks = json.loads(f.read())
+            with instrumentation.timed("cache_read", path=self.cache_file) as event:
+                with open(self.cache_file, "r") as f:
+                    data = f.read()
+                event["bytes"] = len(data)
+                tasks = json.loads(data)
         except Exception as e:
             log.debug(e)
 
@@ -108,7 +155,23 @@ class TaskGraph(object):
         else:
             return self.tasklist[:limit]
 
+    @instrumentation.aggregate
+    def summary(self):
+        """Return GraphStats with every graph metric, computed in one pass.
+
+        The result is memoized until the task list changes, for example
+        through fetch_tasks.
+        """
+        from .stats import compute_stats
+
+        # Keep the list itself: the id of a freed list can be reused.
+        cached = getattr(self, "_summary", None)
+        if cached is None or cached[0] is not self.tasklist or cached[1] != len(self.tasklist):
+            self._summary = (self.tasklist, len(self.tasklist), compute_stats(self.tasklist))
+        return self._summary[2]
+
     @property
+    @instrumentation.aggregate
     def completed(self):
         """Have all the tasks completed.
 
@@ -116,6 +179,7 @@ class TaskGraph(object):
         """
         return all([task.status.completed for task in self.tasks()])
 
+    @instrumentation.aggregate
     def current_states(self):
         """Count the occurences of current states."""
         states = defaultdict(int)
@@ -124,19 +188,23 @@ class TaskGraph(object):
         return states
 
     @property
+    @instrumentation.aggregate
     def earliest_start_time(self):
         """Find the earliest start time for any task in the graph."""
         return min([task.status.started for task in self.tasks() if task.status.started])
 
     @property
+    @instrumentation.aggregate
     def latest_finished_time(self):
         """Find the latest finish time for resolved tasks."""
         return max([task.status.resolved for task in self.tasks() if task.status.resolved])
 
+    @instrumentation.aggregate
     def total_compute_time(self):
         """Sum of all the task run times, as timedelta."""
         return sum([sum(task.status.run_durations(), datetime.timedelta(0)) for task in self.tasks() if task.status.completed], datetime.timedelta(0, 0))
 
+    @instrumentation.aggregate
     def total_wall_time(self):
         """Return the total wall time for this graph.
 
@@ -144,6 +212,7 @@ class TaskGraph(object):
         """
         return self.latest_finished_time - self.earliest_start_time
 
+    @instrumentation.aggregate
     def total_compute_wall_time(self):
         """Return the total time spent running tasks, ignoring wait times."""
         dt_list = [Range(start=task.status.started, end=task.status.resolved) for task in self.tasks() if task.status.completed]
@@ -160,43 +229,93 @@ class TaskGraph(object):
                 platform = task.task.extra["treeherder"]["machine"]["platform"]
             except KeyError:
                 continue
-            yield {"kind": kind, "platform": platform, "duration": (task.status.resolved - task.status.started).seconds}
+            yield {"kind": kind, "platform": platform, "duration": int((task.status.resolved - task.status.started).total_seconds())}
 
+    def timing_analyzer(self, group_by=("kind", "platform"), **kwargs):
+        """Return a TimingAnalyzer of queue wait and run time percentiles over every run.
+
+        See taskhuddler.timings for the available groupings.
+        """
+        from .timings import TimingAnalyzer
+
+        return TimingAnalyzer(group_by=group_by, **kwargs).add_graph(self)
+
+    def concurrency_timelines(self, key=None):
+        """Return running and queued task counts over time, per worker type.
+
+        See taskhuddler.timeline.build_timelines.
+        """
+        from .timeline import build_timelines
+
+        return build_timelines(self.tasklist, key=key)
+
+    def _dataframe_columns(self):
+        """Collect task and run data as a dictionary of column lists, one entry per run."""
+        columns = {name: list() for name in DATAFRAME_COLUMNS}
+        for task in self.tasklist:
+            runs = task.status.runs
+            if not runs:
+                continue
+            count = len(runs)
+            definition = task.task
+            # Some tasks have no platform
+            platform = ((definition.extra.get("treeherder") or {}).get("machine") or {}).get("platform")
+            columns["name"].extend([definition.metadata["name"]] * count)
+            columns["taskid"].extend([definition.taskId] * count)
+            columns["kind"].extend([definition.tags.get("kind", "")] * count)
+            columns["platform"].extend([platform] * count)
+            columns["worker_type"].extend([task.status.workerType] * count)
+            columns["worker_id"].extend([run.get("workerId") for run in runs])
+            columns["run_id"].extend([run["runId"] for run in runs])
+            columns["state"].extend([run.get("state") for run in runs])
+            for column in DATAFRAME_TIMESTAMP_COLUMNS:
+                columns[column].extend([run.get(column) for run in runs])
+        return columns
+
+    @instrumentation.aggregate
     def to_dataframe(self):
-        """Return a Pandas dataframe containing task data."""
+        """Return a Pandas dataframe containing task data.
+
+        One row per run. kind, platform, worker_type and state are
+        categorical, the timestamps are UTC datetimes.
+        """
         try:
             import pandas as pd
         except ModuleNotFoundError:
             raise NotImplementedError("Please install Pandas: taskhuddler[pandas]")
 
-        entries = list()
-        for task in self.tasklist:
-            for run in task.status.runs:
-                # Some tasks have no platform
-                try:
-                    platform = task.task.extra["treeherder"]["machine"]["platform"]
-                except KeyError:
-                    platform = None
-                entries.append(
-                    {
-                        "name": task.task.name,
-                        "taskid": task.taskId,
-                        "kind": task.kind,
-                        "platform": platform,
-                        "worker_type": task.status.workerType,
-                        "worker_id": run.get("workerId"),
-                        "run_id": run["runId"],
-                        "scheduled": run.get("scheduled"),
-                        "started": run.get("started"),
-                        "resolved": run.get("resolved"),
-                        "state": run.get("state"),
-                    }
-                )
-        df = pd.DataFrame.from_dict(entries)
-        df["scheduled"] = pd.to_datetime(df.scheduled)
-        df["started"] = pd.to_datetime(df.started)
-        df["resolved"] = pd.to_datetime(df.resolved)
-        return df
+        columns = self._dataframe_columns()
+        for column in DATAFRAME_TIMESTAMP_COLUMNS:
+            try:
+                columns[column] = pd.to_datetime(columns[column], format=TIMESTAMP_FORMAT, utc=True)
+            except ValueError:
+                # Not every timestamp has milliseconds.
+                columns[column] = pd.to_datetime(columns[column], utc=True)
+        for column in DATAFRAME_CATEGORICAL_COLUMNS:
+            columns[column] = pd.Categorical(columns[column])
+        return pd.DataFrame(columns, columns=DATAFRAME_COLUMNS)
+
+    def to_arrow(self):
+        """Return a pyarrow Table containing task data, as to_dataframe."""
+        try:
+            import pyarrow as pa
+        except ModuleNotFoundError:
+            raise NotImplementedError("Please install pyarrow: taskhuddler[arrow]")
+
+        return pa.Table.from_pandas(self.to_dataframe(), preserve_index=False)
+
+    def to_parquet(self, path):
+        """Write task data to a Parquet file, as to_dataframe."""
+        graphs_to_parquet([self], path)
+
+    def to_snapshot(self, path):
+        """Write the graph to a memory-mappable snapshot file.
+
+        See taskhuddler.snapshot.
+        """
+        from .snapshot import write_snapshot
+
+        write_snapshot(self, path)
 
     @property
     def kinds(self):
@@ -224,7 +343,194 @@ class TaskGraph(object):
             if task.status.has_failures:
                 yield task
 
+    def dependency_index(self):
+        """Return the DependencyIndex of the tasks, built once per task list.
+
+        See taskhuddler.dependencies.
+        """
+        from .dependencies import DependencyIndex
+
+        cached = getattr(self, "_dependency_index", None)
+        if cached is None or cached[0] is not self.tasklist or cached[1] != len(self.tasklist):
+            self._dependency_index = (self.tasklist, len(self.tasklist), DependencyIndex(self.tasklist))
+        return self._dependency_index[2]
+
+    def _tasks_at(self, bits):
+        from .dependencies import bit_positions
+
+        return [self.tasklist[position] for position in bit_positions(bits)]
+
+    def ancestors(self, task_id):
+        """Return the tasks in the graph that task_id depends on, directly or not."""
+        index = self.dependency_index()
+        return self._tasks_at(index.ancestors(index.position(task_id)))
+
+    def descendants(self, task_id):
+        """Return the tasks in the graph that depend on task_id, directly or not."""
+        index = self.dependency_index()
+        return self._tasks_at(index.descendants(index.position(task_id)))
+
+    def blocking_failures(self, task_id):
+        """Return the failed upstream tasks of task_id that no other failure is upstream of."""
+        index = self.dependency_index()
+        return self._tasks_at(index.blocking_failures(index.position(task_id)))
+
+    def unresolved_upstream(self, task_id):
+        """Return the upstream tasks of task_id that haven't resolved yet."""
+        index = self.dependency_index()
+        return self._tasks_at(index.unresolved_upstream(index.position(task_id)))
+
+    def critical_path(self):
+        """Return the chain of tasks that finished last, as observed.
+
+        Starting from the task resolved last, repeatedly step to the
+        dependency in this graph that resolved last. Returns Tasks in
+        execution order.
+        """
+        by_id = {task.taskId: task for task in self.tasklist}
+        resolved = {task.taskId: task.status.resolved for task in self.tasklist if task.status.resolved}
+        if not resolved:
+            return list()
+        current = max(resolved, key=resolved.get)
+        path = list()
+        while current is not None:
+            path.append(by_id[current])
+            dependencies = [dep for dep in by_id[current].task.dependencies if dep in resolved]
+            current = max(dependencies, key=resolved.get, default=None)
+        return list(reversed(path))
+
+    @instrumentation.aggregate
+    def simulate(self, workers=None, default_workers=None, **kwargs):
+        """Return a SimulationResult of running the graph with the given worker pools.
+
+        See taskhuddler.simulation.
+        """
+        from .simulation import simulate
+
+        return simulate(self, workers=workers, default_workers=default_workers, **kwargs)
+
+    def diff(self, other):
+        """Return a GraphDiff from this graph to another, matching tasks by label.
+
+        See taskhuddler.diff.
+        """
+        from .diff import diff_graphs
+
+        return diff_graphs(self, other)
+
+    def failure_report(self):
+        """Return a FailureReport classifying every run in the graph.
+
+        See taskhuddler.failures.
+        """
+        from .failures import analyse_failures
+
+        return analyse_failures(self.tasklist)
+
     def task_names_with_failures(self):
         """Return the names of tasks which have failures."""
         for task in self.tasks_with_failures():
             yield task.task.name
+
+
+def _cached_graph_path(groupid):
+    """Return the path of the group in the TC_CACHE_DIR cache, if it's there."""
+    if "TC_CACHE_DIR" not in os.environ:
+        return None
+    path = os.path.join(os.environ["TC_CACHE_DIR"], "{}.json".format(groupid))
+    if not os.path.isfile(path):
+        return None
+    return path
+
+
+def _cached_graph_data(groupid):
+    path = _cached_graph_path(groupid)
+    if path is None:
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.loads(f.read())
+    except ValueError as e:
+        log.debug(e)
+        return None
+
+
+def iter_task_group(groupid, first_page_size=FIRST_PAGE_SIZE):
+    """Yield the tasks of a group in listTaskGroup format, a page at a time.
+
+    The next page is only fetched once the previous one has been consumed.
+    The first page asks for first_page_size tasks and each following one for
+    twice as many, up to MAX_PAGE_SIZE, so a search that stops early fetches
+    few tasks and a long one makes few requests. Groups in the TC_CACHE_DIR
+    cache are read from it instead.
+    """
+    cached = _cached_graph_data(groupid)
+    if cached:
+        yield from cached
+        return
+
+    from taskcluster import Queue
+
+    queue = Queue(options=tc_options())
+    query = {"limit": min(first_page_size, MAX_PAGE_SIZE)}
+    while True:
+        outcome = instrumentation.call_api("listTaskGroup", queue.listTaskGroup, groupid, query=dict(query))
+        yield from outcome.get("tasks", [])
+        if not outcome.get("continuationToken"):
+            return
+        query = {"continuationToken": outcome["continuationToken"], "limit": min(query["limit"] * 2, MAX_PAGE_SIZE)}
+
+
+def find_tasks(groupid, predicate, limit=None, first_page_size=FIRST_PAGE_SIZE):
+    """Return the Tasks of a group for which predicate is true.
+
+    Paging stops as soon as limit tasks have matched, so checking for any
+    failed task only fetches the pages up to the first one::
+
+        failed = find_tasks(groupid, lambda task: task.status.has_failures, limit=1)
+
+    See iter_task_group for the page sizes.
+    """
+    found = list()
+    if limit is not None and limit <= 0:
+        return found
+    for data in iter_task_group(groupid, first_page_size=first_page_size):
+        task = Task.from_dict(data)
+        if predicate(task):
+            found.append(task)
+            if limit is not None and len(found) >= limit:
+                break
+    return found
+
+
+def graphs_to_parquet(graphs, path):
+    """Write the task data of several graphs to a single Parquet file.
+
+    Each graph is written as its own row group, with an added groupid
+    column, so only one graph's data is held in memory at a time.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ModuleNotFoundError:
+        raise NotImplementedError("Please install pyarrow: taskhuddler[arrow]")
+
+    categorical = pa.dictionary(pa.int32(), pa.string())
+    fields = [("groupid", categorical)]
+    for column in DATAFRAME_COLUMNS:
+        if column in DATAFRAME_CATEGORICAL_COLUMNS:
+            fields.append((column, categorical))
+        elif column in DATAFRAME_TIMESTAMP_COLUMNS:
+            fields.append((column, pa.timestamp("ns", tz="UTC")))
+        elif column == "run_id":
+            fields.append((column, pa.int64()))
+        else:
+            fields.append((column, pa.string()))
+    schema = pa.schema(fields)
+
+    with pq.ParquetWriter(path, schema) as writer:
+        for graph in graphs:
+            df = graph.to_dataframe()
+            df.insert(0, "groupid", graph.groupid)
+            df["groupid"] = df["groupid"].astype("category")
+            writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
@@ -0,0 +1,231 @@
+"""A process-wide cache of TaskGraph instances, bounded by memory.
+
+A service building a TaskGraph per request re-reads TC_CACHE_DIR, or
+refetches the group, every time. A GraphCache keeps the graphs it loaded,
+keyed by group id, limit and queue root URL, and evicts the least recently
+used ones once their estimated size goes over max_bytes::
+
+    from taskhuddler.graphcache import get_graph
+
+    graph = get_graph(groupid)
+
+Graphs whose tasks have all resolved can't change any more, and stay cached
+until evicted. Other graphs are fetched again from the queue, bypassing
+TC_CACHE_DIR, when they are used more than refresh_after seconds after
+being loaded. Concurrent misses for the same key share one load.
+
+Cached graphs are shared between callers, and must not be modified.
+"""
+
+import copy
+import functools
+import logging
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from .dependencies import RESOLVED_STATES
+from .graph import TaskGraph
+from .task import SingleFlight
+from .utils import tc_options
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_REFRESH_AFTER = 60
+# Tasks measured to estimate the size of a graph.
+SIZE_SAMPLES = 50
+
+
+def _deep_size(value, seen):
+    """Return the size of value and everything it refers to that isn't in seen."""
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_size(key, seen) + _deep_size(item, seen) for key, item in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(item, seen) for item in value)
+    elif hasattr(value, "__dict__"):
+        size += _deep_size(vars(value), seen)
+    return size
+
+
+def estimate_size(graph, samples=SIZE_SAMPLES):
+    """Estimate the memory used by the tasks of a graph, in bytes.
+
+    Measures up to samples tasks spread over the task list and scales their
+    size to the whole list. Values shared between the sampled tasks, such
+    as interned ones, are only counted once.
+    """
+    tasks = graph.tasklist or list()
+    if not tasks:
+        return sys.getsizeof(tasks)
+    sampled = tasks[:: max(1, len(tasks) // samples)]
+    seen = set()
+    sampled_size = sum(_deep_size(task, seen) for task in sampled)
+    return sys.getsizeof(tasks) + sampled_size * len(tasks) // len(sampled)
+
+
+def graph_resolved(graph):
+    """Have all the tasks of a graph resolved, so it won't change any more."""
+    return bool(graph.tasklist) and all(task.status.state in RESOLVED_STATES for task in graph.tasklist)
+
+
+@dataclass
+class CacheEntry:
+    """A cached graph, with its estimated size and the clock time it was loaded."""
+
+    graph: Any
+    size: int
+    loaded: float
+    resolved: bool
+
+
+class GraphCache(object):
+    """Least recently used TaskGraph instances, within a memory budget.
+
+    Arguments:
+        max_bytes: the estimated size of the cached graphs to stay under.
+            A graph larger than that on its own isn't cached.
+        refresh_after: seconds after which graphs that haven't resolved are
+            fetched again. If that fails, the cached graph is returned.
+        interner: a taskhuddler.dedup.Interner the graphs are loaded with.
+        clock: returns the current time in seconds.
+
+    stats counts hits, misses, refreshes, refresh_errors and evictions.
+    """
+
+    graph_class = TaskGraph
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, refresh_after=DEFAULT_REFRESH_AFTER, interner=None, clock=time.monotonic):
+        """init."""
+        self.max_bytes = max_bytes
+        self.refresh_after = refresh_after
+        self.interner = interner
+        self.clock = clock
+        self.size = 0
+        self.stats = Counter()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._loads = SingleFlight()
+
+    def __len__(self):
+        """Return the number of cached graphs."""
+        return len(self._entries)
+
+    def key(self, groupid, limit=None):
+        """Return the cache key of a group fetched with limit from the current queue."""
+        return (groupid, limit, tc_options()["rootUrl"])
+
+    def _fresh(self, entry):
+        return entry.resolved or self.clock() - entry.loaded < self.refresh_after
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _lookup(self, key, stale=None):
+        """Return the graph cached for key if it's fresh, and the entry found.
+
+        stale is an entry already found to need a refresh, so it isn't
+        returned again.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, None
+            self._entries.move_to_end(key)
+            if entry is not stale and self._fresh(entry):
+                self.stats["hits"] += 1
+                return entry.graph, entry
+            return None, entry
+
+    def get(self, groupid, limit=None):
+        """Return the TaskGraph of a group, loading it on a miss."""
+        key = self.key(groupid, limit)
+        graph, entry = self._lookup(key)
+        if graph is not None:
+            return graph
+        return self._loads.do(key, functools.partial(self._load, key, entry))
+
+    def _load(self, key, stale):
+        # Another caller may have loaded the graph since we looked.
+        graph, entry = self._lookup(key, stale)
+        if graph is not None:
+            return graph
+        groupid, limit, _ = key
+        if entry is None:
+            self._count("misses")
+            graph = self.graph_class(groupid, limit=limit, interner=self.interner)
+        else:
+            self._count("refreshes")
+            try:
+                # A new instance, as callers may be using the cached one.
+                graph = copy.copy(entry.graph)
+                graph.fetch_tasks(limit=limit, refresh=True)
+            except Exception as e:
+                self._count("refresh_errors")
+                log.warning("Unable to refresh %s, keeping the cached graph: %s", groupid, e)
+                return entry.graph
+        self._insert(key, self._entry(graph))
+        return graph
+
+    def _entry(self, graph):
+        return CacheEntry(graph=graph, size=estimate_size(graph), loaded=self.clock(), resolved=graph_resolved(graph))
+
+    def _insert(self, key, entry):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous.size
+            if entry.size > self.max_bytes:
+                log.debug("Not caching %s, its %d bytes are over the budget", key[0], entry.size)
+                return
+            self._entries[key] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+                self.stats["evictions"] += 1
+
+    def invalidate(self, groupid):
+        """Forget every cached graph of a group."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == groupid]:
+                self.size -= self._entries.pop(key).size
+
+    def clear(self):
+        """Forget every cached graph."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache():
+    """Return the process-wide GraphCache, creating it with the default settings."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = GraphCache()
+        return _default_cache
+
+
+def set_default_cache(cache):
+    """Replace the process-wide GraphCache, or reset it to the default settings when None."""
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = cache
+
+
+def get_graph(groupid, limit=None):
+    """Return the TaskGraph of a group from the process-wide GraphCache."""
+    return default_cache().get(groupid, limit=limit)
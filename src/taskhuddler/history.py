@@ -0,0 +1,262 @@
+"""Time-windowed queries over cached task graphs.
+
+RunIndex records one compact row per run of every graph in TC_CACHE_DIR,
+and keeps it in a gzipped index file next to the graphs. Queries such as
+"beetmover tasks that started between T1 and T2" are answered from the index,
+and only the graphs holding matching tasks are read from the cache::
+
+    from taskhuddler.history import RunIndex
+
+    index = RunIndex.build()
+    runs = index.runs(start, end, kind="beetmover")
+    tasks = index.tasks(start, end, kind="beetmover")
+
+Runs are looked up by start or resolution time with a bisection of sorted
+arrays, and runs overlapping a window through hourly partitions holding
+every run active during that hour. Only graphs added or modified since the
+index was last saved are read when it's refreshed.
+"""
+
+import bisect
+import datetime
+import functools
+import gzip
+import json
+import logging
+import math
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from .task import Task
+from .utils import cache_dir_path, cached_groupids, parse_datetime
+
+log = logging.getLogger(__name__)
+
+INDEX_FILENAME = "runs.index.gz"
+INDEX_VERSION = 1
+HOUR = 3600
+
+# Positions of the fields in an index row.
+GROUPID, TASK_ID, RUN_ID, KIND, WORKER_TYPE, STATE, STARTED, RESOLVED = range(8)
+
+
+@dataclass
+class IndexedRun:
+    """A run of a cached task, as recorded in the index."""
+
+    groupid: str
+    task_id: str
+    run_id: int
+    kind: str
+    worker_type: str
+    state: str
+    started: datetime.datetime
+    resolved: Optional[datetime.datetime]
+
+
+def _timestamp(value):
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.timestamp()
+
+
+def _datetime(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
+
+
+def index_graph_data(groupid, graphdata):
+    """Return the index rows of the started runs in cached graph data."""
+    rows = list()
+    for data in graphdata:
+        status, definition = data["status"], data["task"]
+        kind = definition.get("tags", {}).get("kind", "")
+        for run in status.get("runs", []):
+            if not run.get("started"):
+                continue
+            resolved = _timestamp(run["resolved"]) if run.get("resolved") else None
+            rows.append([groupid, status["taskId"], run.get("runId"), kind, status.get("workerType"), run.get("state"), _timestamp(run["started"]), resolved])
+    return rows
+
+
+def _index_cached_graph(cache_dir, groupid):
+    path = os.path.join(cache_dir, "{}.json".format(groupid))
+    try:
+        mtime = os.path.getmtime(path)
+        with open(path, "r") as f:
+            return groupid, mtime, index_graph_data(groupid, json.loads(f.read()))
+    except (OSError, ValueError, KeyError) as e:
+        log.warning("Unable to index cached graph %s: %s", groupid, e)
+        return groupid, None, None
+
+
+class RunIndex(object):
+    """An index of the runs in cached task graphs, by time."""
+
+    def __init__(self, cache_dir=None):
+        """init."""
+        self.cache_dir = cache_dir_path(cache_dir)
+        self.graphs = dict()
+        self._rows = None
+
+    @property
+    def path(self):
+        """Return the path of the index file."""
+        return os.path.join(self.cache_dir, INDEX_FILENAME)
+
+    @classmethod
+    def build(cls, cache_dir=None, processes=None):
+        """Load the index of cache_dir, bring it up to date and save it."""
+        index = cls(cache_dir)
+        index.load()
+        if index.refresh(processes=processes):
+            index.save()
+        return index
+
+    def load(self):
+        """Load the saved index, if there is a usable one."""
+        try:
+            with gzip.open(self.path, "rt") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            log.debug("Not loading run index %s: %s", self.path, e)
+            return self
+        if data.get("version") != INDEX_VERSION:
+            return self
+        self.graphs = data["graphs"]
+        self._rows = None
+        return self
+
+    def save(self):
+        """Write the index file."""
+        with gzip.open(self.path, "wt") as f:
+            json.dump({"version": INDEX_VERSION, "graphs": self.graphs}, f, separators=(",", ":"))
+
+    def refresh(self, processes=None):
+        """Index graphs added or modified since the last refresh.
+
+        Graphs are read in a process pool when processes is more than 1.
+        Returns True if the index changed.
+        """
+        groupids = set(cached_groupids(self.cache_dir))
+        stale = [groupid for groupid in self.graphs if groupid not in groupids]
+        for groupid in stale:
+            del self.graphs[groupid]
+        changed = list()
+        for groupid in sorted(groupids):
+            entry = self.graphs.get(groupid)
+            try:
+                mtime = os.path.getmtime(os.path.join(self.cache_dir, "{}.json".format(groupid)))
+            except OSError:
+                continue
+            if entry is None or entry["mtime"] != mtime:
+                changed.append(groupid)
+
+        worker = functools.partial(_index_cached_graph, self.cache_dir)
+        if processes and processes > 1 and len(changed) > 1:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                results = list(pool.map(worker, changed))
+        else:
+            results = [worker(groupid) for groupid in changed]
+        for groupid, mtime, rows in results:
+            if rows is not None:
+                self.graphs[groupid] = {"mtime": mtime, "runs": rows}
+
+        if stale or changed:
+            self._rows = None
+        return bool(stale or changed)
+
+    def _build_lookups(self):
+        self._rows = [row for groupid in sorted(self.graphs) for row in self.graphs[groupid]["runs"]]
+        by_started = sorted(range(len(self._rows)), key=lambda position: self._rows[position][STARTED])
+        self._started = [self._rows[position][STARTED] for position in by_started]
+        self._by_started = by_started
+        resolved = [position for position in range(len(self._rows)) if self._rows[position][RESOLVED] is not None]
+        resolved.sort(key=lambda position: self._rows[position][RESOLVED])
+        self._resolved = [self._rows[position][RESOLVED] for position in resolved]
+        self._by_resolved = resolved
+        self._hours = defaultdict(list)
+        self._unresolved = list()
+        for position, row in enumerate(self._rows):
+            if row[RESOLVED] is None:
+                self._unresolved.append(position)
+                continue
+            for hour in range(int(row[STARTED] // HOUR), int(row[RESOLVED] // HOUR) + 1):
+                self._hours[hour].append(position)
+
+    def __len__(self):
+        """Return the number of indexed runs."""
+        return sum(len(entry["runs"]) for entry in self.graphs.values())
+
+    def _positions(self, start, end, by):
+        if self._rows is None:
+            self._build_lookups()
+        if by == "started":
+            first, last = bisect.bisect_left(self._started, start), bisect.bisect_left(self._started, end)
+            return self._by_started[first:last]
+        if by == "resolved":
+            first, last = bisect.bisect_left(self._resolved, start), bisect.bisect_left(self._resolved, end)
+            return self._by_resolved[first:last]
+        if by != "overlap":
+            raise ValueError("Unknown lookup {}, expected started, resolved or overlap".format(by))
+        positions = set(position for position in self._unresolved if self._rows[position][STARTED] < end)
+        for hour in range(int(start // HOUR), int(math.ceil(end / HOUR))):
+            for position in self._hours.get(hour, ()):
+                row = self._rows[position]
+                if row[STARTED] < end and row[RESOLVED] > start:
+                    positions.add(position)
+        return sorted(positions)
+
+    def runs(self, start, end, kind=None, worker_type=None, state=None, by="started"):
+        """Return IndexedRuns in the window [start, end).
+
+        Arguments:
+            start, end: datetimes or ISO 8601 strings. Naive datetimes are
+                taken to be UTC.
+            kind, worker_type, state: only return runs with these values.
+            by: "started" or "resolved" for runs that started or resolved in
+                the window, "overlap" for runs running at any time during it.
+        """
+        found = list()
+        for position in self._positions(_timestamp(start), _timestamp(end), by):
+            row = self._rows[position]
+            if kind is not None and row[KIND] != kind:
+                continue
+            if worker_type is not None and row[WORKER_TYPE] != worker_type:
+                continue
+            if state is not None and row[STATE] != state:
+                continue
+            found.append(
+                IndexedRun(
+                    groupid=row[GROUPID],
+                    task_id=row[TASK_ID],
+                    run_id=row[RUN_ID],
+                    kind=row[KIND],
+                    worker_type=row[WORKER_TYPE],
+                    state=row[STATE],
+                    started=_datetime(row[STARTED]),
+                    resolved=_datetime(row[RESOLVED]),
+                )
+            )
+        return found
+
+    def tasks(self, start, end, **kwargs):
+        """Return the Tasks with runs matching runs(start, end, **kwargs).
+
+        Only the cached graphs holding matching tasks are read.
+        """
+        wanted = defaultdict(set)
+        for run in self.runs(start, end, **kwargs):
+            wanted[run.groupid].add(run.task_id)
+        tasks = list()
+        for groupid in sorted(wanted):
+            with open(os.path.join(self.cache_dir, "{}.json".format(groupid)), "r") as f:
+                graphdata = json.loads(f.read())
+            tasks.extend(Task.from_dict(data) for data in graphdata if data["status"]["taskId"] in wanted[groupid])
+        return tasks
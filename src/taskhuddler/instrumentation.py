@@ -0,0 +1,189 @@
+"""Optional profiling hooks, and the active record/replay cassette.
+
+Hooks are callables taking an event name and a dictionary of event data.
+When no hooks are registered, instrumented code only pays for a check of an
+empty list.
+
+Events emitted:
+    api_call: a Queue API call, with ``method``, ``duration``, ``bytes`` and,
+        for listTaskGroup, ``tasks``.
+    cache_read / cache_write: TC_CACHE_DIR access, with ``path``,
+        ``duration`` and ``bytes``.
+    build_tasks: Task objects created from task data, with ``tasks`` and
+        ``duration``.
+    aggregate: a TaskGraph aggregate, with ``name`` and ``duration``.
+
+.. code-block:: python
+
+    from taskhuddler.instrumentation import Recorder
+
+    with Recorder() as recorder:
+        graph = TaskGraph(groupid)
+    print(recorder.summary())
+
+Queue calls are also where a taskhuddler.cassette.Cassette, once activated
+with set_cassette, records or replays responses.
+"""
+
+import functools
+import json
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+_hooks = list()
+_cassette = None
+
+
+def add_hook(hook):
+    """Register hook(event, data) to receive instrumentation events."""
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    """Stop sending instrumentation events to hook."""
+    _hooks.remove(hook)
+
+
+def set_cassette(cassette):
+    """Record or replay Queue calls with cassette, or stop doing so when None."""
+    global _cassette
+    _cassette = cassette
+
+
+def enabled():
+    """Return True if any hooks are registered."""
+    return bool(_hooks)
+
+
+def emit(event, **data):
+    """Send an event to all registered hooks."""
+    for hook in list(_hooks):
+        try:
+            hook(event, data)
+        except Exception:
+            log.exception("Instrumentation hook %r failed", hook)
+
+
+@contextmanager
+def _timer(event, data):
+    start = time.perf_counter()
+    try:
+        yield data
+    finally:
+        data["duration"] = time.perf_counter() - start
+        emit(event, **data)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return dict()
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_null_timer = _NullTimer()
+
+
+def timed(event, **data):
+    """Time the enclosed block and emit event with its duration.
+
+    The context manager returns the event data dictionary, so extra fields
+    can be added to it. It does nothing when no hooks are registered.
+    """
+    if not _hooks:
+        return _null_timer
+    return _timer(event, data)
+
+
+def payload_size(payload):
+    """Estimate the size in bytes of a Queue API response."""
+    if isinstance(payload, dict) and "response" in payload:
+        return len(getattr(payload["response"], "content", b""))
+    if isinstance(payload, (bytes, str)):
+        return len(payload)
+    return len(json.dumps(payload, default=str))
+
+
+def _api_call_data(method, outcome, data):
+    data["bytes"] = payload_size(outcome)
+    if method == "listTaskGroup":
+        data["tasks"] = len(outcome.get("tasks", []))
+
+
+def call_api(method, func, *args, **kwargs):
+    """Call a Queue API method, emitting an api_call event."""
+    if _cassette is not None:
+        func = functools.partial(_cassette.play, method, func)
+    if not _hooks:
+        return func(*args, **kwargs)
+    with _timer("api_call", {"method": method}) as data:
+        outcome = func(*args, **kwargs)
+        _api_call_data(method, outcome, data)
+    return outcome
+
+
+async def call_api_async(method, func, *args, **kwargs):
+    """Await a Queue API method, emitting an api_call event."""
+    if _cassette is not None:
+        func = functools.partial(_cassette.play_async, method, func)
+    if not _hooks:
+        return await func(*args, **kwargs)
+    with _timer("api_call", {"method": method}) as data:
+        outcome = await func(*args, **kwargs)
+        _api_call_data(method, outcome, data)
+    return outcome
+
+
+def aggregate(func):
+    """Emit an aggregate event with the duration of the decorated method."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _hooks:
+            return func(*args, **kwargs)
+        with _timer("aggregate", {"name": func.__name__}):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+class Recorder(object):
+    """Hook collecting counts and total durations of events.
+
+    Can be used as a context manager, registering itself on entry.
+    """
+
+    def __init__(self):
+        """init."""
+        self.events = list()
+
+    def __call__(self, event, data):
+        """Record an event."""
+        self.events.append((event, data))
+
+    def __enter__(self):
+        """Register as a hook."""
+        add_hook(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        """Unregister as a hook."""
+        remove_hook(self)
+        return False
+
+    def summary(self):
+        """Return count, duration and bytes totals, keyed by event and method or name."""
+        totals = defaultdict(lambda: {"count": 0, "duration": 0.0, "bytes": 0})
+        for event, data in self.events:
+            key = event
+            if "method" in data or "name" in data:
+                key = "{}:{}".format(event, data.get("method", data.get("name")))
+            totals[key]["count"] += 1
+            totals[key]["duration"] += data.get("duration", 0.0)
+            totals[key]["bytes"] += data.get("bytes", 0)
+        return dict(totals)
@@ -0,0 +1,153 @@
+"""Parallel analysis over many cached task graphs.
+
+Loading a graph from the TC_CACHE_DIR cache is CPU bound (JSON decoding,
+dataclass construction, timestamp parsing), so analysing a large number of
+graphs is spread over a process pool. Each worker loads one graph, reduces
+it to a compact summary and only that summary is sent back to the parent,
+where the partial results are merged.
+"""
+
+import functools
+import json
+import logging
+import os
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from .graph import TaskGraph
+from .timings import TimingAnalyzer
+from .utils import cache_dir_path, cached_groupids
+
+log = logging.getLogger(__name__)
+
+
+def load_cached_graph(groupid, cache_dir=None):
+    """Load a TaskGraph from the cache directory without contacting the queue."""
+    with open(os.path.join(cache_dir_path(cache_dir), "{}.json".format(groupid)), "r") as f:
+        return TaskGraph.from_data(groupid, json.loads(f.read()))
+
+
+def task_timings(graph):
+    """Summarise task_timings as {(kind, platform): [count, total, min, max]} in seconds."""
+    summary = dict()
+    for timing in graph.task_timings():
+        key = (timing["kind"], timing["platform"])
+        duration = timing["duration"]
+        if key not in summary:
+            summary[key] = [1, duration, duration, duration]
+            continue
+        entry = summary[key]
+        entry[0] += 1
+        entry[1] += duration
+        entry[2] = min(entry[2], duration)
+        entry[3] = max(entry[3], duration)
+    return summary
+
+
+def merge_task_timings(first, second):
+    """Merge two task_timings summaries."""
+    merged = dict(first)
+    for key, entry in second.items():
+        if key not in merged:
+            merged[key] = list(entry)
+            continue
+        current = merged[key]
+        merged[key] = [current[0] + entry[0], current[1] + entry[1], min(current[2], entry[2]), max(current[3], entry[3])]
+    return merged
+
+
+def current_states(graph):
+    """Count the current states of the tasks in the graph."""
+    return Counter(graph.current_states())
+
+
+def merge_current_states(first, second):
+    """Merge two current_states counts."""
+    return first + second
+
+
+def compute_time(graph):
+    """Summarise the compute time metrics of a graph, in seconds."""
+    return {
+        "graphs": 1,
+        "tasks": len(graph.tasklist),
+        "total_compute_time": graph.total_compute_time().total_seconds(),
+        "total_compute_wall_time": graph.total_compute_wall_time().total_seconds(),
+    }
+
+
+def merge_sums(first, second):
+    """Merge two dictionaries by summing their values."""
+    merged = defaultdict(int, first)
+    for key, value in second.items():
+        merged[key] += value
+    return dict(merged)
+
+
+def timing_percentiles(graph):
+    """Return a TimingAnalyzer grouped by kind and platform."""
+    return TimingAnalyzer().add_graph(graph)
+
+
+def merge_analyzers(first, second):
+    """Merge two TimingAnalyzers."""
+    return first.merge(second)
+
+
+REDUCERS = {
+    "task_timings": (task_timings, merge_task_timings),
+    "current_states": (current_states, merge_current_states),
+    "compute_time": (compute_time, merge_sums),
+    "timing_percentiles": (timing_percentiles, merge_analyzers),
+}
+
+
+def _reduce_cached_graph(reducer, cache_dir, groupid):
+    try:
+        graph = load_cached_graph(groupid, cache_dir)
+    except (OSError, ValueError) as e:
+        log.warning("Unable to load cached graph %s: %s", groupid, e)
+        return groupid, None
+    return groupid, reducer(graph)
+
+
+def analyse_cached_graphs(reducer, groupids=None, merge=None, cache_dir=None, processes=None, chunksize=1):
+    """Map reducer over cached graphs in a process pool.
+
+    Arguments:
+        reducer: the name of a built-in reducer ("task_timings",
+            "current_states", "compute_time" or "timing_percentiles"), or a picklable function
+            taking a TaskGraph and returning a compact, picklable summary.
+        groupids: the graphs to analyse, defaulting to every graph in the cache.
+        merge: a function merging two summaries. Built-in reducers default
+            to their own merge. Without one, a dictionary of group id to
+            summary is returned.
+        cache_dir: defaults to TC_CACHE_DIR.
+        processes: the number of worker processes, defaulting to the CPU count.
+
+    Graphs that can't be loaded are logged and skipped.
+    """
+    if isinstance(reducer, str):
+        reducer, default_merge = REDUCERS[reducer]
+        merge = merge or default_merge
+    cache_dir = cache_dir_path(cache_dir)
+    if groupids is None:
+        groupids = cached_groupids(cache_dir)
+
+    worker = functools.partial(_reduce_cached_graph, reducer, cache_dir)
+    results = dict()
+    merged = None
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for groupid, summary in pool.map(worker, groupids, chunksize=chunksize):
+            if summary is None:
+                continue
+            if merge is None:
+                results[groupid] = summary
+            elif merged is None:
+                merged = summary
+            else:
+                merged = merge(merged, summary)
+
+    if merge is None:
+        return results
+    return merged
@@ -0,0 +1,143 @@
+"""Scan many artifacts, decoding them in a process pool.
+
+Downloads are I/O bound and run concurrently on the event loop, sharing one
+client session. They are made like TaskArtifact.fetch, so a Cassette records
+and replays them. Decoding large JSON artifacts and extracting what's needed
+from them is CPU bound, so the raw bytes are handed to a process pool and
+only the extracted results come back::
+
+    from taskhuddler.scan import scan_tasks
+
+    def signing_formats(manifest):
+        return sorted({fmt for entry in manifest.values() for fmt in entry.get("formats", [])})
+
+    for result in scan_tasks(graph.filter_tasks_by_kind("beetmover"), "manifest.json", signing_formats):
+        print(result.task_id, result.result, result.error)
+
+extract must be picklable, so a module level function. It receives the
+decoded JSON for JSON artifacts, and the text of any other artifact.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Optional
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 16
+
+
+@dataclass
+class ScanResult:
+    """The outcome of scanning one artifact."""
+
+    task_id: str
+    run_id: Optional[int]
+    name: str
+    result: Any = None
+    error: Optional[str] = None
+
+
+def decode_artifact(name, content, content_type=None):
+    """Decode the bytes of an artifact, as JSON when it looks like JSON."""
+    if name.endswith(".json") or (content_type or "").startswith("application/json"):
+        return json.loads(content)
+    return content.decode("utf-8", errors="replace")
+
+
+def _extract(extract, name, content_type, content):
+    return extract(decode_artifact(name, content, content_type))
+
+
+async def _download(artifact, queue):
+    return await artifact.read(queue=queue)
+
+
+async def scan_artifacts_async(artifacts, extract, queue=None, concurrency=DEFAULT_CONCURRENCY, executor=None):
+    """Download artifacts and extract from them, yielding ScanResults as they complete.
+
+    Arguments:
+        artifacts: TaskArtifacts, from taskhuddler.task or taskhuddler.aio.task.
+        extract: a picklable function of the decoded artifact.
+        queue: a taskcluster.aio Queue with a session, see
+            taskhuddler.aio.task.queue_session. One is created by default.
+        concurrency: the number of concurrent downloads. Twice as many
+            artifacts at most are held in memory waiting to be decoded.
+        executor: runs the decoding, defaulting to a new ProcessPoolExecutor.
+
+    Failed downloads and extractions are reported in ScanResult.error.
+    """
+    from .aio.task import TaskArtifact, queue_session
+
+    loop = asyncio.get_running_loop()
+    artifacts = [artifact if isinstance(artifact, TaskArtifact) else TaskArtifact(**asdict(artifact)) for artifact in artifacts]
+    downloads = asyncio.Semaphore(concurrency)
+    pending = asyncio.Semaphore(concurrency * 2)
+
+    async def scan(artifact, queue, executor):
+        found = ScanResult(task_id=artifact.task_id, run_id=artifact.run_id, name=artifact.name)
+        async with pending:
+            try:
+                async with downloads:
+                    content = await _download(artifact, queue)
+                found.result = await loop.run_in_executor(executor, functools.partial(_extract, extract, artifact.name, artifact.content_type, content))
+            except Exception as e:
+                log.debug("Scanning %s of %s failed: %r", artifact.name, artifact.task_id, e)
+                found.error = repr(e)
+        return found
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, concurrency))
+    try:
+        async with queue_session(queue) as queue:
+            futures = [asyncio.ensure_future(scan(artifact, queue, executor)) for artifact in artifacts]
+            try:
+                for future in asyncio.as_completed(futures):
+                    yield await future
+            finally:
+                for future in futures:
+                    future.cancel()
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+
+async def _collect(artifacts, extract, **kwargs):
+    return [result async for result in scan_artifacts_async(artifacts, extract, **kwargs)]
+
+
+def scan_artifacts(artifacts, extract, concurrency=DEFAULT_CONCURRENCY, executor=None):
+    """Return the ScanResults of artifacts, in completion order."""
+    return asyncio.run(_collect(artifacts, extract, concurrency=concurrency, executor=executor))
+
+
+async def _list_and_scan(tasks, pattern, extract, concurrency, executor):
+    from .aio.task import Task, queue_session
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with queue_session() as queue:
+
+        async def list_matching(task):
+            async with semaphore:
+                return await Task.from_sync(task).artifacts_matching(pattern, queue=queue)
+
+        listings = await asyncio.gather(*[list_matching(task) for task in tasks])
+        artifacts = [artifact for listing in listings for artifact in listing]
+        return await _collect(artifacts, extract, queue=queue, concurrency=concurrency, executor=executor)
+
+
+def scan_tasks(tasks, pattern, extract, concurrency=DEFAULT_CONCURRENCY, executor=None):
+    """Scan the artifacts of tasks whose names contain pattern.
+
+    tasks are Task objects, for example from TaskGraph.tasks(). Only the
+    latest run of each task is scanned. Returns ScanResults in completion
+    order.
+    """
+    return asyncio.run(_list_and_scan([task for task in tasks if task.status.runs], pattern, extract, concurrency, executor))
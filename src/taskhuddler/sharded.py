@@ -0,0 +1,196 @@
+"""Fetch huge task groups, processing pages in a pool of worker processes.
+
+listTaskGroup pages have to be fetched one after the other, as each
+continuation token comes with the previous page. While the next page is
+fetched, worker processes turn the pages already received into compact
+shards: the GraphStats of their tasks, their dataframe columns and,
+optionally, the result of a reducer. The parent merges the shards into a
+ShardedTaskGraph::
+
+    from taskhuddler.sharded import fetch_sharded
+
+    graph = fetch_sharded("eShtp2faQgy4iZZOIhXvhw", processes=8)
+    print(graph.summary().total_compute_time, graph.current_states())
+    df = graph.to_dataframe()
+
+The aggregates covered by GraphStats and the dataframe are answered from
+the shards. Task objects are only built, in the parent, when tasklist is
+first used.
+"""
+
+import asyncio
+import functools
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from . import instrumentation
+from .graph import DATAFRAME_COLUMNS, TaskGraph
+from .stats import GraphStats, compute_stats
+
+
+@dataclass
+class Shard:
+    """The summary of one page of tasks, built in a worker process."""
+
+    stats: GraphStats
+    columns: dict
+    reduction: Any = None
+
+
+def summarise_page(graphdata, reducer=None):
+    """Return the Shard of a list of tasks in listTaskGroup format."""
+    graph = TaskGraph.from_data(None, graphdata)
+    return Shard(stats=compute_stats(graph.tasklist), columns=graph._dataframe_columns(), reduction=reducer(graph) if reducer else None)
+
+
+class ShardedTaskGraph(TaskGraph):
+    """A TaskGraph assembled from shards.
+
+    summary(), the aggregates it covers and to_dataframe() use the merged
+    shards. Like summary(), total_compute_wall_time is the true union of the
+    run intervals. Everything else builds tasklist from the fetched pages
+    on first use.
+    """
+
+    def __init__(self, groupid, shards, pages=None, merge=None):
+        """init."""
+        self.groupid = groupid
+        self.cache_file = None
+        self._pages = pages
+        self._tasklist = None
+        self.stats = GraphStats()
+        self.columns = {name: list() for name in DATAFRAME_COLUMNS}
+        self.reduction = None
+        for position, shard in enumerate(shards):
+            self.stats = shard.stats if position == 0 else self.stats.merge(shard.stats)
+            for name in DATAFRAME_COLUMNS:
+                self.columns[name].extend(shard.columns[name])
+            if merge is not None:
+                self.reduction = shard.reduction if position == 0 else merge(self.reduction, shard.reduction)
+
+    def __repr__(self):
+        """repr."""
+        return "<ShardedTaskGraph {}>".format(self.groupid)
+
+    @property
+    def tasklist(self):
+        """Return the Task objects, built on first use."""
+        if self._tasklist is None:
+            if self._pages is None:
+                raise RuntimeError("Tasks of {} were not kept, fetch with keep_tasks=True".format(self.groupid))
+            self._tasklist = self._build_tasks([data for page in self._pages for data in page])
+        return self._tasklist
+
+    @tasklist.setter
+    def tasklist(self, value):
+        self._tasklist = value
+
+    def fetch_tasks(self, limit=None, refresh=False):
+        """Fetch the tasks again, without sharding."""
+        self._pages = [self._fetch_tasks_from_queue(limit)]
+        self._tasklist = None
+        shard = summarise_page(self._pages[0])
+        self.stats, self.columns = shard.stats, shard.columns
+
+    def summary(self):
+        """Return the merged GraphStats of the shards."""
+        return self.stats
+
+    @property
+    def completed(self):
+        """Have all the tasks completed."""
+        return self.stats.completed
+
+    def current_states(self):
+        """Count the occurences of current states."""
+        return defaultdict(int, self.stats.states)
+
+    @property
+    def earliest_start_time(self):
+        """Find the earliest start time for any task in the graph."""
+        if self.stats.earliest_start_time is None:
+            raise ValueError("No task has started")
+        return self.stats.earliest_start_time
+
+    @property
+    def latest_finished_time(self):
+        """Find the latest finish time for resolved tasks."""
+        if self.stats.latest_finished_time is None:
+            raise ValueError("No task has resolved")
+        return self.stats.latest_finished_time
+
+    def total_compute_time(self):
+        """Sum of all the task run times, as timedelta."""
+        return self.stats.total_compute_time
+
+    def total_compute_wall_time(self):
+        """Return the total time spent running tasks, as the union of run intervals."""
+        return self.stats.total_compute_wall_time
+
+    def task_timings(self):
+        """For every finished task that has fields we group on, report duration."""
+        return iter(self.stats.task_timings)
+
+    def _dataframe_columns(self):
+        return {name: list(values) for name, values in self.columns.items()}
+
+
+async def fetch_sharded_async(groupid, processes=None, keep_tasks=True, reducer=None, merge=None, executor=None, queue=None):
+    """Fetch a task group, summarising its pages in worker processes.
+
+    Arguments:
+        groupid: the task group id.
+        processes: the number of worker processes, defaulting to the CPU
+            count. At most twice as many pages wait to be processed.
+        keep_tasks: keep the fetched pages so tasklist can be built on
+            demand. Without them, only the shard aggregates are available.
+        reducer: a picklable function taking a TaskGraph of one page and
+            returning a compact summary, merged with merge into
+            ShardedTaskGraph.reduction. See taskhuddler.parallel.REDUCERS.
+        executor: runs summarise_page, defaulting to a new
+            ProcessPoolExecutor.
+        queue: a taskcluster.aio Queue, see
+            taskhuddler.aio.task.queue_session.
+    """
+    from .aio.task import queue_session
+
+    if reducer is not None and merge is None:
+        raise ValueError("A reducer needs a merge function")
+    loop = asyncio.get_running_loop()
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=processes)
+    max_pending = 2 * (processes or os.cpu_count() or 1)
+    pages = list() if keep_tasks else None
+    shards = list()
+    pending = list()
+    try:
+        async with queue_session(queue) as queue:
+            query = {}
+            while True:
+                outcome = await instrumentation.call_api_async("listTaskGroup", queue.listTaskGroup, groupid, query=dict(query))
+                page = outcome.get("tasks", [])
+                if keep_tasks:
+                    pages.append(page)
+                pending.append(loop.run_in_executor(executor, functools.partial(summarise_page, page, reducer)))
+                if len(pending) >= max_pending:
+                    shards.append(await pending.pop(0))
+                if not outcome.get("continuationToken"):
+                    break
+                query["continuationToken"] = outcome["continuationToken"]
+            shards.extend(await asyncio.gather(*pending))
+    finally:
+        if own_executor:
+            executor.shutdown()
+    return ShardedTaskGraph(groupid, shards, pages=pages, merge=merge)
+
+
+def fetch_sharded(groupid, processes=None, keep_tasks=True, reducer=None, merge=None, executor=None):
+    """Fetch a task group, summarising its pages in worker processes.
+
+    See fetch_sharded_async.
+    """
+    return asyncio.run(fetch_sharded_async(groupid, processes=processes, keep_tasks=keep_tasks, reducer=reducer, merge=merge, executor=executor))
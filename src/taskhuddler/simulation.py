@@ -0,0 +1,169 @@
+"""Replay a task graph against worker pools of a chosen size.
+
+Each task runs for as long as its recorded runs took, once every dependency
+in the graph has resolved and a worker of its pool is free. Ready tasks wait
+in one queue per pool, highest priority first and then in the order they
+became ready. Task completions are kept in a heap of events, so a graph of n
+tasks and e dependencies is simulated in O((n + e) log n)::
+
+    result = graph.simulate(workers={"gecko-t-linux-large": 200}, default_workers=50)
+    print(result.wall_time, [task.label for task in result.critical_path])
+
+Pools are keyed by status.workerType unless key is given. Pools left out of
+workers get default_workers, and None means as many workers as needed.
+Tasks without any run take no time.
+"""
+
+import datetime
+import heapq
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+# Taskcluster priorities, from highest to lowest. "normal", the default, is
+# the same as "lowest".
+PRIORITIES = ("highest", "very-high", "high", "medium", "low", "very-low", "lowest")
+PRIORITY_RANKS = {name: rank for rank, name in enumerate(PRIORITIES)}
+PRIORITY_RANKS["normal"] = PRIORITY_RANKS["lowest"]
+
+
+def priority_rank(priority):
+    """Return the rank of a priority, 0 being the highest. Unknown priorities rank lowest."""
+    return PRIORITY_RANKS.get(priority, PRIORITY_RANKS["lowest"])
+
+
+def run_time(task):
+    """Return the time taken by every run of a task, retries included, in seconds."""
+    return sum(duration.total_seconds() for duration in task.status.run_durations())
+
+
+def last_run_time(task):
+    """Return the time taken by the last run of a task, in seconds."""
+    durations = task.status.run_durations()
+    return durations[-1].total_seconds() if durations else 0.0
+
+
+@dataclass
+class SimulationResult:
+    """The outcome of a simulated graph.
+
+    starts and finishes are keyed by task id, in seconds from the start of
+    the simulation. waited is the total time tasks spent ready but waiting
+    for a worker, in seconds, per pool.
+    """
+
+    wall_time: datetime.timedelta
+    critical_path: List = field(default_factory=list)
+    starts: Dict[str, float] = field(default_factory=dict)
+    finishes: Dict[str, float] = field(default_factory=dict)
+    waited: Dict[str, float] = field(default_factory=dict)
+
+
+def _pool_sizes(pools, workers, default_workers):
+    sizes = dict()
+    for pool in set(pools):
+        size = (workers or {}).get(pool, default_workers)
+        if size is not None and size < 1:
+            raise ValueError("Worker pool {} needs at least one worker".format(pool))
+        sizes[pool] = size
+    return sizes
+
+
+def simulate(graph, workers=None, default_workers=None, duration=run_time, priority=None, key=None):
+    """Simulate running a TaskGraph with the given worker pools.
+
+    Arguments:
+        graph: the TaskGraph to replay.
+        workers: a {pool: number of workers} dictionary.
+        default_workers: the number of workers of the other pools, None for
+            as many as needed.
+        duration: a function returning the time a task takes, in seconds,
+            defaulting to run_time.
+        priority: a function returning the priority of a task, defaulting
+            to its task.priority.
+        key: a function returning the pool of a task, defaulting to its
+            status.workerType.
+
+    The critical path follows, back from the last task to finish, what each
+    task waited for: the dependency that resolved last or, if the task then
+    had to wait for a worker, the task that freed it. Returns a
+    SimulationResult.
+    """
+    tasks = graph.tasklist
+    index = graph.dependency_index()
+    pools = [key(task) if key else task.status.workerType for task in tasks]
+    durations = [duration(task) for task in tasks]
+    ranks = [priority_rank(priority(task) if priority else task.task.priority) for task in tasks]
+    free = _pool_sizes(pools, workers, default_workers)
+
+    waiting = [len(parents) for parents in index.parents]
+    starts = [None] * len(tasks)
+    finishes = [None] * len(tasks)
+    # The task whose completion let each task start.
+    causes = [None] * len(tasks)
+    queues = defaultdict(list)
+    waited = defaultdict(float)
+    events = list()
+
+    def start(position, now, cause):
+        starts[position] = now
+        causes[position] = cause
+        heapq.heappush(events, (now + durations[position], position))
+
+    def make_ready(position, now, cause):
+        if free[pools[position]] is None:
+            start(position, now, cause)
+        else:
+            heapq.heappush(queues[pools[position]], (ranks[position], now, position, cause))
+
+    def dispatch(pool, now, freed_by):
+        queue = queues[pool]
+        while queue and free[pool]:
+            _, ready, position, cause = heapq.heappop(queue)
+            free[pool] -= 1
+            waited[pool] += now - ready
+            start(position, now, cause if ready == now else freed_by)
+
+    for position, count in enumerate(waiting):
+        if not count:
+            make_ready(position, 0.0, None)
+    for pool in list(queues):
+        dispatch(pool, 0.0, None)
+
+    while events:
+        now = events[0][0]
+        # Pools with workers freed or tasks made ready, and a task that freed a worker.
+        touched = dict()
+        while events and events[0][0] == now:
+            _, position = heapq.heappop(events)
+            finishes[position] = now
+            pool = pools[position]
+            if free[pool] is not None:
+                free[pool] += 1
+                if touched.get(pool) is None:
+                    touched[pool] = position
+            for child in index.children[position]:
+                waiting[child] -= 1
+                if not waiting[child]:
+                    make_ready(child, now, position)
+                    touched.setdefault(pools[child], None)
+        for pool, freed_by in touched.items():
+            if free[pool] is not None:
+                dispatch(pool, now, freed_by)
+
+    finished = [position for position, finish in enumerate(finishes) if finish is not None]
+    if not finished:
+        return SimulationResult(wall_time=datetime.timedelta(0))
+    path = list()
+    position = max(finished, key=finishes.__getitem__)
+    wall_time = finishes[position]
+    while position is not None:
+        path.append(tasks[position])
+        position = causes[position]
+    return SimulationResult(
+        wall_time=datetime.timedelta(seconds=wall_time),
+        critical_path=list(reversed(path)),
+        starts={tasks[position].taskId: starts[position] for position in finished},
+        finishes={tasks[position].taskId: finishes[position] for position in finished},
+        waited=dict(waited),
+    )
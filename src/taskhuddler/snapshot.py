@@ -0,0 +1,369 @@
+"""Binary, memory-mapped snapshots of task graphs.
+
+A snapshot stores the per task and per run data of a TaskGraph as columns
+of fixed width integers, so opening one only maps the file and reads a small
+header. Pages of the file are shared by every process on the host that maps
+it. Task objects are decoded from the embedded task data on demand::
+
+    graph.to_snapshot("/tmp/cache/eShtp2faQgy4iZZOIhXvhw.snapshot")
+
+    from taskhuddler.snapshot import open_snapshot
+
+    with open_snapshot("/tmp/cache/eShtp2faQgy4iZZOIhXvhw.snapshot") as snapshot:
+        print(snapshot.current_states(), snapshot.total_compute_time())
+        task = snapshot.get_task("A-8AqzvvRsqH9b0VHBXYjA")
+
+Layout: an 8 byte magic, the length of a JSON header as a little endian
+unsigned 64 bit integer, the header, then 8 byte aligned sections. The
+header holds the group id, counts, category tables and the offset, length
+and array typecode of every section. Strings are stored as a section of
+offsets and a section of UTF-8 data. Timestamps are milliseconds since the
+epoch, with MISSING for absent values.
+"""
+
+import array
+import datetime
+import json
+import mmap
+import struct
+import sys
+from collections import defaultdict
+from dataclasses import asdict
+
+from .graph import DATAFRAME_COLUMNS, TaskGraph
+from .task import Task
+from .utils import parse_datetime
+
+MAGIC = b"THSNAP\x00\x01"
+VERSION = 1
+MISSING = -(2**63)
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+MILLISECOND = datetime.timedelta(milliseconds=1)
+CATEGORIES = ("kind", "platform", "worker_type", "state")
+TIMESTAMPS = ("scheduled", "started", "resolved")
+
+
+def _milliseconds(value):
+    if not value:
+        return MISSING
+    return (parse_datetime(value) - EPOCH) // MILLISECOND
+
+
+def _format_timestamp(milliseconds):
+    if milliseconds == MISSING:
+        return None
+    when = EPOCH + datetime.timedelta(milliseconds=milliseconds)
+    return "{}.{:03d}Z".format(when.strftime("%Y-%m-%dT%H:%M:%S"), when.microsecond // 1000)
+
+
+class _Categories(object):
+    def __init__(self):
+        self.values = list()
+        self.codes = dict()
+
+    def code(self, value):
+        if value is None:
+            return -1
+        if value not in self.codes:
+            self.codes[value] = len(self.values)
+            self.values.append(value)
+        return self.codes[value]
+
+
+def _string_sections(name, values):
+    offsets = array.array("q", [0])
+    data = bytearray()
+    for value in values:
+        data.extend((value or "").encode("utf-8"))
+        offsets.append(len(data))
+    return {name + ".offsets": offsets, name + ".data": array.array("B", bytes(data))}
+
+
+def write_snapshot(graph, path):
+    """Write the tasks of a TaskGraph to a snapshot file."""
+    categories = {name: _Categories() for name in CATEGORIES}
+    tasks = graph.tasklist
+    positions = {task.taskId: position for position, task in enumerate(tasks)}
+    columns = {name: array.array("i") for name in CATEGORIES}
+    columns.update(
+        {
+            "run_offsets": array.array("q", [0]),
+            "dep_offsets": array.array("q", [0]),
+            "dep_targets": array.array("i"),
+            "run_id": array.array("i"),
+            "run_state": array.array("i"),
+            "task_order": array.array("i", sorted(range(len(tasks)), key=lambda position: tasks[position].taskId)),
+        }
+    )
+    for name in TIMESTAMPS:
+        columns[name] = array.array("q")
+    worker_ids = list()
+    definitions = list()
+
+    for task in tasks:
+        definition, status = task.task, task.status
+        platform = ((definition.extra.get("treeherder") or {}).get("machine") or {}).get("platform")
+        columns["kind"].append(categories["kind"].code(definition.tags.get("kind")))
+        columns["platform"].append(categories["platform"].code(platform))
+        columns["worker_type"].append(categories["worker_type"].code(status.workerType))
+        columns["state"].append(categories["state"].code(status.state))
+        for run in status.runs:
+            columns["run_id"].append(run["runId"])
+            columns["run_state"].append(categories["state"].code(run.get("state")))
+            for name in TIMESTAMPS:
+                columns[name].append(_milliseconds(run.get(name)))
+            worker_ids.append(run.get("workerId"))
+        columns["run_offsets"].append(len(columns["run_id"]))
+        columns["dep_targets"].extend(positions.get(dependency, -1) for dependency in definition.dependencies)
+        columns["dep_offsets"].append(len(columns["dep_targets"]))
+        definitions.append(json.dumps({"status": asdict(status), "task": asdict(definition)}, separators=(",", ":")))
+
+    columns.update(_string_sections("task_id", [task.taskId for task in tasks]))
+    columns.update(_string_sections("name", [task.task.metadata.get("name") for task in tasks]))
+    columns.update(_string_sections("worker_id", worker_ids))
+    columns.update(_string_sections("definition", definitions))
+
+    sections = dict()
+    offset = 0
+    for name, values in columns.items():
+        length = len(values) * values.itemsize
+        sections[name] = [offset, length, values.typecode]
+        offset += length + (-length % 8)
+    header = {
+        "version": VERSION,
+        "byteorder": sys.byteorder,
+        "groupid": graph.groupid,
+        "task_count": len(tasks),
+        "run_count": len(columns["run_id"]),
+        "categories": {name: categories[name].values for name in CATEGORIES},
+        "sections": sections,
+    }
+    encoded = json.dumps(header).encode("utf-8")
+    start = len(MAGIC) + 8 + len(encoded)
+    start += -start % 8
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(encoded)))
+        f.write(encoded)
+        f.write(b"\0" * (start - f.tell()))
+        for name, values in columns.items():
+            data = values.tobytes()
+            f.write(data)
+            f.write(b"\0" * (-len(data) % 8))
+
+
+class SnapshotGraph(TaskGraph):
+    """A TaskGraph backed by a memory-mapped snapshot.
+
+    Columns are exposed as memoryviews over the mapped file. The aggregates
+    read them directly, while tasklist and the methods using it decode
+    every Task on first use. Close the snapshot, or use it as a context
+    manager, to unmap the file.
+    """
+
+    def __init__(self, path):
+        """init."""
+        self.path = path
+        self.cache_file = None
+        self._tasklist = None
+        self._tasks = dict()
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        if bytes(view[: len(MAGIC)]) != MAGIC:
+            view.release()
+            self._mmap.close()
+            raise ValueError("{} is not a taskhuddler snapshot".format(path))
+        (header_length,) = struct.unpack_from("<Q", self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        header_end = header_start + header_length
+        self.header = json.loads(bytes(view[header_start:header_end]))
+        if self.header["version"] != VERSION or self.header["byteorder"] != sys.byteorder:
+            view.release()
+            self._mmap.close()
+            raise ValueError("Unsupported snapshot {}".format(path))
+        base = header_end + (-header_end % 8)
+        self._views = [view]
+        self.columns = dict()
+        for name, (offset, length, typecode) in self.header["sections"].items():
+            section_start = base + offset
+            section_end = section_start + length
+            section = view[section_start:section_end]
+            self._views.append(section)
+            self.columns[name] = section if typecode == "B" else section.cast(typecode)
+            self._views.append(self.columns[name])
+        self.groupid = self.header["groupid"]
+        self.categories = self.header["categories"]
+
+    def close(self):
+        """Release the column views and unmap the file."""
+        self.columns = dict()
+        for view in reversed(self._views):
+            view.release()
+        self._views = list()
+        self._mmap.close()
+
+    def __enter__(self):
+        """Return the snapshot."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close the snapshot."""
+        self.close()
+        return False
+
+    def __repr__(self):
+        """repr."""
+        return "<SnapshotGraph {}>".format(self.groupid)
+
+    def __len__(self):
+        """Return the number of tasks."""
+        return self.header["task_count"]
+
+    def _string(self, name, position):
+        offsets = self.columns[name + ".offsets"]
+        start, end = offsets[position], offsets[position + 1]
+        return bytes(self.columns[name + ".data"][start:end]).decode("utf-8")
+
+    def _category(self, name, code):
+        return self.categories[name][code] if code >= 0 else None
+
+    def task_id(self, position):
+        """Return the task id of the task at position."""
+        return self._string("task_id", position)
+
+    def position(self, task_id):
+        """Return the position of a task, by binary search of the sorted task ids."""
+        order = self.columns["task_order"]
+        low, high = 0, len(order)
+        while low < high:
+            middle = (low + high) // 2
+            if self.task_id(order[middle]) < task_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(order) and self.task_id(order[low]) == task_id:
+            return order[low]
+        raise KeyError(task_id)
+
+    def task(self, position):
+        """Decode the Task at position."""
+        if position not in self._tasks:
+            self._tasks[position] = Task.from_dict(json.loads(self._string("definition", position)))
+        return self._tasks[position]
+
+    def get_task(self, task_id):
+        """Decode the Task with the given id."""
+        return self.task(self.position(task_id))
+
+    def dependencies(self, position):
+        """Return the positions of the dependencies of a task within the graph."""
+        offsets, targets = self.columns["dep_offsets"], self.columns["dep_targets"]
+        return [targets[entry] for entry in range(offsets[position], offsets[position + 1]) if targets[entry] >= 0]
+
+    @property
+    def tasklist(self):
+        """Return every Task, decoded on first use."""
+        if self._tasklist is None:
+            self._tasklist = [self.task(position) for position in range(len(self))]
+        return self._tasklist
+
+    @tasklist.setter
+    def tasklist(self, value):
+        self._tasklist = value
+
+    def fetch_tasks(self, limit=None, refresh=False):
+        """Snapshots are read only."""
+        raise RuntimeError("Snapshots can't be refreshed, fetch a TaskGraph instead")
+
+    def _last_runs(self):
+        offsets = self.columns["run_offsets"]
+        for position in range(len(self)):
+            if offsets[position + 1] > offsets[position]:
+                yield position, offsets[position + 1] - 1
+
+    def _state_code(self, state):
+        states = self.categories["state"]
+        return states.index(state) if state in states else -2
+
+    @property
+    def completed(self):
+        """Have all the tasks completed."""
+        completed = self._state_code("completed")
+        return all(code == completed for code in self.columns["state"])
+
+    def current_states(self):
+        """Count the occurences of current states."""
+        states = defaultdict(int)
+        for code in self.columns["state"]:
+            states[self.categories["state"][code]] += 1
+        return states
+
+    def _timestamp_extreme(self, name, func):
+        values = [self.columns[name][run] for _, run in self._last_runs()]
+        values = [value for value in values if value != MISSING]
+        return EPOCH + datetime.timedelta(milliseconds=func(values))
+
+    @property
+    def earliest_start_time(self):
+        """Find the earliest start time for any task in the graph."""
+        return self._timestamp_extreme("started", min)
+
+    @property
+    def latest_finished_time(self):
+        """Find the latest finish time for resolved tasks."""
+        return self._timestamp_extreme("resolved", max)
+
+    def total_compute_time(self):
+        """Sum of all the task run times of completed tasks, as timedelta."""
+        completed = self._state_code("completed")
+        offsets, started, resolved = self.columns["run_offsets"], self.columns["started"], self.columns["resolved"]
+        total = 0
+        for position, code in enumerate(self.columns["state"]):
+            if code != completed:
+                continue
+            for run in range(offsets[position], offsets[position + 1]):
+                if started[run] != MISSING and resolved[run] != MISSING:
+                    total += resolved[run] - started[run]
+        return datetime.timedelta(milliseconds=total)
+
+    def task_timings(self):
+        """For every finished task that has fields we group on, report duration."""
+        completed = self._state_code("completed")
+        for position, run in self._last_runs():
+            kind, platform = self.columns["kind"][position], self.columns["platform"][position]
+            if self.columns["state"][position] != completed or kind < 0 or platform < 0:
+                continue
+            duration = datetime.timedelta(milliseconds=self.columns["resolved"][run] - self.columns["started"][run])
+            yield {"kind": self.categories["kind"][kind], "platform": self.categories["platform"][platform], "duration": int(duration.total_seconds())}
+
+    @property
+    def kinds(self):
+        """Return a list of the task kinds in use."""
+        return list(set(kind for kind in self.categories["kind"] if kind != ""))
+
+    def _dataframe_columns(self):
+        columns = {name: list() for name in DATAFRAME_COLUMNS}
+        offsets = self.columns["run_offsets"]
+        for position in range(len(self)):
+            first, last = offsets[position], offsets[position + 1]
+            count = last - first
+            if not count:
+                continue
+            columns["name"].extend([self._string("name", position)] * count)
+            columns["taskid"].extend([self.task_id(position)] * count)
+            columns["kind"].extend([self._category("kind", self.columns["kind"][position]) or ""] * count)
+            columns["platform"].extend([self._category("platform", self.columns["platform"][position])] * count)
+            columns["worker_type"].extend([self._category("worker_type", self.columns["worker_type"][position])] * count)
+            for run in range(first, last):
+                columns["worker_id"].append(self._string("worker_id", run) or None)
+                columns["run_id"].append(self.columns["run_id"][run])
+                columns["state"].append(self._category("state", self.columns["run_state"][run]))
+                for name in ("scheduled", "started", "resolved"):
+                    columns[name].append(_format_timestamp(self.columns[name][run]))
+        return columns
+
+
+def open_snapshot(path):
+    """Open a snapshot file as a SnapshotGraph."""
+    return SnapshotGraph(path)
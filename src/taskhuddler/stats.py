@@ -0,0 +1,153 @@
+"""Single pass summary statistics for task graphs."""
+
+import datetime
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from .utils import parse_datetime
+
+
+@dataclass
+class GraphStats:
+    """Metrics of a task graph, as computed by TaskGraph.summary().
+
+    The values match the equivalent TaskGraph methods.
+    """
+
+    task_count: int = 0
+    run_count: int = 0
+    completed: bool = True
+    states: Dict[str, int] = field(default_factory=dict)
+    earliest_start_time: Optional[datetime.datetime] = None
+    latest_finished_time: Optional[datetime.datetime] = None
+    total_compute_time: datetime.timedelta = datetime.timedelta(0)
+    total_compute_wall_time: datetime.timedelta = datetime.timedelta(0)
+    task_timings: List[dict] = field(default_factory=list)
+    # Merged (start, end) intervals, kept so summaries can be combined.
+    intervals: List[tuple] = field(default_factory=list, repr=False)
+
+    @property
+    def total_wall_time(self):
+        """Return the time between the first start and the last finish."""
+        if self.earliest_start_time is None or self.latest_finished_time is None:
+            return None
+        return self.latest_finished_time - self.earliest_start_time
+
+    def merge(self, other):
+        """Return the combined statistics of this and another summary."""
+        states = defaultdict(int, self.states)
+        for state, count in other.states.items():
+            states[state] += count
+        intervals = merge_intervals(self.intervals + other.intervals)
+        return GraphStats(
+            task_count=self.task_count + other.task_count,
+            run_count=self.run_count + other.run_count,
+            completed=self.completed and other.completed,
+            states=dict(states),
+            earliest_start_time=_optional(min, self.earliest_start_time, other.earliest_start_time),
+            latest_finished_time=_optional(max, self.latest_finished_time, other.latest_finished_time),
+            total_compute_time=self.total_compute_time + other.total_compute_time,
+            total_compute_wall_time=sum([end - start for start, end in intervals], datetime.timedelta(0)),
+            task_timings=self.task_timings + other.task_timings,
+            intervals=intervals,
+        )
+
+    def to_dict(self):
+        """Return a JSON serializable dictionary, with times as ISO 8601 strings and durations in seconds."""
+        wall_time = self.total_wall_time
+        return {
+            "task_count": self.task_count,
+            "run_count": self.run_count,
+            "completed": self.completed,
+            "states": dict(self.states),
+            "earliest_start_time": self.earliest_start_time.isoformat() if self.earliest_start_time else None,
+            "latest_finished_time": self.latest_finished_time.isoformat() if self.latest_finished_time else None,
+            "total_wall_time": wall_time.total_seconds() if wall_time is not None else None,
+            "total_compute_time": self.total_compute_time.total_seconds(),
+            "total_compute_wall_time": self.total_compute_wall_time.total_seconds(),
+            "task_timings": list(self.task_timings),
+        }
+
+
+def _optional(func, first, second):
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return func(first, second)
+
+
+def merge_intervals(intervals):
+    """Merge overlapping (start, end) intervals, in O(n log n)."""
+    merged = list()
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def compute_stats(tasklist):
+    """Compute GraphStats for a list of Task objects, in one pass."""
+    states = defaultdict(int)
+    completed = True
+    earliest = latest = None
+    compute_time = datetime.timedelta(0)
+    intervals = list()
+    timings = list()
+    run_count = 0
+
+    for task in tasklist:
+        status = task.status
+        state = status.state
+        states[state] += 1
+        runs = status.runs
+        run_count += len(runs)
+        is_completed = state == "completed"
+        if not is_completed:
+            completed = False
+        if not runs:
+            continue
+
+        last = runs[-1]
+        started = parse_datetime(last["started"]) if last.get("started") else None
+        resolved = parse_datetime(last["resolved"]) if last.get("resolved") else None
+        if started is not None and (earliest is None or started < earliest):
+            earliest = started
+        if resolved is not None and (latest is None or resolved > latest):
+            latest = resolved
+        if not is_completed:
+            continue
+
+        for run in runs[:-1]:
+            if run.get("started") and run.get("resolved"):
+                compute_time += parse_datetime(run["resolved"]) - parse_datetime(run["started"])
+        if started is None or resolved is None:
+            continue
+        compute_time += resolved - started
+        intervals.append((started, resolved))
+
+        definition = task.task
+        try:
+            kind = definition.tags["kind"]
+            platform = definition.extra["treeherder"]["machine"]["platform"]
+        except KeyError:
+            continue
+        timings.append({"kind": kind, "platform": platform, "duration": int((resolved - started).total_seconds())})
+
+    intervals = merge_intervals(intervals)
+    return GraphStats(
+        task_count=len(tasklist),
+        run_count=run_count,
+        completed=completed,
+        states=dict(states),
+        earliest_start_time=earliest,
+        latest_finished_time=latest,
+        total_compute_time=compute_time,
+        total_compute_wall_time=sum([end - start for start, end in intervals], datetime.timedelta(0)),
+        task_timings=timings,
+        intervals=intervals,
+    )
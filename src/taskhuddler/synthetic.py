@@ -0,0 +1,143 @@
+"""Generate synthetic task groups, for benchmarks and load tests.
+
+The generated data has the same shape as listTaskGroup responses, so it can
+be fed to TaskGraph.from_data or served by a stand-in queue.
+"""
+
+import base64
+import datetime
+import json
+import random
+
+KINDS = {
+    "build": ("gecko-3-b-linux", "linux64"),
+    "test": ("gecko-t-linux-large", "linux64"),
+    "signing": ("signing-linux-v1", "linux64-nightly"),
+    "repackage": ("gecko-3-b-linux", "windows2012-32"),
+    "beetmover": ("beetmoverworker-v1", "osx-cross"),
+}
+
+EPOCH = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def format_timestamp(when):
+    """Format a datetime the way the queue does, with millisecond precision."""
+    return when.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def make_task_id(rng):
+    """Return a random slugid-shaped task id."""
+    return base64.urlsafe_b64encode(rng.getrandbits(128).to_bytes(16, "big")).decode("ascii")[:22]
+
+
+def _make_runs(rng, runs_per_task, scheduled, failed):
+    runs = list()
+    for run_id in range(runs_per_task):
+        last = run_id == runs_per_task - 1
+        started = scheduled + datetime.timedelta(seconds=rng.uniform(1, 300))
+        resolved = started + datetime.timedelta(seconds=rng.uniform(30, 3600))
+        if not last:
+            state, reason_resolved = rng.choice([("exception", "worker-shutdown"), ("failed", "failed"), ("exception", "deadline-exceeded")])
+        elif failed:
+            state, reason_resolved = "failed", "failed"
+        else:
+            state, reason_resolved = "completed", "completed"
+        runs.append(
+            {
+                "runId": run_id,
+                "state": state,
+                "reasonCreated": "scheduled" if run_id == 0 else "retry",
+                "reasonResolved": reason_resolved,
+                "workerGroup": "us-west-1",
+                "workerId": "i-{:016x}".format(rng.getrandbits(64)),
+                "takenUntil": format_timestamp(resolved + datetime.timedelta(minutes=20)),
+                "scheduled": format_timestamp(scheduled),
+                "started": format_timestamp(started),
+                "resolved": format_timestamp(resolved),
+            }
+        )
+        scheduled = resolved
+    return runs, scheduled
+
+
+def generate_task_group(task_count=1000, runs_per_task=1, fanout=3, artifact_count=2, failure_rate=0.02, groupid=None, seed=0):
+    """Generate a synthetic task group.
+
+    Arguments:
+        task_count: number of tasks in the group.
+        runs_per_task: runs per task, all but the last of which failed.
+        fanout: maximum number of dependencies of each task, chosen from
+            earlier tasks so the graph is acyclic.
+        artifact_count: artifacts listed for each task, besides its log.
+        failure_rate: fraction of tasks whose final run failed.
+
+    Returns a dictionary with the groupid, the list of tasks in
+    listTaskGroup format, and the artifact listings keyed by task id.
+    """
+    rng = random.Random(seed)
+    groupid = groupid or make_task_id(rng)
+    kinds = sorted(KINDS)
+    tasks = list()
+    artifacts = dict()
+    resolved_times = list()
+    task_ids = list()
+
+    for index in range(task_count):
+        task_id = make_task_id(rng)
+        kind = kinds[index % len(kinds)]
+        worker_type, platform = KINDS[kind]
+        dependencies = rng.sample(range(index), min(index, rng.randint(0, fanout)))
+        scheduled = max([resolved_times[dep] for dep in dependencies], default=EPOCH)
+        runs, resolved = _make_runs(rng, runs_per_task, scheduled, rng.random() < failure_rate)
+        resolved_times.append(resolved)
+        task_ids.append(task_id)
+        label = "{}-{}/opt-{}".format(kind, platform, index)
+        expires = format_timestamp(EPOCH + datetime.timedelta(days=365))
+        tasks.append(
+            {
+                "status": {
+                    "taskId": task_id,
+                    "provisionerId": "aws-provisioner-v1",
+                    "workerType": worker_type,
+                    "schedulerId": "gecko-level-3",
+                    "taskGroupId": groupid,
+                    "deadline": format_timestamp(EPOCH + datetime.timedelta(days=1)),
+                    "expires": expires,
+                    "retriesLeft": 5 - len(runs) + 1,
+                    "state": runs[-1]["state"],
+                    "runs": runs,
+                },
+                "task": {
+                    "provisionerId": "aws-provisioner-v1",
+                    "workerType": worker_type,
+                    "schedulerId": "gecko-level-3",
+                    "taskGroupId": groupid,
+                    "dependencies": [task_ids[dep] for dep in dependencies],
+                    "requires": "all-completed",
+                    "routes": ["tc-treeherder.v2.mozilla-central.{}".format(groupid)],
+                    "priority": rng.choice(["lowest", "low", "medium", "high"]),
+                    "retries": 5,
+                    "created": format_timestamp(EPOCH),
+                    "deadline": format_timestamp(EPOCH + datetime.timedelta(days=1)),
+                    "expires": expires,
+                    "scopes": ["queue:route:tc-treeherder.v2.mozilla-central.*"],
+                    "payload": {"maxRunTime": 3600, "env": {"MOZ_BUILD_DATE": "20200101000000"}},
+                    "metadata": {"owner": "nobody@mozilla.com", "source": "https://hg.mozilla.org/", "description": label, "name": label},
+                    "tags": {"createdForUser": "nobody@mozilla.com", "kind": kind, "label": label},
+                    "extra": {"treeherder": {"machine": {"platform": platform}, "symbol": str(index)}},
+                },
+            }
+        )
+        artifacts[task_id] = [
+            {"storageType": "s3", "name": name, "expires": expires, "contentType": "application/json"}
+            for name in ["public/build/artifact-{}.json".format(n) for n in range(artifact_count)]
+        ] + [{"storageType": "s3", "name": "public/logs/live_backing.log", "expires": expires, "contentType": "text/plain"}]
+
+    return {"groupid": groupid, "tasks": tasks, "artifacts": artifacts}
+
+
+def artifact_content(task_id, name, size=1024):
+    """Return the content of a synthetic artifact, roughly size bytes long."""
+    if name.endswith(".json"):
+        return json.dumps({"taskId": task_id, "name": name, "padding": "x" * size})
+    return "{} {}\n".format(task_id, name) * max(1, size // (len(task_id) + len(name) + 2))
@@ -1,13 +1,55 @@
-"""class Task, to extract data about tasks."""
+"""class Task, to extract data about tasks.
+
+Tasks can be shared between threads. Their data isn't modified once loaded,
+and the artifact listing is loaded once per task and run, however many
+threads ask for it at the same time.
+"""
 
 import json
+import threading
+from concurrent.futures import Future
 from dataclasses import dataclass, field
 from typing import List
 
-import dateutil.parser
-from taskcluster import Queue
+from . import instrumentation
+from .utils import parse_datetime, tc_options
+
+
+class SingleFlight(object):
+    """Run one call per key at a time, sharing its outcome with concurrent callers.
+
+    Kept outside of the dataclasses, as asdict deep copies their fields and
+    locks can't be copied.
+    """
+
+    def __init__(self):
+        """init."""
+        self._lock = threading.Lock()
+        self._calls = dict()
+
+    def do(self, key, func):
+        """Return func(), or wait for the result of the call already running for key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        if not leader:
+            return call.result()
+        try:
+            result = func()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
 
-from .utils import tc_options
+_artifact_listings = SingleFlight()
 
 
 @dataclass
@@ -34,20 +76,27 @@ class TaskDefinition:
     extra: dict = field(repr=False)
 
     @classmethod
-    def from_dict(cls, taskId, data):
+    def from_dict(cls, taskId, data, interner=None):
         """Create TaskDefinition from existing data.
 
         taskId is not reurned from queue.task but will be in data from
         listTaskGroup
+
+        With a taskhuddler.dedup.Interner, field values equal to those of
+        previously loaded definitions are shared with them.
         """
+        if interner is not None:
+            data = interner.intern_fields(data)
         if "taskId" in data:
             return cls(**data)
         return cls(taskId, **data)
 
     @classmethod
     def from_task_id(cls, task_id):
+        from taskcluster import Queue
+
         queue = Queue(tc_options())
-        taskdef = queue.task(task_id)
+        taskdef = instrumentation.call_api("task", queue.task, task_id)
         return cls(taskId=task_id, **taskdef)
 
     @property
@@ -99,14 +148,16 @@ class TaskStatus:
 
     @classmethod
     def from_task_id(cls, task_id):
+        from taskcluster import Queue
+
         queue = Queue(tc_options())
-        status = queue.status(task_id)
+        status = instrumentation.call_api("status", queue.status, task_id)
         return cls(**status["status"])
 
     @property
     def has_failures(self):
         """Return True if this task has any run failures."""
-        return len([r for r in self.runs if r.get("state") in ["failed", "exception"]]) > 0
+        return any(r.get("state") in ("failed", "exception") for r in self.runs)
 
     @property
     def completed(self):
@@ -120,7 +171,7 @@ class TaskStatus:
         field_data = self.runs[run_id].get(run_field)
         if not field_data:
             return
-        return dateutil.parser.parse(field_data)
+        return parse_datetime(field_data)
 
     @property
     def scheduled(self):
@@ -146,7 +197,7 @@ class TaskStatus:
             started = run.get("started")
             resolved = run.get("resolved")
             if started and resolved:
-                durations.append(dateutil.parser.parse(resolved) - dateutil.parser.parse(started))
+                durations.append(parse_datetime(resolved) - parse_datetime(started))
         return durations
 
     @property
@@ -176,13 +227,14 @@ class TaskArtifact:
         return pattern in self.name
 
     def fetch(self, queue=None):
-        self.queue = queue
-        if self.queue is None:
-            self.queue = Queue(tc_options())
-        if self.run_id:
-            return self.queue.getArtifact(self.task_id, self.run_id, self.name)
+        if queue is None:
+            from taskcluster import Queue
+
+            queue = Queue(tc_options())
+        if self.run_id is not None:
+            return instrumentation.call_api("getArtifact", queue.getArtifact, self.task_id, self.run_id, self.name)
         else:
-            return self.queue.getLatestArtifact(self.task_id, self.name)
+            return instrumentation.call_api("getLatestArtifact", queue.getLatestArtifact, self.task_id, self.name)
 
 
 # Should this be a dataclass itself? How does that work?
@@ -195,14 +247,16 @@ class Task:
     artifact_store: list = field(default_factory=list)
 
     @classmethod
-    def from_dict(cls, data):
-        return cls(TaskDefinition.from_dict(data["status"]["taskId"], data["task"]), TaskStatus.from_dict(data["status"]))
+    def from_dict(cls, data, interner=None):
+        return cls(TaskDefinition.from_dict(data["status"]["taskId"], data["task"], interner=interner), TaskStatus.from_dict(data["status"]))
 
     @classmethod
     def from_task_id(cls, task_id):
+        from taskcluster import Queue
+
         queue = Queue(tc_options())
-        status = queue.status(task_id)
-        taskdef = queue.task(task_id)
+        status = instrumentation.call_api("status", queue.status, task_id)
+        taskdef = instrumentation.call_api("task", queue.task, task_id)
         return cls(TaskDefinition.from_dict(task_id, taskdef), TaskStatus.from_dict(status["status"]))
 
     def __repr__(self):
@@ -236,13 +290,25 @@ class Task:
         return self.task.scopes
 
     def artifacts(self):
-        """List artifacts the task has produced."""
+        """List artifacts the task has produced.
+
+        Concurrent calls for the same task and run share a single request.
+        """
         if not self.status:
             return list()
         if not self.artifact_store:
-            queue = Queue(tc_options())
-            list_artifacts = queue.listArtifacts(self.task_id, self.status.latest_runid, query={})
-            self.artifact_store = [TaskArtifact.from_dict(a, task_id=self.task_id, run_id=self.status.latest_runid) for a in list_artifacts["artifacts"]]
+            run_id = self.status.latest_runid
+
+            def list_artifacts():
+                if not self.artifact_store:
+                    from taskcluster import Queue
+
+                    queue = Queue(tc_options())
+                    listing = instrumentation.call_api("listArtifacts", queue.listArtifacts, self.task_id, run_id, query={})
+                    self.artifact_store = [TaskArtifact.from_dict(a, task_id=self.task_id, run_id=run_id) for a in listing["artifacts"]]
+                return self.artifact_store
+
+            self.artifact_store = _artifact_listings.do((self.task_id, run_id), list_artifacts)
         return self.artifact_store
 
     def artifacts_matching(self, pattern):
@@ -0,0 +1,126 @@
+"""Worker pool concurrency and queue depth over time.
+
+Every run contributes up to three events: scheduled (joins the queue),
+started (leaves the queue and starts running) and resolved (stops running, or
+leaves the queue if it never started). Sorting the events once per worker
+type and sweeping through them gives step functions of running and queued
+tasks, in O(n log n).
+"""
+
+import bisect
+import itertools
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import List
+
+from .utils import parse_datetime
+
+
+@dataclass
+class Timeline:
+    """Step functions of running and queued runs for one worker type.
+
+    running[i] and queued[i] hold from times[i] until times[i + 1].
+    """
+
+    worker_type: str
+    times: list = field(default_factory=list)
+    running: List[int] = field(default_factory=list)
+    queued: List[int] = field(default_factory=list)
+
+    @property
+    def peak_running(self):
+        """Return the highest number of concurrently running tasks."""
+        return max(self.running, default=0)
+
+    @property
+    def peak_queued(self):
+        """Return the highest number of queued tasks."""
+        return max(self.queued, default=0)
+
+    @property
+    def peak_running_time(self):
+        """Return when peak concurrency was first reached."""
+        if not self.running:
+            return None
+        return self.times[self.running.index(self.peak_running)]
+
+    def at(self, when):
+        """Return (running, queued) at the given datetime."""
+        index = bisect.bisect_right(self.times, when) - 1
+        if index < 0:
+            return 0, 0
+        return self.running[index], self.queued[index]
+
+    def busy_time(self):
+        """Return the time with at least one task running, as timedelta."""
+        total = None
+        for start, end, running in zip(self.times, self.times[1:], self.running):
+            if running:
+                total = (end - start) if total is None else total + (end - start)
+        return total
+
+    def to_dict(self):
+        """Return a JSON serializable dictionary, with ISO 8601 times."""
+        return {
+            "worker_type": self.worker_type,
+            "times": [when.isoformat() for when in self.times],
+            "running": list(self.running),
+            "queued": list(self.queued),
+            "peak_running": self.peak_running,
+            "peak_queued": self.peak_queued,
+        }
+
+
+def _run_events(run):
+    scheduled, started, resolved = run.get("scheduled"), run.get("started"), run.get("resolved")
+    if started:
+        started = parse_datetime(started)
+        if scheduled:
+            yield parse_datetime(scheduled), 0, 1
+            yield started, 0, -1
+        yield started, 1, 0
+        if resolved:
+            yield parse_datetime(resolved), -1, 0
+    elif scheduled:
+        # Still pending, or resolved without ever running.
+        yield parse_datetime(scheduled), 0, 1
+        if resolved:
+            yield parse_datetime(resolved), 0, -1
+
+
+def build_timelines(tasks, key=None):
+    """Return a {worker_type: Timeline} dictionary for the runs of tasks.
+
+    Arguments:
+        tasks: an iterable of Task objects, possibly from many graphs.
+        key: a function returning the grouping of a task, defaulting to its
+            status.workerType.
+    """
+    events = defaultdict(list)
+    for task in tasks:
+        group = key(task) if key else task.status.workerType
+        for run in task.status.runs:
+            events[group].extend(_run_events(run))
+
+    timelines = dict()
+    for group, group_events in events.items():
+        group_events.sort(key=lambda event: event[0])
+        timeline = Timeline(worker_type=group)
+        running = queued = 0
+        for when, changes in itertools.groupby(group_events, key=lambda event: event[0]):
+            for _, running_delta, queued_delta in changes:
+                running += running_delta
+                queued += queued_delta
+            if timeline.times and timeline.running[-1] == running and timeline.queued[-1] == queued:
+                continue
+            timeline.times.append(when)
+            timeline.running.append(running)
+            timeline.queued.append(queued)
+        timelines[group] = timeline
+    return timelines
+
+
+def graphs_timelines(graphs, key=None):
+    """Return a {worker_type: Timeline} dictionary over several TaskGraphs."""
+    return build_timelines(itertools.chain.from_iterable(graph.tasklist for graph in graphs), key=key)
@@ -0,0 +1,196 @@
+"""Grouped run timing percentiles, using mergeable quantile sketches.
+
+Every run with the relevant timestamps contributes its queue wait
+(scheduled to started) and run time (started to resolved), in seconds.
+Samples are not kept: each group holds a QuantileSketch, so analyzers built
+over different graphs, or in different processes, can be merged.
+"""
+
+import math
+from collections import defaultdict
+
+from .utils import parse_datetime
+
+GROUP_KEYS = ("kind", "platform", "worker_type", "label_prefix", "state")
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class QuantileSketch(object):
+    """Log-bucketed quantile sketch with a bounded relative error.
+
+    Values are counted in buckets whose bounds grow geometrically, so any
+    quantile is estimated within relative_accuracy of a real sample while
+    memory only grows with the logarithm of the value range. Values below
+    min_value, including zero, share one bucket.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-3):
+        """init."""
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = defaultdict(int)
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        """Add a sample."""
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if value < self.min_value:
+            self.zero_count += 1
+        else:
+            self.buckets[math.ceil(math.log(value) / self._log_gamma)] += 1
+
+    def merge(self, other):
+        """Add the samples of another sketch with the same accuracy to this one."""
+        if other.gamma != self.gamma or other.min_value != self.min_value:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for index, count in other.buckets.items():
+            self.buckets[index] += count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self):
+        """Return the mean of the samples."""
+        if not self.count:
+            return None
+        return self.sum / self.count
+
+    def quantile(self, q):
+        """Return an estimate of the q quantile, 0 <= q <= 1."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return self.min
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                estimate = 2 * self.gamma**index / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        """Return count, mean, min, max and percentiles as a dictionary."""
+        result = {"count": self.count, "mean": self.mean, "min": self.min, "max": self.max}
+        for q in QUANTILES:
+            result["p{}".format(int(q * 100))] = self.quantile(q)
+        return result
+
+
+def label_prefix(label, parts=2):
+    """Return the first parts of a '-' separated label, ignoring any '/...' suffix."""
+    return "-".join(label.split("/", 1)[0].split("-")[:parts])
+
+
+class TimingAnalyzer(object):
+    """Group run queue wait and run time by task attributes.
+
+    Arguments:
+        group_by: attributes to group on, from GROUP_KEYS.
+        label_prefix_parts: how many '-' separated parts of the label make
+            up its prefix.
+        relative_accuracy: the quantile sketches' relative error.
+    """
+
+    def __init__(self, group_by=("kind", "platform"), label_prefix_parts=2, relative_accuracy=0.01):
+        """init."""
+        unknown = set(group_by) - set(GROUP_KEYS)
+        if unknown:
+            raise ValueError("Unknown group keys: {}".format(", ".join(sorted(unknown))))
+        self.group_by = tuple(group_by)
+        self.label_prefix_parts = label_prefix_parts
+        self.relative_accuracy = relative_accuracy
+        self.queue_wait = dict()
+        self.run_time = dict()
+
+    def _sketch(self, sketches, key):
+        if key not in sketches:
+            sketches[key] = QuantileSketch(self.relative_accuracy)
+        return sketches[key]
+
+    def _task_key(self, task):
+        definition = task.task
+        values = {
+            "kind": definition.tags.get("kind", ""),
+            "platform": ((definition.extra.get("treeherder") or {}).get("machine") or {}).get("platform"),
+            "worker_type": task.status.workerType,
+        }
+        if "label_prefix" in self.group_by:
+            values["label_prefix"] = label_prefix(definition.label, self.label_prefix_parts)
+        return values
+
+    def add_tasks(self, tasks):
+        """Add every run of the given tasks."""
+        uses_state = "state" in self.group_by
+        for task in tasks:
+            if not task.status.runs:
+                continue
+            values = self._task_key(task)
+            task_key = tuple(values.get(name) for name in self.group_by)
+            for run in task.status.runs:
+                key = task_key
+                if uses_state:
+                    values["state"] = run.get("state")
+                    key = tuple(values[name] for name in self.group_by)
+                scheduled, started, resolved = run.get("scheduled"), run.get("started"), run.get("resolved")
+                if not started:
+                    continue
+                started = parse_datetime(started)
+                if scheduled:
+                    self._sketch(self.queue_wait, key).add(max((started - parse_datetime(scheduled)).total_seconds(), 0.0))
+                if resolved:
+                    self._sketch(self.run_time, key).add(max((parse_datetime(resolved) - started).total_seconds(), 0.0))
+        return self
+
+    def add_graph(self, graph):
+        """Add every run of a TaskGraph."""
+        return self.add_tasks(graph.tasklist)
+
+    def merge(self, other):
+        """Add the results of another analyzer with the same grouping to this one."""
+        if other.group_by != self.group_by:
+            raise ValueError("Cannot merge analyzers with different groupings")
+        for mine, theirs in ((self.queue_wait, other.queue_wait), (self.run_time, other.run_time)):
+            for key, sketch in theirs.items():
+                if key in mine:
+                    mine[key].merge(sketch)
+                else:
+                    mine[key] = sketch
+        return self
+
+    def results(self):
+        """Return {group: {"queue_wait": stats, "run_time": stats}}, keyed by group_by values."""
+        results = dict()
+        for key in sorted(set(self.queue_wait) | set(self.run_time), key=lambda k: tuple(str(v) for v in k)):
+            empty = QuantileSketch(self.relative_accuracy)
+            results[key] = {
+                "queue_wait": self.queue_wait.get(key, empty).to_dict(),
+                "run_time": self.run_time.get(key, empty).to_dict(),
+            }
+        return results
+
+    def rows(self):
+        """Return the results as a list of flat dictionaries, one per group."""
+        rows = list()
+        for key, metrics in self.results().items():
+            row = dict(zip(self.group_by, key))
+            for metric, values in metrics.items():
+                for name, value in values.items():
+                    row["{}_{}".format(metric, name)] = value
+            rows.append(row)
+        return rows
@@ -1,4 +1,5 @@
 """Common utilities for understanding tasks."""
+import datetime
 import logging
 import os
 from collections import namedtuple
@@ -21,8 +22,12 @@ def allen_contains(r1, r2):
 
 
 def should_merge(r1, r2):
-    """Return True if these two datetimes be merged."""
-    return allen_overlap(r1, r2) or allen_overlap(r2, r1) or allen_contains(r1, r2)
+    """Return True if these two datetimes be merged.
+
+    Ranges merge when they overlap, contain one another, are identical or
+    touch end to start.
+    """
+    return r1.start <= r2.end and r2.start <= r1.end
 
 
 def merge_dates(r1, r2):
@@ -60,6 +65,37 @@ def merge_date_list(dt_list):
     return sorted(result)
 
 
+def parse_datetime(value):
+    """Parse a Taskcluster timestamp into an aware datetime.
+
+    Queue timestamps look like 2017-10-26T01:03:59.291Z, which
+    datetime.fromisoformat handles much faster than dateutil once the Z is
+    replaced. Anything else falls back to dateutil.
+    """
+    try:
+        if value.endswith("Z"):
+            return datetime.datetime.fromisoformat(value[:-1] + "+00:00")
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        import dateutil.parser
+
+        return dateutil.parser.parse(value)
+
+
 def tc_options():
     """Set Taskcluster options."""
     return {"rootUrl": os.environ.get("TASKCLUSTER_ROOT_URL", "https://firefox-ci-tc.services.mozilla.com")}
+
+
+def cache_dir_path(cache_dir=None):
+    """Return the cache directory to use, defaulting to TC_CACHE_DIR."""
+    cache_dir = cache_dir or os.environ.get("TC_CACHE_DIR")
+    if not cache_dir:
+        raise ValueError("No cache directory given and TC_CACHE_DIR is not set")
+    return cache_dir
+
+
+def cached_groupids(cache_dir=None):
+    """Return the group ids of all graphs in the cache directory."""
+    cache_dir = cache_dir_path(cache_dir)
+    return sorted(name[: -len(".json")] for name in os.listdir(cache_dir) if name.endswith(".json"))
@@ -0,0 +1,21 @@
+from contextlib import ExitStack
+
+import pytest
+
+
+@pytest.fixture
+def serve_queue(monkeypatch):
+    """Return a function serving a FakeQueue in a thread until the test ends.
+
+    TASKCLUSTER_ROOT_URL points at the served queue and TC_CACHE_DIR is unset,
+    so graphs are fetched from it.
+    """
+    with ExitStack() as stack:
+
+        def serve(fake):
+            root_url = stack.enter_context(fake.serve_in_thread())
+            monkeypatch.setenv("TASKCLUSTER_ROOT_URL", root_url)
+            monkeypatch.delenv("TC_CACHE_DIR", raising=False)
+            return fake
+
+        yield serve
@@ -5,6 +5,7 @@ from unittest.mock import patch
 
 import pytest
 import taskcluster
+import taskcluster.aio
 from taskhuddler.aio import TaskGraph
 
 TASK_IDS = ["A-8AqzvvRsqH9b0VHBXYjA", "A-aPcZanRJaxM-IToHyyHw", "A0BaQjdkS8Wdy2Ev_1pLgA", "A0VWjOkmRNqkKrRUj83BEA", "A0cabJ3WTeCrDN15nbTPYw"]
@@ -35,11 +36,40 @@ async def test_taskgraph_repr():
 
 
 @pytest.mark.asyncio
-async def test_cache_file():
-    tmpdir = tempfile.mkdtemp()
-    os.environ["TC_CACHE_DIR"] = tmpdir
+async def test_cache_file(monkeypatch):
+    monkeypatch.setenv("TC_CACHE_DIR", tempfile.mkdtemp())
     with patch.object(taskcluster.aio.Queue, "listTaskGroup", new=mocked_listTaskGroup):
         graph = await TaskGraph("eShtp2faQgy4iZZOIhXvhw")
         # and again to hit the cached copy.
         graph = await TaskGraph("eShtp2faQgy4iZZOIhXvhw")
         assert repr(graph) == "<TaskGraph eShtp2faQgy4iZZOIhXvhw>"
+
+
+@pytest.mark.asyncio
+async def test_build_tasks_in_batches():
+    with patch.object(taskcluster.aio.Queue, "listTaskGroup", new=mocked_listTaskGroup), patch("taskhuddler.aio.graph.BUILD_BATCH_SIZE", 2):
+        graph = await TaskGraph("eShtp2faQgy4iZZOIhXvhw")
+        assert [task.taskId for task in graph.tasks()][:2] == TASK_IDS[:2]
+        assert len(graph.tasks()) == 6
+
+
+@pytest.mark.asyncio
+async def test_async_aggregates():
+    with patch.object(taskcluster.aio.Queue, "listTaskGroup", new=mocked_listTaskGroup):
+        graph = await TaskGraph("eShtp2faQgy4iZZOIhXvhw")
+    assert await graph.completed_async() is False
+    assert await graph.current_states_async() == {"completed": 4, "failed": 1, "unscheduled": 1}
+    assert await graph.total_compute_wall_time_async() == graph.total_compute_wall_time()
+    assert await graph.task_timings_async() == list(graph.task_timings())
+    assert len(await graph.tasks_with_failures_async()) == 1
+
+
+@pytest.mark.asyncio
+async def test_from_data():
+    with open(os.path.join(os.path.dirname(__file__), "data", "completed.json")) as f:
+        graphdata = json.loads(f.read())["tasks"]
+    graph = await TaskGraph.from_data("groupA", graphdata)
+    assert isinstance(graph, TaskGraph)
+    assert graph.groupid == "groupA"
+    assert [task.task_id for task in graph.tasklist] == [data["status"]["taskId"] for data in graphdata]
+    assert await graph.current_states_async() == graph.current_states()
@@ -1,11 +1,17 @@
+import asyncio
 import json
 import os
+from dataclasses import asdict
 from unittest.mock import patch
 
 import dateutil.parser
 import pytest
 import taskcluster
+import taskcluster.aio
 from taskhuddler.aio import TaskStatus
+from taskhuddler.aio.task import Task, TaskArtifact, fetch_artifacts, queue_session
+from taskhuddler.fakequeue import FakeQueue
+from taskhuddler.synthetic import artifact_content
 
 
 async def mocked_status(dummy, task_id):
@@ -59,3 +65,159 @@ async def test_task_status_by_task_id():
 async def test_task_status_no_input():
     with pytest.raises(TypeError):
         await TaskStatus()
+
+
+@pytest.fixture
+def fake(serve_queue):
+    return serve_queue(FakeQueue(page_size=2, artifact_size=4096, latency=0.001).add_synthetic(task_count=2, artifact_count=5))
+
+
+@pytest.fixture
+def task(fake):
+    return Task.from_dict(fake.tasks[list(fake.tasks)[0]])
+
+
+@pytest.mark.asyncio
+async def test_artifacts_paginated(fake, task):
+    artifacts = await task.artifacts()
+    assert len(artifacts) == 6
+    assert fake.calls["listArtifacts"] == 3
+    assert await task.artifacts() is artifacts
+    assert fake.calls["listArtifacts"] == 3
+    assert [artifact.name for artifact in await task.artifacts_matching(".log")] == ["public/logs/live_backing.log"]
+
+
+@pytest.mark.asyncio
+async def test_from_sync(task):
+    converted = Task.from_sync(task)
+    assert converted.task is task.task
+    assert converted.status is task.status
+
+
+@pytest.mark.asyncio
+async def test_fetch_artifacts_matching(fake, task, monkeypatch):
+    in_flight = []
+    peak = []
+    fetch = TaskArtifact.fetch
+
+    async def counting_fetch(self, queue=None):
+        in_flight.append(self)
+        peak.append(len(in_flight))
+        try:
+            return await fetch(self, queue=queue)
+        finally:
+            in_flight.remove(self)
+
+    monkeypatch.setattr(TaskArtifact, "fetch", counting_fetch)
+    results = [(artifact.name, content) async for artifact, content in task.fetch_artifacts_matching(".json", concurrency=2)]
+    assert len(results) == 5
+    assert max(peak) == 2
+    assert all(content["name"] == name for name, content in results)
+
+
+@pytest.mark.asyncio
+async def test_fetch_artifacts_shares_session(task):
+    async with queue_session() as queue:
+        artifacts = await task.artifacts(queue=queue)
+        session = queue.session
+        results = [result async for result in fetch_artifacts(artifacts[:2], queue=queue)]
+        assert not session.closed
+    assert session.closed
+    assert len(results) == 2
+
+
+@pytest.mark.asyncio
+async def test_fetch_artifacts_stops_early(task):
+    artifacts = await task.artifacts()
+    async with queue_session() as queue:
+        async for artifact, content in fetch_artifacts(artifacts, queue=queue, concurrency=1):
+            break
+    assert artifact in artifacts
+
+
+@pytest.mark.asyncio
+async def test_stream(task):
+    artifact = (await task.artifacts_matching("artifact-0.json"))[0]
+    chunks = [chunk async for chunk in artifact.stream(chunk_size=1024)]
+    assert len(chunks) > 1
+    assert b"".join(chunks).decode() == artifact_content(task.task_id, artifact.name, 4096)
+
+
+@pytest.mark.asyncio
+async def test_fetch_artifact(task, tmp_path):
+    content = await task.fetch_artifact("artifact-1.json")
+    assert content["name"] == "public/build/artifact-1.json"
+    destination = tmp_path / "log.txt"
+    assert await task.fetch_artifact("live_backing.log", destination=str(destination)) is None
+    assert destination.read_text() == artifact_content(task.task_id, "public/logs/live_backing.log", 4096)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_artifacts_single_flight(fake, task):
+    copies = [Task.from_dict(asdict(task)) for _ in range(4)]
+    listings = await asyncio.gather(*[copy.artifacts() for copy in copies for _ in range(3)])
+    assert fake.calls["listArtifacts"] == 3
+    assert all(listing is listings[0] for listing in listings)
+    assert len(listings[0]) == 6
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_listing(fake, task):
+    first = asyncio.ensure_future(task.artifacts())
+    second = asyncio.ensure_future(task.artifacts())
+    await asyncio.sleep(0)
+    first.cancel()
+    assert len(await second) == 6
+    assert fake.calls["listArtifacts"] == 3
+
+
+@pytest.mark.asyncio
+async def test_fetch_leaves_artifact_unchanged(task):
+    artifact = (await task.artifacts_matching("artifact-0.json"))[0]
+    before = asdict(artifact)
+    await artifact.fetch()
+    assert asdict(artifact) == before
+    assert not hasattr(artifact, "queue")
+
+
+@pytest.mark.asyncio
+async def test_standalone_fetch_uses_one_managed_session(task, monkeypatch):
+    import aiohttp
+
+    artifact = (await task.artifacts_matching("artifact-0.json"))[0]
+    sessions = []
+
+    client_session = aiohttp.ClientSession
+
+    def recording_session(*args, **kwargs):
+        sessions.append(client_session(*args, **kwargs))
+        return sessions[-1]
+
+    monkeypatch.setattr(aiohttp, "ClientSession", recording_session)
+    content = await artifact.fetch()
+    assert content["name"] == artifact.name
+    assert len(sessions) == 1
+    assert sessions[0].closed
+
+
+@pytest.mark.asyncio
+async def test_listing_uses_callers_session(fake, monkeypatch):
+    import aiohttp
+
+    sessions = []
+    client_session = aiohttp.ClientSession
+
+    def recording_session(*args, **kwargs):
+        sessions.append(client_session(*args, **kwargs))
+        return sessions[-1]
+
+    monkeypatch.setattr(aiohttp, "ClientSession", recording_session)
+    tasks = [Task.from_dict(data) for data in fake.tasks.values()]
+    async with queue_session() as queue:
+        copies = [Task.from_dict(asdict(tasks[0])) for _ in range(3)]
+        listings = await asyncio.gather(*[task.artifacts(queue=queue) for task in tasks + copies])
+        results = [result async for result in fetch_artifacts(listings[0] + listings[1], queue=queue)]
+    assert len(sessions) == 1
+    assert len(results) == 12
+    assert all(listing is listings[0] for listing in listings[2:])
+    assert fake.calls["listArtifacts"] == 6
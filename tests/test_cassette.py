@@ -0,0 +1,126 @@
+import json
+
+import pytest
+from taskhuddler import instrumentation
+from taskhuddler.aio.graph import TaskGraph as AsyncTaskGraph
+from taskhuddler.aio.task import TaskArtifact as AsyncTaskArtifact
+from taskhuddler.cassette import Cassette, CassetteMiss, RecordedResponse, call_key
+from taskhuddler.cli import main
+from taskhuddler.fakequeue import FakeQueue
+from taskhuddler.graph import TaskGraph
+from taskhuddler.synthetic import artifact_content
+from taskhuddler.task import Task
+
+
+@pytest.fixture
+def fake(serve_queue):
+    return serve_queue(FakeQueue(page_size=4).add_synthetic(task_count=10, artifact_count=1))
+
+
+def test_call_key():
+    assert call_key("status", ["abc"], {}) == call_key("status", ("abc",), {})
+    assert call_key("listTaskGroup", ["abc"], {"query": {"limit": 1}}) != call_key("listTaskGroup", ["abc"], {"query": {"limit": 2}})
+
+
+def test_record_and_replay(fake, tmp_path):
+    path = str(tmp_path / "cassette.zip")
+    groupid = fake.groupids()[0]
+    with Cassette(path, mode="record") as cassette:
+        recorded = TaskGraph(groupid)
+        task = Task.from_task_id(recorded.tasklist[0].task_id)
+        log = task.artifacts()[-1].fetch()["response"].text
+    assert instrumentation._cassette is None
+    assert cassette.stats["recorded"] == 7
+    calls = sum(fake.calls.values())
+
+    with Cassette(path, mode="replay") as cassette:
+        replayed = TaskGraph(groupid)
+        task = Task.from_task_id(recorded.tasklist[0].task_id)
+        response = task.artifacts()[-1].fetch()["response"]
+    assert sum(fake.calls.values()) == calls
+    assert cassette.stats["hits"] == 7
+    assert [t.task_id for t in replayed.tasklist] == [t.task_id for t in recorded.tasklist]
+    assert isinstance(response, RecordedResponse)
+    assert response.text == log
+
+
+def test_replay_miss(fake, tmp_path):
+    path = str(tmp_path / "cassette.zip")
+    Cassette(path, mode="record").close()
+    with Cassette(path, mode="replay"):
+        with pytest.raises(CassetteMiss):
+            TaskGraph(fake.groupids()[0])
+    assert fake.calls["listTaskGroup"] == 0
+
+
+def test_auto_records_misses(fake, tmp_path):
+    path = str(tmp_path / "cassette.zip")
+    groupid = fake.groupids()[0]
+    with Cassette(path) as cassette:
+        TaskGraph(groupid)
+    assert len(cassette) == 3
+    with Cassette(path) as cassette:
+        TaskGraph(groupid)
+        TaskGraph(groupid, limit=2)
+    assert cassette.stats == {"hits": 3, "recorded": 1}
+    assert fake.calls["listTaskGroup"] == 4
+
+
+@pytest.mark.asyncio
+async def test_aio_replay(fake, tmp_path):
+    path = str(tmp_path / "cassette.zip")
+    groupid = fake.groupids()[0]
+    with Cassette(path, mode="record"):
+        recorded = await AsyncTaskGraph(groupid)
+        artifact = AsyncTaskArtifact(
+            name="public/logs/live_backing.log", expires="", storage_type="s3", content_type="text/plain", task_id=recorded.tasklist[0].task_id, run_id=0
+        )
+        await artifact.fetch()
+    with Cassette(path, mode="replay"):
+        replayed = await AsyncTaskGraph(groupid)
+        response = (await artifact.fetch())["response"]
+    assert len(replayed.tasklist) == len(recorded.tasklist)
+    assert await response.text() == artifact_content(artifact.task_id, artifact.name)
+
+
+def test_cli_cassette(fake, tmp_path, capsys):
+    path = str(tmp_path / "cassette.zip")
+    groupid = fake.groupids()[0]
+    assert main(["--no-cache", "--cassette", path, "states", groupid]) == 0
+    recorded = json.loads(capsys.readouterr().out)
+    calls = sum(fake.calls.values())
+    assert main(["--no-cache", "--cassette", path, "--cassette-mode", "replay", "states", groupid]) == 0
+    assert json.loads(capsys.readouterr().out) == recorded
+    assert sum(fake.calls.values()) == calls
+
+
+@pytest.mark.asyncio
+async def test_aio_replay_read(fake, tmp_path):
+    path = str(tmp_path / "cassette.zip")
+    task_id = fake.tasks[list(fake.tasks)[0]]["status"]["taskId"]
+    artifact = AsyncTaskArtifact(name="public/logs/live_backing.log", expires="", storage_type="s3", content_type="text/plain", task_id=task_id, run_id=0)
+    with Cassette(path, mode="record") as cassette:
+        recorded = await artifact.read()
+    assert cassette.stats["recorded"] == 1
+    calls = sum(fake.calls.values())
+    with Cassette(path, mode="replay"):
+        assert await artifact.read() == recorded
+    assert sum(fake.calls.values()) == calls
+    assert recorded.decode() == artifact_content(task_id, artifact.name)
+
+
+@pytest.mark.asyncio
+async def test_unreadable_body_not_silently_skipped(tmp_path):
+    class Released(object):
+        headers = {}
+
+        async def read(self):
+            raise ConnectionError("Connection closed")
+
+    async def get_artifact(*args):
+        return {"response": Released()}
+
+    with Cassette(str(tmp_path / "cassette.zip"), mode="record") as cassette:
+        with pytest.raises(RuntimeError, match="Unable to record getArtifact"):
+            await cassette.play_async("getArtifact", get_artifact, "taskid", 0, "public/logs/live_backing.log")
+        assert len(cassette) == 0
@@ -0,0 +1,131 @@
+import csv
+import io
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+import taskcluster
+import taskcluster.aio
+from taskhuddler import cli
+from taskhuddler.fakequeue import FakeQueue
+from taskhuddler.synthetic import artifact_content
+
+
+async def mocked_listTaskGroup(dummy, groupid, query):
+    if "continuationToken" in query:
+        filename = "{}.json".format(query["continuationToken"])
+    else:
+        filename = "completed.json"
+
+    with open(os.path.join(os.path.dirname(__file__), "data", filename)) as f:
+        return json.loads(f.read())
+
+
+def run_cli(capsys, *argv):
+    with patch.object(taskcluster.aio.Queue, "listTaskGroup", new=mocked_listTaskGroup):
+        assert cli.main(["--no-cache"] + list(argv)) == 0
+    return capsys.readouterr().out
+
+
+def test_states(capsys):
+    rows = json.loads(run_cli(capsys, "states", "groupA", "groupB"))
+    assert {"groupid": "groupB", "state": "completed", "count": 4} in rows
+    assert len(rows) == 6
+
+
+def test_timings_csv(capsys):
+    rows = list(csv.DictReader(io.StringIO(run_cli(capsys, "--format", "csv", "timings", "--group-by", "kind", "groupA"))))
+    kinds = {row["kind"]: row for row in rows}
+    assert kinds["test"]["run_time_count"] == "1"
+
+
+def test_failures(capsys):
+    rows = json.loads(run_cli(capsys, "failures", "groupA"))
+    assert [row["label"] for row in rows] == ["nightly-l10n-linux-nightly-2/opt"]
+
+
+def test_critical_path(capsys):
+    rows = json.loads(run_cli(capsys, "critical-path", "groupA"))
+    assert rows[-1]["resolved"] == "2017-10-26T03:57:42.727000+00:00"
+
+
+@pytest.fixture
+def fake(serve_queue):
+    return serve_queue(FakeQueue().add_synthetic(task_count=5, artifact_count=1, seed=1))
+
+
+def test_artifacts(fake, capsys, tmp_path):
+    groupid = fake.groupids()[0]
+    assert cli.main(["--no-cache", "artifacts", "--name", "artifact-0.json", "--kind", "build", "--output-dir", str(tmp_path), groupid]) == 0
+    rows = json.loads(capsys.readouterr().out)
+    assert len(rows) == 1
+    with open(rows[0]["path"]) as f:
+        assert json.load(f)["taskId"] == rows[0]["task_id"]
+
+
+def test_text_artifacts(fake, capsys, tmp_path):
+    groupid = fake.groupids()[0]
+    assert cli.main(["--no-cache", "artifacts", "--name", "live_backing.log", "--output-dir", str(tmp_path), groupid]) == 0
+    rows = json.loads(capsys.readouterr().out)
+    assert len(rows) == 5
+    for row in rows:
+        with open(row["path"]) as f:
+            assert f.read() == artifact_content(row["task_id"], "public/logs/live_backing.log")
+
+
+def test_cache_dir(capsys, tmp_path, monkeypatch):
+    monkeypatch.delenv("TC_CACHE_DIR", raising=False)
+    with patch.object(taskcluster.aio.Queue, "listTaskGroup", new=mocked_listTaskGroup):
+        cli.main(["--cache-dir", str(tmp_path), "states", "groupA"])
+    assert os.path.isfile(os.path.join(str(tmp_path), "groupA.json"))
+    monkeypatch.delenv("TC_CACHE_DIR", raising=False)
+
+
+def cached_states(capsys, cache_dir, groupid):
+    calls = list()
+
+    async def counted_listTaskGroup(dummy, groupid, query):
+        calls.append(query)
+        return await mocked_listTaskGroup(dummy, groupid, query)
+
+    with patch.object(taskcluster.aio.Queue, "listTaskGroup", new=counted_listTaskGroup):
+        cli.main(["--cache-dir", str(cache_dir), "states", groupid])
+    return json.loads(capsys.readouterr().out), len(calls)
+
+
+def test_unresolved_graph_refetched(capsys, tmp_path, monkeypatch):
+    monkeypatch.delenv("TC_CACHE_DIR", raising=False)
+    rows, calls = cached_states(capsys, tmp_path, "groupA")
+    path = tmp_path / "groupA.json"
+    # Pretend the unscheduled task has since run.
+    with open(path) as f:
+        graphdata = json.load(f)
+    for data in graphdata:
+        if data["status"]["state"] == "unscheduled":
+            data["status"]["state"] = "pending"
+    with open(path, "w") as f:
+        json.dump(graphdata, f)
+    assert cached_states(capsys, tmp_path, "groupA") == (rows, calls)
+    monkeypatch.delenv("TC_CACHE_DIR", raising=False)
+
+
+def test_resolved_graph_from_cache(capsys, tmp_path, monkeypatch):
+    monkeypatch.delenv("TC_CACHE_DIR", raising=False)
+    cached_states(capsys, tmp_path, "groupA")
+    path = tmp_path / "groupA.json"
+    with open(path) as f:
+        graphdata = json.load(f)
+    for data in graphdata:
+        data["status"]["state"] = "completed"
+    with open(path, "w") as f:
+        json.dump(graphdata, f)
+    rows, calls = cached_states(capsys, tmp_path, "groupA")
+    assert calls == 0
+    assert rows == [{"groupid": "groupA", "state": "completed", "count": 6}]
+    monkeypatch.delenv("TC_CACHE_DIR", raising=False)
+
+
+def test_requires_report():
+    with pytest.raises(SystemExit):
+        cli.parse_args([])
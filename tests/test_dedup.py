@@ -0,0 +1,92 @@
+import json
+
+import pytest
+from taskhuddler.aio.graph import TaskGraph as AsyncTaskGraph
+from taskhuddler.dedup import DedupStore, Interner
+from taskhuddler.graph import TaskGraph
+from taskhuddler.synthetic import generate_task_group
+
+
+def groups(count=3, task_count=30):
+    return [generate_task_group(task_count=task_count, seed=seed) for seed in range(count)]
+
+
+def test_interner_shares_equal_values():
+    interner = Interner()
+    first = interner.intern(json.loads('{"env": {"A": "1"}, "command": ["run", 1, true], "maxRunTime": 3600}'))
+    second = interner.intern(json.loads('{"env": {"A": "1"}, "command": ["run", 1, true], "maxRunTime": 3600}'))
+    assert first is second
+    assert interner.intern({"A": "1"}) is first["env"]
+    assert interner.intern(["run", True, 1]) is not first["command"]
+    assert interner.intern({"maxRunTime": 3600.0}) == {"maxRunTime": 3600.0}
+    assert type(interner.intern({"maxRunTime": 3600.0})["maxRunTime"]) is float
+    interner.clear()
+    assert len(interner) == 0
+
+
+def test_interned_graphs_share_definitions():
+    interner = Interner()
+    first, second = [TaskGraph.from_data(group["groupid"], json.loads(json.dumps(group["tasks"])), interner=interner) for group in groups(2)]
+    assert first.tasklist[0].task.scopes is second.tasklist[0].task.scopes
+    assert first.tasklist[0].task.payload is second.tasklist[5].task.payload
+    assert first.tasks(raw=True) == TaskGraph.from_data(first.groupid, groups(1)[0]["tasks"]).tasks(raw=True)
+
+
+@pytest.mark.asyncio
+async def test_aio_interned_graphs_share_definitions(monkeypatch):
+    monkeypatch.setattr("taskhuddler.aio.graph.BUILD_BATCH_SIZE", 7)
+    interner = Interner()
+    first, second = [await AsyncTaskGraph.from_data(group["groupid"], json.loads(json.dumps(group["tasks"])), interner=interner) for group in groups(2)]
+    assert first.interner is interner
+    assert first.tasklist[0].task.scopes is second.tasklist[0].task.scopes
+    assert first.tasklist[0].task.payload is second.tasklist[20].task.payload
+
+
+def test_store_round_trip(tmp_path):
+    store = DedupStore(str(tmp_path))
+    data = groups()
+    for group in data:
+        store.put(group["groupid"], group["tasks"])
+    assert store.groupids() == sorted(group["groupid"] for group in data)
+    assert data[0]["groupid"] in store
+
+    reopened = DedupStore(str(tmp_path))
+    for group in data:
+        assert reopened.get(group["groupid"]) == group["tasks"]
+    first, second = [reopened.get(group["groupid"]) for group in data[:2]]
+    assert first[0]["task"]["payload"]["env"] is second[0]["task"]["payload"]["env"]
+    assert reopened.disk_usage() < sum(len(json.dumps(group["tasks"])) for group in data) / 4
+
+
+def test_store_adds_only_new_objects(tmp_path):
+    store = DedupStore(str(tmp_path))
+    group = groups(1)[0]
+    assert store.put(group["groupid"], group["tasks"]) > 0
+    assert store.put("again", group["tasks"]) == 0
+
+
+def test_store_load_and_import(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    data = groups(2)
+    for group in data:
+        (cache_dir / "{}.json".format(group["groupid"])).write_text(json.dumps(group["tasks"]))
+    store = DedupStore(str(tmp_path / "store"))
+    assert store.import_cache(str(cache_dir)) == sorted(group["groupid"] for group in data)
+    assert store.import_cache(str(cache_dir)) == []
+
+    graph = store.load(data[0]["groupid"], interner=Interner())
+    assert graph.tasks(raw=True) == TaskGraph.from_data(data[0]["groupid"], data[0]["tasks"]).tasks(raw=True)
+    with pytest.raises(KeyError):
+        store.get("missing")
+
+
+def test_store_damaged_object_table(tmp_path):
+    store = DedupStore(str(tmp_path))
+    first, second = groups(2)
+    store.put(first["groupid"], first["tasks"])
+    size = len(open(store.objects_path, "rb").read())
+    store.put(second["groupid"], second["tasks"])
+    with open(store.objects_path, "rb+") as f:
+        f.truncate(size + 20)
+    assert DedupStore(str(tmp_path)).get(first["groupid"]) == first["tasks"]
@@ -0,0 +1,92 @@
+import pytest
+from taskhuddler.dependencies import DependencyIndex, bit_positions
+from taskhuddler.graph import TaskGraph
+from taskhuddler.synthetic import generate_task_group
+
+
+def make_graph(states=None, task_count=200):
+    group = generate_task_group(task_count=task_count, fanout=3, seed=4)
+    for position, state in (states or {}).items():
+        group["tasks"][position]["status"]["state"] = state
+    return TaskGraph.from_data(group["groupid"], group["tasks"])
+
+
+def walk(graph, task_id, upstream=True):
+    by_id = {task.task_id: task for task in graph.tasklist}
+    children = {task.task_id: [] for task in graph.tasklist}
+    for task in graph.tasklist:
+        for dependency in task.task.dependencies:
+            children[dependency].append(task.task_id)
+    seen = set()
+    pending = [task_id]
+    while pending:
+        current = pending.pop()
+        following = by_id[current].task.dependencies if upstream else children[current]
+        for neighbour in following:
+            if neighbour not in seen:
+                seen.add(neighbour)
+                pending.append(neighbour)
+    return seen
+
+
+def test_bit_positions():
+    assert bit_positions(0) == []
+    assert bit_positions(0b101001) == [0, 3, 5]
+    assert bit_positions(1 << 70) == [70]
+
+
+def test_ancestors_and_descendants():
+    graph = make_graph()
+    for task in graph.tasklist[::17]:
+        ancestors = graph.ancestors(task.task_id)
+        assert {ancestor.task_id for ancestor in ancestors} == walk(graph, task.task_id)
+        assert [ancestor.task_id for ancestor in ancestors] == [t.task_id for t in graph.tasklist if t in ancestors]
+        assert {descendant.task_id for descendant in graph.descendants(task.task_id)} == walk(graph, task.task_id, upstream=False)
+    with pytest.raises(KeyError):
+        graph.ancestors("missing")
+
+
+def test_index_is_rebuilt_with_the_task_list():
+    graph = make_graph()
+    index = graph.dependency_index()
+    assert graph.dependency_index() is index
+    graph.tasklist = graph.tasklist[:50]
+    assert len(graph.dependency_index()) == 50
+    graph.tasklist = graph.tasklist[10:] + graph.tasklist[:10]
+    assert graph.dependency_index().task_ids == [task.task_id for task in graph.tasklist]
+
+
+def test_blocking_failures_and_unresolved():
+    graph = make_graph()
+    last = graph.tasklist[-1]
+    ancestors = graph.ancestors(last.task_id)
+    assert len(ancestors) > 3
+    root, downstream = None, None
+    for candidate in ancestors:
+        below = [task for task in graph.descendants(candidate.task_id) if task in ancestors]
+        if below:
+            root, downstream = candidate, below[0]
+            break
+    root.status.state = "failed"
+    downstream.status.state = "exception"
+    pending = ancestors[-1]
+    pending.status.state = "pending"
+    graph.tasklist = list(graph.tasklist)
+
+    failures = graph.blocking_failures(last.task_id)
+    assert root in failures
+    assert downstream not in failures
+    assert pending in graph.unresolved_upstream(last.task_id)
+    assert all(task.status.state not in ("completed", "failed", "exception") for task in graph.unresolved_upstream(last.task_id))
+
+
+def test_external_self_and_cyclic_dependencies():
+    graph = make_graph(task_count=5)
+    first, second, third = [task.task_id for task in graph.tasklist[:3]]
+    graph.tasklist[0].task.dependencies = ["elsewhere", first, third]
+    graph.tasklist[1].task.dependencies = [first]
+    graph.tasklist[2].task.dependencies = [second]
+    index = DependencyIndex(graph.tasklist)
+    assert index.parents[0] == [2]
+    assert 1 in bit_positions(index.descendants(0))
+    assert 0 in bit_positions(index.ancestors(1))
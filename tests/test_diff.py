@@ -0,0 +1,50 @@
+import copy
+import json
+
+from taskhuddler.diff import diff_graphs
+from taskhuddler.graph import TaskGraph
+from taskhuddler.synthetic import generate_task_group
+
+
+def make_graphs():
+    group = generate_task_group(task_count=30, fanout=2, failure_rate=0, seed=4)
+    old_tasks = group["tasks"]
+    new_tasks = copy.deepcopy(old_tasks)
+    return old_tasks, new_tasks
+
+
+def test_identical_graphs():
+    old_tasks, new_tasks = make_graphs()
+    diff = TaskGraph.from_data("old", old_tasks).diff(TaskGraph.from_data("new", new_tasks))
+    assert diff.added == []
+    assert diff.removed == []
+    assert diff.dependencies == {}
+    assert diff.worker_types == {}
+    assert diff.regressions() == []
+    assert len(diff.durations) == 30
+
+
+def test_graph_changes():
+    old_tasks, new_tasks = make_graphs()
+    removed = new_tasks.pop(0)
+    # Retriggered graphs have new task ids but the same labels.
+    for entry in new_tasks:
+        entry["status"]["taskId"] = entry["status"]["taskId"][::-1]
+    new_tasks[5]["task"]["workerType"] = "bigger-worker"
+    new_tasks[6]["task"]["dependencies"] = [new_tasks[1]["status"]["taskId"]]
+    new_tasks[7]["status"]["runs"][-1]["resolved"] = "2021-01-01T00:00:00.000Z"
+    added = copy.deepcopy(new_tasks[8])
+    added["task"]["tags"]["label"] = "brand-new-task"
+    new_tasks.append(added)
+
+    diff = diff_graphs(TaskGraph.from_data("old", old_tasks), TaskGraph.from_data("new", new_tasks))
+    assert diff.added == ["brand-new-task"]
+    assert diff.removed == [removed["task"]["tags"]["label"]]
+    label = new_tasks[5]["task"]["tags"]["label"]
+    assert diff.worker_types[label][1] == "bigger-worker"
+    label = new_tasks[6]["task"]["tags"]["label"]
+    assert diff.dependencies[label]["added"] == [new_tasks[1]["task"]["tags"]["label"]]
+    regressions = diff.regressions()
+    assert [change.label for change in regressions] == [new_tasks[7]["task"]["tags"]["label"]]
+    assert regressions[0].ratio > 1
+    assert json.loads(json.dumps(diff.to_dict()))["regressions"][0]["label"] == regressions[0].label
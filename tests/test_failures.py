@@ -0,0 +1,54 @@
+import json
+import os
+
+import pytest
+from taskhuddler.failures import analyse_failures, classify_run
+from taskhuddler.graph import TaskGraph
+from taskhuddler.synthetic import generate_task_group
+
+DATA_FILES = ["completed.json", "continuation1.json", "continuation2.json", "failed.json", "unscheduled.json"]
+
+
+def get_graph():
+    tasks = list()
+    for filename in DATA_FILES:
+        with open(os.path.join(os.path.dirname(__file__), "data", filename)) as f:
+            tasks.extend(json.loads(f.read())["tasks"])
+    return TaskGraph.from_data("eShtp2faQgy4iZZOIhXvhw", tasks)
+
+
+@pytest.mark.parametrize(
+    "run,expected",
+    (
+        [{"state": "completed", "reasonResolved": "completed"}, "completed"],
+        [{"state": "failed", "reasonResolved": "failed"}, "failed"],
+        [{"state": "exception", "reasonResolved": "worker-shutdown"}, "worker-shutdown"],
+        [{"state": "exception", "reasonResolved": "claim-expired"}, "worker-shutdown"],
+        [{"state": "exception", "reasonResolved": "deadline-exceeded"}, "deadline-exceeded"],
+        [{"state": "exception", "reasonResolved": "malformed-payload"}, "exception"],
+        [{"state": "running"}, "running"],
+    ),
+)
+def test_classify_run(run, expected):
+    assert classify_run(run) == expected
+
+
+def test_graph_failure_report():
+    report = get_graph().failure_report()
+    assert report.failed_tasks == ["A0VWjOkmRNqkKrRUj83BEA"]
+    assert report.flaky_tasks == []
+    assert report.categories["failed"] == 1
+    assert report.wasted_compute == {("nightly-l10n", "gecko-3-b-linux"): 526.231}
+    assert report.failures[0].label == "nightly-l10n-linux-nightly-2/opt"
+    assert json.loads(json.dumps(report.to_dict()))["wasted_compute"][0]["seconds"] == 526.231
+
+
+def test_retries_and_flaky_tasks():
+    group = generate_task_group(task_count=20, runs_per_task=3, failure_rate=0)
+    report = analyse_failures(TaskGraph.from_data(group["groupid"], group["tasks"]).tasklist)
+    assert report.run_count == 60
+    assert report.retry_count == 40
+    assert len(report.flaky_tasks) == 20
+    assert len(report.failures) == 40
+    assert report.categories["completed"] == 20
+    assert report.total_wasted_compute.total_seconds() == pytest.approx(sum(f.duration for f in report.failures))
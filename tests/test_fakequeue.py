@@ -0,0 +1,196 @@
+import json
+import os
+
+import pytest
+import taskcluster
+from taskhuddler import instrumentation
+from taskhuddler.aio.graph import TaskGraph as AsyncTaskGraph
+from taskhuddler.aio.graph import find_tasks as aio_find_tasks
+from taskhuddler.aio.graph import iter_task_group as aio_iter_task_group
+from taskhuddler.aio.task import TaskArtifact as AsyncTaskArtifact
+from taskhuddler.fakequeue import FakeQueue
+from taskhuddler.graph import TaskGraph, find_tasks
+from taskhuddler.task import Task
+
+
+@pytest.fixture
+def root_url(monkeypatch):
+    def set_root_url(url):
+        monkeypatch.setenv("TASKCLUSTER_ROOT_URL", url)
+        monkeypatch.delenv("TC_CACHE_DIR", raising=False)
+
+    return set_root_url
+
+
+def test_sync_graph_paged(root_url):
+    fake = FakeQueue(page_size=7).add_synthetic(task_count=50, seed=1)
+    groupid = fake.groupids()[0]
+    with fake.serve_in_thread() as url:
+        root_url(url)
+        graph = TaskGraph(groupid)
+    assert len(graph.tasklist) == 50
+    assert fake.calls["listTaskGroup"] == 8
+
+
+def test_sync_task_and_artifacts(root_url):
+    fake = FakeQueue(artifact_size=10).add_synthetic(task_count=3, artifact_count=1)
+    task_id = list(fake.tasks)[0]
+    with fake.serve_in_thread() as url:
+        root_url(url)
+        task = Task.from_task_id(task_id)
+        artifacts = task.artifacts()
+        content = artifacts[0].fetch()
+    assert task.task_id == task_id
+    assert [artifact.name for artifact in artifacts] == ["public/build/artifact-0.json", "public/logs/live_backing.log"]
+    assert content["taskId"] == task_id
+
+
+def test_recorded_groups(root_url, tmp_path):
+    with open(os.path.join(os.path.dirname(__file__), "data", "completed.json")) as f:
+        tasks = json.load(f)["tasks"]
+    (tmp_path / "groupA.json").write_text(json.dumps(tasks))
+    fake = FakeQueue().add_cached_groups(str(tmp_path))
+    assert fake.groupids() == ["groupA"]
+    with fake.serve_in_thread() as url:
+        root_url(url)
+        graph = TaskGraph("groupA")
+    assert [task.task_id for task in graph.tasklist] == [task["status"]["taskId"] for task in tasks]
+
+
+def test_recorded_artifact_data(root_url):
+    fake = FakeQueue().add_synthetic(task_count=1)
+    task_id = list(fake.tasks)[0]
+    fake.artifact_data[(task_id, "public/logs/live_backing.log")] = "hello\n"
+    with fake.serve_in_thread() as url:
+        root_url(url)
+        response = Task.from_task_id(task_id).artifacts()[-1].fetch()["response"]
+    assert response.text == "hello\n"
+
+
+def test_throttling(root_url):
+    fake = FakeQueue(throttle_rate=1.0).add_synthetic(task_count=1)
+    with fake.serve_in_thread() as url:
+        root_url(url)
+        with pytest.raises(taskcluster.exceptions.TaskclusterRestFailure) as excinfo:
+            TaskGraph(fake.groupids()[0])
+    assert excinfo.value.status_code == 429
+
+
+def test_unknown_group(root_url):
+    with FakeQueue().serve_in_thread() as url:
+        root_url(url)
+        with pytest.raises(taskcluster.exceptions.TaskclusterRestFailure):
+            TaskGraph("missing")
+
+
+def test_not_running():
+    with pytest.raises(RuntimeError):
+        FakeQueue().root_url
+
+
+@pytest.mark.asyncio
+async def test_aio_graph_with_errors(root_url):
+    fake = FakeQueue(page_size=10, error_rate=0.5, latency=0.001, seed=3).add_synthetic(task_count=40)
+    async with fake:
+        root_url(fake.root_url)
+        graph = await AsyncTaskGraph(fake.groupids()[0])
+        artifact = AsyncTaskArtifact(
+            name="public/build/artifact-0.json", expires="", storage_type="s3", content_type="application/json", task_id=graph.tasklist[0].task_id, run_id=0
+        )
+        content = await artifact.fetch()
+    assert len(graph.tasklist) == 40
+    assert fake.calls["listTaskGroup"] > 4
+    assert content["name"] == "public/build/artifact-0.json"
+
+
+@pytest.fixture
+def fetched_tasks():
+    pages = list()
+
+    def hook(event, data):
+        if event == "api_call" and data["method"] == "listTaskGroup":
+            pages.append(data["tasks"])
+
+    instrumentation.add_hook(hook)
+    yield pages
+    instrumentation.remove_hook(hook)
+
+
+def test_sync_limit_does_not_overfetch(root_url, fetched_tasks):
+    fake = FakeQueue(page_size=7).add_synthetic(task_count=50, seed=1)
+    groupid = fake.groupids()[0]
+    with fake.serve_in_thread() as url:
+        root_url(url)
+        graph = TaskGraph(groupid, limit=20)
+    assert len(graph.tasklist) == 20
+    assert fetched_tasks == [7, 7, 6]
+
+
+@pytest.mark.asyncio
+async def test_aio_limit_does_not_overfetch(root_url, fetched_tasks):
+    fake = FakeQueue(page_size=7).add_synthetic(task_count=50, seed=1)
+    groupid = fake.groupids()[0]
+    async with fake:
+        root_url(fake.root_url)
+        graph = await AsyncTaskGraph(groupid, limit=20)
+    assert len(graph.tasklist) == 20
+    assert fetched_tasks == [7, 7, 6]
+
+
+def failed_position(fake, groupid):
+    return next(position for position, data in enumerate(fake.groups[groupid]) if data["status"]["state"] == "failed")
+
+
+def test_find_tasks_stops_paging(root_url, fetched_tasks):
+    fake = FakeQueue().add_synthetic(task_count=3000, failure_rate=0.005, seed=1)
+    groupid = fake.groupids()[0]
+    position = failed_position(fake, groupid)
+    assert position > 100
+    with fake.serve_in_thread() as url:
+        root_url(url)
+        found = find_tasks(groupid, lambda task: task.status.state == "failed", limit=1)
+        pages = list(fetched_tasks)
+        builds = find_tasks(groupid, lambda task: task.kind == "build", limit=10, first_page_size=10)
+        everything = find_tasks(groupid, lambda task: True)
+    assert [task.task_id for task in found] == [fake.groups[groupid][position]["status"]["taskId"]]
+    assert pages == [100, 200, 400, 800][: len(pages)]
+    assert sum(pages[:-1]) <= position < sum(pages)
+    assert len(builds) == 10 and all(task.kind == "build" for task in builds)
+    assert len(everything) == 3000
+    assert find_tasks(groupid, lambda task: True, limit=0) == []
+
+
+@pytest.mark.asyncio
+async def test_aio_find_tasks_stops_paging(root_url, fetched_tasks):
+    fake = FakeQueue().add_synthetic(task_count=3000, failure_rate=0.005, seed=1)
+    groupid = fake.groupids()[0]
+    position = failed_position(fake, groupid)
+    async with fake:
+        root_url(fake.root_url)
+        found = await aio_find_tasks(groupid, lambda task: task.status.state == "failed", limit=1)
+        pages = list(fetched_tasks)
+        everything = [data async for data in aio_iter_task_group(groupid, first_page_size=500)]
+    assert [task.task_id for task in found] == [fake.groups[groupid][position]["status"]["taskId"]]
+    assert pages == [100, 200, 400, 800][: len(pages)]
+    assert sum(pages[:-1]) <= position < sum(pages)
+    assert len(everything) == 3000
+    assert fetched_tasks == pages + [500, 1000, 1000, 500]
+
+
+def test_find_tasks_in_cache(root_url, monkeypatch, tmp_path):
+    fake = FakeQueue().add_synthetic(task_count=30, seed=1)
+    groupid = fake.groupids()[0]
+    (tmp_path / "{}.json".format(groupid)).write_text(json.dumps(fake.groups[groupid]))
+    monkeypatch.setenv("TC_CACHE_DIR", str(tmp_path))
+    assert len(find_tasks(groupid, lambda task: True)) == 30
+    assert fake.calls["listTaskGroup"] == 0
+
+
+@pytest.mark.asyncio
+async def test_aio_find_tasks_in_cache(root_url, monkeypatch, tmp_path):
+    fake = FakeQueue().add_synthetic(task_count=30, seed=1)
+    groupid = fake.groupids()[0]
+    (tmp_path / "{}.json".format(groupid)).write_text(json.dumps(fake.groups[groupid]))
+    monkeypatch.setenv("TC_CACHE_DIR", str(tmp_path))
+    assert len(await aio_find_tasks(groupid, lambda task: True)) == 30
+    assert fake.calls["listTaskGroup"] == 0
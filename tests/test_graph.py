@@ -7,7 +7,9 @@ from unittest.mock import patch
 import dateutil.parser
 import pytest
 import taskcluster
+import taskhuddler.graph as graph_module
 from taskhuddler.graph import TaskGraph
+from taskhuddler.stats import compute_stats
 
 TASK_IDS = [
     "A-8AqzvvRsqH9b0VHBXYjA",
@@ -159,7 +161,8 @@ def test_graph_total_wall_time():
 def test_graph_total_compute_wall_time():
     with patch.object(taskcluster.Queue, "listTaskGroup", new=mocked_listTaskGroup):
         graph = TaskGraph("eShtp2faQgy4iZZOIhXvhw")
-        assert graph.total_compute_wall_time() == datetime.timedelta(seconds=1245, microseconds=391000)
+        # Two tasks share an identical run interval, which only counts once.
+        assert graph.total_compute_wall_time() == datetime.timedelta(seconds=1048, microseconds=976000)
 
 
 def test_graph_to_dataframe():
@@ -169,3 +172,82 @@ def test_graph_to_dataframe():
         assert sorted(df.taskid.to_list()) == sorted(
             ["A-8AqzvvRsqH9b0VHBXYjA", "A-aPcZanRJaxM-IToHyyHw", "A0BaQjdkS8Wdy2Ev_1pLgA", "A0VWjOkmRNqkKrRUj83BEA", "B-aPcZanRJaxM-IToHyyHw"]
         )
+
+
+def test_graph_to_dataframe_dtypes():
+    with patch.object(taskcluster.Queue, "listTaskGroup", new=mocked_listTaskGroup):
+        graph = TaskGraph("eShtp2faQgy4iZZOIhXvhw")
+        df = graph.to_dataframe()
+    assert list(df.columns) == graph_module.DATAFRAME_COLUMNS
+    for column in graph_module.DATAFRAME_CATEGORICAL_COLUMNS:
+        assert df[column].dtype == "category"
+    first = df[df.taskid == "A-8AqzvvRsqH9b0VHBXYjA"].iloc[0]
+    assert first.started == dateutil.parser.parse("2017-10-26T01:03:59.291Z")
+    assert first.platform == "windows10-64-nightly"
+
+
+def test_graph_to_parquet(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    with patch.object(taskcluster.Queue, "listTaskGroup", new=mocked_listTaskGroup):
+        graph = TaskGraph("eShtp2faQgy4iZZOIhXvhw")
+        other = TaskGraph("other")
+    path = str(tmp_path / "graphs.parquet")
+    graph_module.graphs_to_parquet([graph, other], path)
+    table = pq.read_table(path)
+    assert table.num_rows == 2 * len(graph.to_dataframe())
+    assert sorted(set(table.column("groupid").to_pylist())) == ["eShtp2faQgy4iZZOIhXvhw", "other"]
+    assert graph.to_arrow().num_rows == len(graph.to_dataframe())
+
+
+def test_graph_summary():
+    with patch.object(taskcluster.Queue, "listTaskGroup", new=mocked_listTaskGroup):
+        graph = TaskGraph("eShtp2faQgy4iZZOIhXvhw")
+    summary = graph.summary()
+    assert summary is graph.summary()
+    assert summary.completed is graph.completed
+    assert summary.states == graph.current_states()
+    assert summary.earliest_start_time == graph.earliest_start_time
+    assert summary.latest_finished_time == graph.latest_finished_time
+    assert summary.total_compute_time == graph.total_compute_time()
+    assert summary.total_wall_time == graph.total_wall_time()
+    # Two tasks share an identical run interval, counted once by both.
+    assert summary.total_compute_wall_time == graph.total_compute_wall_time() == datetime.timedelta(seconds=1048, microseconds=976000)
+    assert summary.task_timings == list(graph.task_timings())
+    assert json.loads(json.dumps(summary.to_dict()))["total_compute_time"] == 1316.516
+
+    graph.tasklist = graph.tasklist[:2]
+    assert graph.summary().task_count == 2
+
+
+def test_graph_summary_merge():
+    with patch.object(taskcluster.Queue, "listTaskGroup", new=mocked_listTaskGroup):
+        graph = TaskGraph("eShtp2faQgy4iZZOIhXvhw")
+    first = compute_stats(graph.tasklist[:3])
+    second = compute_stats(graph.tasklist[3:])
+    merged = first.merge(second)
+    assert merged.to_dict() == graph.summary().to_dict()
+
+
+def test_task_timings_longer_than_a_day():
+    with patch.object(taskcluster.Queue, "listTaskGroup", new=mocked_listTaskGroup):
+        graph = TaskGraph("eShtp2faQgy4iZZOIhXvhw")
+    graph.tasklist[0].status.runs[-1]["resolved"] = "2017-10-27T01:18:11.852Z"
+    assert list(graph.task_timings())[0]["duration"] == 86400 + 852
+
+
+def test_critical_path():
+    with patch.object(taskcluster.Queue, "listTaskGroup", new=mocked_listTaskGroup):
+        graph = TaskGraph("eShtp2faQgy4iZZOIhXvhw")
+    path = graph.critical_path()
+    assert [task.taskId for task in path] == ["A-aPcZanRJaxM-IToHyyHw"]
+    graph.tasklist[1].task.dependencies.append("A-8AqzvvRsqH9b0VHBXYjA")
+    assert [task.taskId for task in graph.critical_path()] == ["A-8AqzvvRsqH9b0VHBXYjA", "A-aPcZanRJaxM-IToHyyHw"]
+
+
+def test_graph_summary_new_list_of_same_length():
+    with patch.object(taskcluster.Queue, "listTaskGroup", new=mocked_listTaskGroup):
+        graph = TaskGraph("eShtp2faQgy4iZZOIhXvhw")
+    graph.tasklist = graph.tasklist[:3]
+    assert graph.summary().task_count == 3
+    graph.tasklist = [task for task in graph.tasklist if task.status.completed] + graph.tasklist[:1]
+    assert graph.summary().states == graph.current_states()
@@ -0,0 +1,181 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from taskhuddler.aio.graphcache import AsyncGraphCache
+from taskhuddler.dedup import Interner
+from taskhuddler.fakequeue import FakeQueue
+from taskhuddler.graph import TaskGraph
+from taskhuddler.graphcache import GraphCache, estimate_size, get_graph, graph_resolved, set_default_cache
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake(serve_queue):
+    fake = FakeQueue(latency=0.1)
+    for seed in range(3):
+        fake.add_synthetic(task_count=50, seed=seed)
+    return serve_queue(fake)
+
+
+def start_running(fake, groupid):
+    fake.groups[groupid][0]["status"]["state"] = "running"
+
+
+def test_hits_and_misses(fake):
+    cache = GraphCache()
+    groupid = fake.groupids()[0]
+    graph = cache.get(groupid)
+    assert cache.get(groupid) is graph
+    assert cache.get(groupid, limit=10) is not graph
+    assert fake.calls["listTaskGroup"] == 2
+    assert cache.stats == {"misses": 2, "hits": 1}
+    assert len(cache) == 2
+    assert cache.size == estimate_size(graph) + estimate_size(cache.get(groupid, limit=10))
+
+
+def test_concurrent_misses_load_once(fake):
+    cache = GraphCache()
+    groupid = fake.groupids()[0]
+    with ThreadPoolExecutor(8) as pool:
+        graphs = list(pool.map(lambda _: cache.get(groupid), range(8)))
+    assert all(graph is graphs[0] for graph in graphs)
+    assert fake.calls["listTaskGroup"] == 1
+    assert cache.stats["misses"] == 1
+
+
+def test_least_recently_used_evicted(fake):
+    first, second, third = fake.groupids()
+    size = estimate_size(TaskGraph(first))
+    cache = GraphCache(max_bytes=size * 2.5)
+    cache.get(first)
+    cache.get(second)
+    cache.get(first)
+    cache.get(third)
+    assert cache.stats["evictions"] == 1
+    assert cache.key(second) not in cache._entries
+    assert cache.size <= cache.max_bytes
+    cache.get(first)
+    assert cache.stats["hits"] == 2
+
+
+def test_graph_over_budget_not_cached(fake):
+    cache = GraphCache(max_bytes=1)
+    groupid = fake.groupids()[0]
+    assert len(cache.get(groupid).tasklist) == 50
+    assert len(cache) == 0
+    assert cache.size == 0
+
+
+def test_unresolved_graph_refreshed(fake, monkeypatch, tmp_path):
+    monkeypatch.setenv("TC_CACHE_DIR", str(tmp_path))
+    clock = Clock()
+    cache = GraphCache(refresh_after=60, clock=clock)
+    groupid = fake.groupids()[0]
+    start_running(fake, groupid)
+    graph = cache.get(groupid)
+    assert not graph_resolved(graph)
+    clock.now = 30
+    assert cache.get(groupid) is graph
+
+    fake.groups[groupid][0]["status"]["state"] = "completed"
+    clock.now = 90
+    refreshed = cache.get(groupid)
+    assert refreshed is not graph
+    assert graph.tasklist[0].status.state == "running"
+    assert refreshed.tasklist[0].status.state == "completed"
+    assert cache.stats["refreshes"] == 1
+    # The file cache is bypassed and updated.
+    with open(tmp_path / "{}.json".format(groupid)) as f:
+        assert json.load(f)[0]["status"]["state"] == "completed"
+
+    # Resolved graphs aren't refreshed.
+    clock.now = 1000
+    assert cache.get(groupid) is refreshed
+    assert fake.calls["listTaskGroup"] == 2
+
+
+def test_failed_refresh_keeps_graph(fake, monkeypatch):
+    clock = Clock()
+    cache = GraphCache(refresh_after=60, clock=clock)
+    groupid = fake.groupids()[0]
+    start_running(fake, groupid)
+    graph = cache.get(groupid)
+
+    def unavailable(self, limit=None):
+        raise ConnectionError("queue unavailable")
+
+    monkeypatch.setattr(TaskGraph, "_fetch_tasks_from_queue", unavailable)
+    clock.now = 90
+    assert cache.get(groupid) is graph
+    assert cache.stats["refresh_errors"] == 1
+
+
+def test_invalidate(fake):
+    cache = GraphCache()
+    groupid = fake.groupids()[0]
+    graph = cache.get(groupid)
+    cache.invalidate(groupid)
+    assert len(cache) == 0
+    assert cache.size == 0
+    assert cache.get(groupid) is not graph
+
+
+def test_get_graph(fake):
+    set_default_cache(GraphCache())
+    try:
+        groupid = fake.groupids()[0]
+        assert get_graph(groupid) is get_graph(groupid)
+    finally:
+        set_default_cache(None)
+    assert fake.calls["listTaskGroup"] == 1
+
+
+def test_estimate_size_scales(fake):
+    small = TaskGraph.from_data("small", fake.groups[fake.groupids()[0]][:10])
+    large = TaskGraph.from_data("large", fake.groups[fake.groupids()[0]])
+    assert 3 * estimate_size(small) < estimate_size(large) < 7 * estimate_size(small)
+
+
+@pytest.mark.asyncio
+async def test_aio_concurrent_misses_load_once(fake):
+    cache = AsyncGraphCache()
+    groupid = fake.groupids()[0]
+    graphs = await asyncio.gather(*[cache.get(groupid) for _ in range(8)])
+    assert all(graph is graphs[0] for graph in graphs)
+    assert await cache.get(groupid) is graphs[0]
+    assert fake.calls["listTaskGroup"] == 1
+    assert cache.stats == {"misses": 1, "hits": 1}
+
+
+@pytest.mark.asyncio
+async def test_aio_unresolved_graph_refreshed(fake):
+    clock = Clock()
+    cache = AsyncGraphCache(refresh_after=60, clock=clock)
+    groupid = fake.groupids()[0]
+    start_running(fake, groupid)
+    graph = await cache.get(groupid)
+    fake.groups[groupid][0]["status"]["state"] = "completed"
+    clock.now = 90
+    refreshed = await cache.get(groupid)
+    assert refreshed is not graph
+    assert type(refreshed) is type(graph)
+    assert graph.tasklist[0].status.state == "running"
+    assert refreshed.tasklist[0].status.state == "completed"
+    assert cache.stats["refreshes"] == 1
+
+
+@pytest.mark.asyncio
+async def test_aio_interner(fake):
+    interner = Interner()
+    cache = AsyncGraphCache(interner=interner)
+    first, second = [await cache.get(groupid) for groupid in fake.groupids()[:2]]
+    assert first.tasklist[0].task.scopes is second.tasklist[0].task.scopes
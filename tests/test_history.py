@@ -0,0 +1,96 @@
+import datetime
+import json
+import os
+
+import pytest
+from taskhuddler.history import INDEX_FILENAME, RunIndex
+from taskhuddler.synthetic import EPOCH, generate_task_group
+from taskhuddler.utils import cached_groupids, parse_datetime
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    for seed in range(3):
+        group = generate_task_group(task_count=40, runs_per_task=2, seed=seed)
+        (tmp_path / "{}.json".format(group["groupid"])).write_text(json.dumps(group["tasks"]))
+    return str(tmp_path)
+
+
+def all_runs(cache_dir):
+    for groupid in cached_groupids(cache_dir):
+        with open(os.path.join(cache_dir, "{}.json".format(groupid))) as f:
+            for task in json.load(f):
+                for run in task["status"]["runs"]:
+                    yield groupid, task, run
+
+
+def test_build_and_save(cache_dir):
+    index = RunIndex.build(cache_dir)
+    assert len(index) == 3 * 40 * 2
+    assert os.path.exists(os.path.join(cache_dir, INDEX_FILENAME))
+    assert cached_groupids(cache_dir) == sorted(index.graphs)
+    assert len(RunIndex(cache_dir).load()) == len(index)
+
+
+@pytest.mark.parametrize("by", ["started", "resolved", "overlap"])
+def test_runs(cache_dir, by):
+    start = EPOCH + datetime.timedelta(hours=2)
+    end = EPOCH + datetime.timedelta(hours=3, minutes=30)
+    expected = set()
+    for groupid, task, run in all_runs(cache_dir):
+        started, resolved = parse_datetime(run["started"]), parse_datetime(run["resolved"])
+        if task["task"]["tags"]["kind"] != "build":
+            continue
+        if by == "started" and start <= started < end:
+            expected.add((task["status"]["taskId"], run["runId"]))
+        elif by == "resolved" and start <= resolved < end:
+            expected.add((task["status"]["taskId"], run["runId"]))
+        elif by == "overlap" and started < end and resolved > start:
+            expected.add((task["status"]["taskId"], run["runId"]))
+
+    runs = RunIndex.build(cache_dir).runs(start, end, kind="build", by=by)
+    assert expected
+    assert {(run.task_id, run.run_id) for run in runs} == expected
+    assert all(run.kind == "build" for run in runs)
+
+
+def test_naive_and_string_times(cache_dir):
+    index = RunIndex.build(cache_dir)
+    aware = index.runs(EPOCH, EPOCH + datetime.timedelta(hours=1))
+    assert aware
+    assert index.runs(EPOCH.replace(tzinfo=None), datetime.datetime(2020, 1, 1, 1)) == aware
+    assert index.runs("2020-01-01T00:00:00.000Z", "2020-01-01T01:00:00.000Z") == aware
+
+
+def test_tasks_reads_matching_graphs_only(cache_dir):
+    index = RunIndex.build(cache_dir)
+    start, end = EPOCH, EPOCH + datetime.timedelta(hours=1)
+    runs = index.runs(start, end, kind="signing")
+    groupids = {run.groupid for run in runs}
+    for groupid in cached_groupids(cache_dir):
+        if groupid not in groupids:
+            os.remove(os.path.join(cache_dir, "{}.json".format(groupid)))
+    tasks = index.tasks(start, end, kind="signing")
+    assert {task.task_id for task in tasks} == {run.task_id for run in runs}
+    assert all(task.kind == "signing" for task in tasks)
+
+
+def test_refresh(cache_dir):
+    index = RunIndex.build(cache_dir)
+    assert not index.refresh()
+
+    group = generate_task_group(task_count=5, seed=10)
+    with open(os.path.join(cache_dir, "{}.json".format(group["groupid"])), "w") as f:
+        json.dump(group["tasks"], f)
+    removed = cached_groupids(cache_dir)[0]
+    os.remove(os.path.join(cache_dir, "{}.json".format(removed)))
+
+    assert index.refresh()
+    assert removed not in index.graphs
+    assert len(index) == 2 * 40 * 2 + 5
+    assert len(index.runs(EPOCH, EPOCH + datetime.timedelta(days=7))) == len(index)
+
+
+def test_unknown_lookup(cache_dir):
+    with pytest.raises(ValueError):
+        RunIndex.build(cache_dir).runs(EPOCH, EPOCH, by="created")
@@ -0,0 +1,24 @@
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ["taskcluster", "aiohttp", "aiofiles", "dateutil", "pandas", "requests"]
+
+
+@pytest.mark.parametrize("module", ["taskhuddler", "taskhuddler.aio", "taskhuddler.cli", "taskhuddler.graph", "taskhuddler.graphcache"])
+def test_import_is_lazy(module):
+    code = "import sys, {}; print(' '.join(sorted(m for m in sys.modules if m.split('.')[0] in {!r})))".format(module, HEAVY_MODULES)
+    output = subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    assert output.strip() == ""
+
+
+def test_lazy_attributes():
+    import taskhuddler
+    import taskhuddler.aio
+
+    assert taskhuddler.TaskGraph.__module__ == "taskhuddler.graph"
+    assert taskhuddler.aio.TaskGraph.__module__ == "taskhuddler.aio.graph"
+    assert "TaskArtifact" in dir(taskhuddler)
+    with pytest.raises(AttributeError):
+        taskhuddler.NotAThing
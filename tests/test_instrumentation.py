@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+import pytest
+import taskcluster
+import taskhuddler.instrumentation as instrumentation
+from taskhuddler.graph import TaskGraph
+
+
+def mocked_listTaskGroup(dummy, groupid, query):
+    if "continuationToken" in query:
+        filename = "{}.json".format(query["continuationToken"])
+    else:
+        filename = "completed.json"
+
+    with open(os.path.join(os.path.dirname(__file__), "data", filename)) as f:
+        return json.loads(f.read())
+
+
+def test_disabled_by_default():
+    assert instrumentation.enabled() is False
+    with instrumentation.timed("anything") as data:
+        data["ignored"] = True
+
+
+def test_graph_load_events():
+    with instrumentation.Recorder() as recorder:
+        with patch.object(taskcluster.Queue, "listTaskGroup", new=mocked_listTaskGroup):
+            graph = TaskGraph("eShtp2faQgy4iZZOIhXvhw")
+        graph.total_compute_time()
+    assert instrumentation.enabled() is False
+
+    summary = recorder.summary()
+    assert summary["api_call:listTaskGroup"]["count"] == 5
+    assert summary["api_call:listTaskGroup"]["bytes"] > 0
+    assert summary["build_tasks"]["count"] == 1
+    assert summary["aggregate:total_compute_time"]["count"] == 1
+    pages = [data["tasks"] for event, data in recorder.events if event == "api_call"]
+    assert sum(pages) == 6
+
+
+def test_cache_events():
+    tmpdir = tempfile.mkdtemp()
+    os.environ["TC_CACHE_DIR"] = tmpdir
+    try:
+        with instrumentation.Recorder() as recorder:
+            with patch.object(taskcluster.Queue, "listTaskGroup", new=mocked_listTaskGroup):
+                TaskGraph("eShtp2faQgy4iZZOIhXvhw")
+                TaskGraph("eShtp2faQgy4iZZOIhXvhw")
+    finally:
+        del os.environ["TC_CACHE_DIR"]
+    summary = recorder.summary()
+    assert summary["cache_write"]["count"] == 1
+    assert summary["cache_read"]["count"] == 1
+    assert summary["cache_read"]["bytes"] == summary["cache_write"]["bytes"]
+
+
+def test_failing_hook_is_ignored():
+    def broken(event, data):
+        raise RuntimeError("broken hook")
+
+    instrumentation.add_hook(broken)
+    try:
+        assert instrumentation.call_api("status", lambda: {"status": {}}) == {"status": {}}
+    finally:
+        instrumentation.remove_hook(broken)
+
+
+@pytest.mark.asyncio
+async def test_call_api_async():
+    async def status():
+        return {"status": {"state": "completed"}}
+
+    with instrumentation.Recorder() as recorder:
+        await instrumentation.call_api_async("status", status)
+    assert recorder.summary()["api_call:status"]["count"] == 1
@@ -0,0 +1,64 @@
+import json
+import os
+import shutil
+import tempfile
+
+import pytest
+import taskhuddler.parallel as parallel
+
+DATA_FILES = ["completed.json", "continuation1.json", "continuation2.json", "failed.json", "unscheduled.json"]
+
+
+def get_graph_data():
+    tasks = list()
+    for filename in DATA_FILES:
+        with open(os.path.join(os.path.dirname(__file__), "data", filename)) as f:
+            tasks.extend(json.loads(f.read())["tasks"])
+    return tasks
+
+
+@pytest.fixture
+def cache_dir():
+    tmpdir = tempfile.mkdtemp()
+    for groupid in ["groupA", "groupB"]:
+        with open(os.path.join(tmpdir, "{}.json".format(groupid)), "w") as f:
+            f.write(json.dumps(get_graph_data()))
+    with open(os.path.join(tmpdir, "broken.json"), "w") as f:
+        f.write("not json")
+    yield tmpdir
+    shutil.rmtree(tmpdir)
+
+
+def test_cached_groupids(cache_dir):
+    assert parallel.cached_groupids(cache_dir) == ["broken", "groupA", "groupB"]
+
+
+def test_no_cache_dir(monkeypatch):
+    monkeypatch.delenv("TC_CACHE_DIR", raising=False)
+    with pytest.raises(ValueError):
+        parallel.cached_groupids()
+
+
+def test_current_states(cache_dir):
+    result = parallel.analyse_cached_graphs("current_states", cache_dir=cache_dir, processes=2)
+    assert result == {"completed": 8, "failed": 2, "unscheduled": 2}
+
+
+def test_task_timings(cache_dir):
+    result = parallel.analyse_cached_graphs("task_timings", cache_dir=cache_dir, processes=2)
+    assert result[("test", "windows10-64-nightly")] == [2, 1704, 852, 852]
+    assert result[("repackage-signing", "osx-cross")] == [2, 142, 71, 71]
+
+
+def test_compute_time(cache_dir):
+    result = parallel.analyse_cached_graphs("compute_time", groupids=["groupA", "groupB"], cache_dir=cache_dir, processes=2)
+    assert result == {"graphs": 2, "tasks": 12, "total_compute_time": 2633.032, "total_compute_wall_time": 2097.952}
+
+
+def test_custom_reducer_without_merge(cache_dir):
+    result = parallel.analyse_cached_graphs(len_tasklist, groupids=["groupA", "groupB"], cache_dir=cache_dir, processes=1)
+    assert result == {"groupA": 6, "groupB": 6}
+
+
+def len_tasklist(graph):
+    return len(graph.tasklist)
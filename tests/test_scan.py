@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from taskhuddler.cassette import Cassette
+from taskhuddler.fakequeue import FakeQueue
+from taskhuddler.graph import TaskGraph
+from taskhuddler.scan import ScanResult, decode_artifact, scan_artifacts, scan_tasks
+from taskhuddler.task import TaskArtifact
+
+
+def artifact_name(data):
+    return data["name"]
+
+
+def line_count(text):
+    return len(text.splitlines())
+
+
+def explode(data):
+    raise ValueError("bad artifact")
+
+
+@pytest.fixture
+def graph(serve_queue):
+    fake = serve_queue(FakeQueue(artifact_size=20000).add_synthetic(task_count=6, artifact_count=2))
+    return TaskGraph(fake.groupids()[0])
+
+
+def test_decode_artifact():
+    assert decode_artifact("public/a.json", b'{"a": 1}') == {"a": 1}
+    assert decode_artifact("public/a", b'{"a": 1}', "application/json; charset=utf-8") == {"a": 1}
+    assert decode_artifact("public/a.log", b"text\n") == "text\n"
+
+
+def test_scan_tasks(graph):
+    results = scan_tasks(graph.tasks(), "artifact-1.json", artifact_name, concurrency=4)
+    assert len(results) == 6
+    assert {result.task_id for result in results} == {task.task_id for task in graph.tasks()}
+    assert all(result.result == "public/build/artifact-1.json" and result.error is None for result in results)
+
+
+def test_scan_artifacts_with_executor(graph):
+    artifacts = [
+        TaskArtifact(name="public/logs/live_backing.log", expires="", storage_type="s3", content_type="text/plain", task_id=task.task_id, run_id=0)
+        for task in graph.tasks()
+    ]
+    with ThreadPoolExecutor(2) as executor:
+        results = scan_artifacts(artifacts, line_count, executor=executor)
+    assert sorted(result.task_id for result in results) == sorted(artifact.task_id for artifact in artifacts)
+    assert all(result.result > 1 for result in results)
+
+
+def test_scan_errors(graph):
+    artifacts = [
+        TaskArtifact(name="public/build/artifact-0.json", expires="", storage_type="s3", content_type="application/json", task_id=task_id, run_id=0)
+        for task_id in (graph.tasks()[0].task_id, "missing")
+    ]
+    results = {result.task_id: result for result in scan_artifacts(artifacts, explode, concurrency=1)}
+    assert "ValueError('bad artifact')" == results[graph.tasks()[0].task_id].error
+    assert results["missing"].error
+    assert results["missing"] == ScanResult(task_id="missing", run_id=0, name="public/build/artifact-0.json", error=results["missing"].error)
+
+
+def test_scan_replayed_from_cassette(serve_queue, tmp_path):
+    fake = serve_queue(FakeQueue().add_synthetic(task_count=4, artifact_count=1))
+    graph = TaskGraph(fake.groupids()[0])
+    path = str(tmp_path / "cassette.zip")
+    with Cassette(path, mode="record"), ThreadPoolExecutor(2) as executor:
+        recorded = scan_tasks(graph.tasks(), ".log", line_count, executor=executor)
+    assert fake.calls["getArtifact"] == 4
+    calls = sum(fake.calls.values())
+    with Cassette(path, mode="replay"), ThreadPoolExecutor(2) as executor:
+        replayed = scan_tasks(graph.tasks(), ".log", line_count, executor=executor)
+    assert sum(fake.calls.values()) == calls
+    assert sorted((result.task_id, result.result) for result in replayed) == sorted((result.task_id, result.result) for result in recorded)
+    assert all(result.error is None for result in replayed)
@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from taskhuddler.fakequeue import FakeQueue
+from taskhuddler.graph import TaskGraph
+from taskhuddler.parallel import current_states, merge_current_states
+from taskhuddler.sharded import ShardedTaskGraph, fetch_sharded, summarise_page
+from taskhuddler.stats import compute_stats
+
+
+@pytest.fixture
+def fake(serve_queue):
+    return serve_queue(FakeQueue(page_size=30).add_synthetic(task_count=200, runs_per_task=2, failure_rate=0.1))
+
+
+def test_fetch_sharded(fake):
+    groupid = fake.groupids()[0]
+    expected = TaskGraph(groupid)
+    graph = fetch_sharded(groupid, processes=2, reducer=current_states, merge=merge_current_states)
+    assert fake.calls["listTaskGroup"] == 2 * 7
+    assert graph.summary() == compute_stats(expected.tasklist)
+    assert graph.reduction == current_states(expected)
+    assert graph.current_states() == expected.current_states()
+    assert graph.completed == expected.completed
+    assert graph.earliest_start_time == expected.earliest_start_time
+    assert graph.latest_finished_time == expected.latest_finished_time
+    assert graph.total_compute_time() == expected.total_compute_time()
+    assert list(graph.task_timings()) == list(expected.task_timings())
+    assert graph._dataframe_columns() == expected._dataframe_columns()
+    assert [task.task_id for task in graph.tasklist] == [task.task_id for task in expected.tasklist]
+    assert [task.task_id for task in graph.critical_path()] == [task.task_id for task in expected.critical_path()]
+
+
+def test_without_tasks(fake):
+    with ThreadPoolExecutor(2) as executor:
+        graph = fetch_sharded(fake.groupids()[0], keep_tasks=False, executor=executor)
+    assert graph.summary().task_count == 200
+    with pytest.raises(RuntimeError):
+        graph.tasklist
+
+
+def test_reducer_needs_merge(fake):
+    with pytest.raises(ValueError):
+        fetch_sharded(fake.groupids()[0], reducer=current_states)
+
+
+def test_empty_shards():
+    graph = ShardedTaskGraph("groupA", [summarise_page([])], pages=[[]])
+    assert graph.summary().task_count == 0
+    assert graph.tasklist == []
+    with pytest.raises(ValueError):
+        graph.earliest_start_time
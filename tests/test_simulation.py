@@ -0,0 +1,102 @@
+import datetime
+import time
+
+import pytest
+from taskhuddler.graph import TaskGraph
+from taskhuddler.simulation import last_run_time, priority_rank, run_time, simulate
+from taskhuddler.synthetic import EPOCH, format_timestamp, generate_task_group
+
+
+def make_graph(spec):
+    """Build a graph from (duration, dependencies, worker type, priority) tuples, dependencies by index."""
+    group = generate_task_group(task_count=len(spec), fanout=0, failure_rate=0)
+    task_ids = [data["status"]["taskId"] for data in group["tasks"]]
+    for data, (duration, dependencies, worker_type, priority) in zip(group["tasks"], spec):
+        run = data["status"]["runs"][0]
+        run["started"] = format_timestamp(EPOCH)
+        run["resolved"] = format_timestamp(EPOCH + datetime.timedelta(seconds=duration))
+        data["status"]["workerType"] = worker_type
+        data["task"]["dependencies"] = [task_ids[dep] for dep in dependencies]
+        data["task"]["priority"] = priority
+    return TaskGraph.from_data(group["groupid"], group["tasks"])
+
+
+def labels(tasks):
+    return [task.label.rsplit("-", 1)[1] for task in tasks]
+
+
+@pytest.fixture
+def diamond():
+    return make_graph(
+        [
+            (10, [], "build", "high"),
+            (30, [0], "test", "low"),
+            (20, [0], "test", "low"),
+            (5, [1, 2], "build", "high"),
+        ]
+    )
+
+
+def test_unlimited_workers(diamond):
+    result = diamond.simulate()
+    assert result.wall_time == datetime.timedelta(seconds=45)
+    assert labels(result.critical_path) == ["0", "1", "3"]
+    assert result.waited == {}
+
+
+def test_single_worker(diamond):
+    result = simulate(diamond, workers={"test": 1})
+    assert result.wall_time == datetime.timedelta(seconds=65)
+    assert result.waited == {"test": 30}
+    # Task 2 waited for the worker task 1 freed.
+    assert labels(result.critical_path) == ["0", "1", "2", "3"]
+
+
+def test_priorities():
+    graph = make_graph([(10, [], "b", "lowest"), (10, [], "b", "highest"), (10, [], "b", "medium")])
+    result = graph.simulate(default_workers=1)
+    starts = [result.starts[task.taskId] for task in graph.tasklist]
+    assert starts == [20, 0, 10]
+    reversed_priorities = graph.simulate(default_workers=1, priority=lambda task: "highest" if task.label.endswith("-0") else "lowest")
+    assert reversed_priorities.starts[graph.tasklist[0].taskId] == 0
+
+
+def test_same_priority_in_ready_order():
+    graph = make_graph([(10, [], "a", "low"), (1, [], "b", "low"), (5, [0], "b", "low"), (5, [1], "b", "low")])
+    result = graph.simulate(workers={"b": 1})
+    assert [result.starts[task.taskId] for task in graph.tasklist] == [0, 0, 10, 1]
+
+
+def test_priority_rank():
+    assert priority_rank("highest") < priority_rank("medium") < priority_rank("lowest")
+    assert priority_rank("normal") == priority_rank("lowest")
+    assert priority_rank("unknown") == priority_rank("lowest")
+
+
+def test_run_times():
+    graph = TaskGraph.from_data("retried", generate_task_group(task_count=1, runs_per_task=2)["tasks"])
+    task = graph.tasklist[0]
+    first, last = [duration.total_seconds() for duration in task.status.run_durations()]
+    assert run_time(task) == first + last
+    assert last_run_time(task) == last
+
+
+def test_invalid_pool(diamond):
+    with pytest.raises(ValueError):
+        diamond.simulate(workers={"test": 0})
+
+
+def test_empty_graph():
+    assert TaskGraph.from_data("empty", []).simulate().wall_time == datetime.timedelta(0)
+
+
+def test_large_graph():
+    graph = TaskGraph.from_data("large", generate_task_group(task_count=20000, fanout=4)["tasks"])
+    start = time.perf_counter()
+    result = graph.simulate(default_workers=100)
+    assert time.perf_counter() - start < 10
+    assert len(result.finishes) == 20000
+    assert result.wall_time >= graph.simulate().wall_time
+    # Every task starts after its dependencies finished.
+    for task in graph.tasklist:
+        assert all(result.finishes[dep] <= result.starts[task.taskId] for dep in task.task.dependencies)
@@ -0,0 +1,84 @@
+import json
+import os
+
+import pytest
+from taskhuddler.graph import TaskGraph
+from taskhuddler.snapshot import SnapshotGraph, open_snapshot
+from taskhuddler.synthetic import generate_task_group
+
+
+def fixture_graph():
+    tasks = list()
+    for filename in ("completed.json", "continuation1.json", "continuation2.json", "failed.json", "unscheduled.json"):
+        with open(os.path.join(os.path.dirname(__file__), "data", filename)) as f:
+            tasks.extend(json.load(f)["tasks"])
+    return TaskGraph.from_data("groupA", tasks)
+
+
+@pytest.fixture(params=["fixture", "synthetic"])
+def graphs(request, tmp_path):
+    if request.param == "fixture":
+        graph = fixture_graph()
+    else:
+        group = generate_task_group(task_count=300, runs_per_task=2, failure_rate=0.1)
+        graph = TaskGraph.from_data(group["groupid"], group["tasks"])
+    path = str(tmp_path / "graph.snapshot")
+    graph.to_snapshot(path)
+    with open_snapshot(path) as snapshot:
+        yield graph, snapshot
+
+
+def test_aggregates(graphs):
+    graph, snapshot = graphs
+    assert snapshot.groupid == graph.groupid
+    assert len(snapshot) == len(graph.tasklist)
+    assert snapshot.current_states() == graph.current_states()
+    assert snapshot.completed == graph.completed
+    assert snapshot.earliest_start_time == graph.earliest_start_time
+    assert snapshot.latest_finished_time == graph.latest_finished_time
+    assert snapshot.total_compute_time() == graph.total_compute_time()
+    assert list(snapshot.task_timings()) == list(graph.task_timings())
+    assert sorted(snapshot.kinds) == sorted(graph.kinds)
+    assert snapshot._dataframe_columns() == graph._dataframe_columns()
+
+
+def test_tasks_on_demand(graphs):
+    graph, snapshot = graphs
+    last = graph.tasklist[-1]
+    assert snapshot.get_task(last.task_id) == last
+    assert snapshot._tasklist is None
+    assert snapshot.tasklist == graph.tasklist
+    assert snapshot.summary() == graph.summary()
+    with pytest.raises(KeyError):
+        snapshot.get_task("missing")
+
+
+def test_dependencies(graphs):
+    graph, snapshot = graphs
+    positions = {task.task_id: position for position, task in enumerate(graph.tasklist)}
+    for position, task in enumerate(graph.tasklist):
+        expected = [positions[dependency] for dependency in task.task.dependencies if dependency in positions]
+        assert snapshot.dependencies(position) == expected
+
+
+def test_dataframe(graphs):
+    pytest.importorskip("pandas")
+    graph, snapshot = graphs
+    assert snapshot.to_dataframe().equals(graph.to_dataframe())
+
+
+def test_close(tmp_path):
+    path = str(tmp_path / "graph.snapshot")
+    fixture_graph().to_snapshot(path)
+    snapshot = SnapshotGraph(path)
+    snapshot.close()
+    assert snapshot.columns == {}
+    with pytest.raises(RuntimeError, match="can.t be refreshed"):
+        snapshot.fetch_tasks()
+
+
+def test_not_a_snapshot(tmp_path):
+    path = tmp_path / "graph.json"
+    path.write_text("[]" * 10)
+    with pytest.raises(ValueError):
+        open_snapshot(str(path))
@@ -0,0 +1,25 @@
+from taskhuddler.graph import TaskGraph
+from taskhuddler.synthetic import artifact_content, generate_task_group
+
+
+def test_generate_task_group():
+    group = generate_task_group(task_count=50, runs_per_task=2, fanout=4, artifact_count=3, seed=1)
+    graph = TaskGraph.from_data(group["groupid"], group["tasks"])
+    assert len(graph.tasks()) == 50
+    task_ids = [task.taskId for task in graph.tasks()]
+    assert len(set(task_ids)) == 50
+    for index, task in enumerate(graph.tasks()):
+        assert len(task.status.runs) == 2
+        assert len(task.task.dependencies) <= 4
+        assert set(task.task.dependencies) <= set(task_ids[:index])
+        assert len(group["artifacts"][task.taskId]) == 4
+    assert graph.earliest_start_time < graph.latest_finished_time
+
+
+def test_generate_task_group_is_deterministic():
+    assert generate_task_group(task_count=10, seed=3) == generate_task_group(task_count=10, seed=3)
+
+
+def test_artifact_content():
+    assert artifact_content("abc", "public/build/artifact-0.json", size=10).startswith('{"taskId": "abc"')
+    assert len(artifact_content("abc", "public/logs/live_backing.log", size=1000)) > 900
@@ -3,12 +3,17 @@
 import datetime
 import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
 from unittest.mock import patch
 
 import dateutil.parser
 import pytest
 import taskcluster
-from taskhuddler.task import Task, TaskDefinition, TaskStatus
+from taskhuddler.fakequeue import FakeQueue
+from taskhuddler.task import SingleFlight, Task, TaskDefinition, TaskStatus
 
 
 def mocked_status(dummy, task_id):
@@ -226,3 +231,63 @@ def test_task_definition_json_view():
     result = asdict(taskdef)
     del result["taskId"]
     assert result == taskdef_json
+
+
+@pytest.fixture
+def fake(serve_queue):
+    return serve_queue(FakeQueue(latency=0.05).add_synthetic(task_count=2, artifact_count=3))
+
+
+def test_concurrent_artifacts_single_flight(fake):
+    task = Task.from_dict(fake.tasks[list(fake.tasks)[0]])
+    copies = [task, task, Task.from_dict(asdict(task)), Task.from_dict(asdict(task))]
+    barrier = threading.Barrier(len(copies))
+
+    def list_artifacts(copy):
+        barrier.wait()
+        return copy.artifacts()
+
+    with ThreadPoolExecutor(max_workers=len(copies)) as pool:
+        listings = list(pool.map(list_artifacts, copies))
+    assert fake.calls["listArtifacts"] == 1
+    assert all(listing is listings[0] for listing in listings)
+    assert len(listings[0]) == 4
+
+
+def test_fetch_leaves_artifact_unchanged(fake):
+    task = Task.from_dict(fake.tasks[list(fake.tasks)[0]])
+    artifact = task.artifacts()[0]
+    before = asdict(artifact)
+    artifact.fetch()
+    assert asdict(artifact) == before
+    assert not hasattr(artifact, "queue")
+
+
+def test_single_flight_shares_errors():
+    flight = SingleFlight()
+    started, joining, release = threading.Event(), threading.Event(), threading.Event()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        started.set()
+        assert release.wait(timeout=10)
+        raise ValueError("boom")
+
+    def follow():
+        assert started.wait(timeout=10)
+        joining.set()
+        return flight.do("key", failing)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, "key", failing)
+        follower = pool.submit(follow)
+        assert joining.wait(timeout=10)
+        # Give the follower time to wait on the running call.
+        time.sleep(0.1)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result(timeout=10)
+    assert calls == [1]
+    assert flight.do("key", lambda: 5) == 5
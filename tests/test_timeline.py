@@ -0,0 +1,60 @@
+import datetime
+
+import pytest
+from taskhuddler.graph import TaskGraph
+from taskhuddler.synthetic import generate_task_group
+from taskhuddler.timeline import build_timelines, graphs_timelines
+from taskhuddler.utils import parse_datetime
+
+
+def make_task(worker_type, runs):
+    entry = generate_task_group(task_count=1)["tasks"][0]
+    entry["status"]["workerType"] = worker_type
+    entry["status"]["runs"] = [
+        {"runId": run_id, "state": "completed", "scheduled": scheduled, "started": started, "resolved": resolved}
+        for run_id, (scheduled, started, resolved) in enumerate(runs)
+    ]
+    return TaskGraph.from_data("group", [entry]).tasklist[0]
+
+
+def ts(minute):
+    return "2020-01-01T00:{:02d}:00.000Z".format(minute)
+
+
+def test_concurrency_and_queue_depth():
+    tasks = [
+        make_task("b-linux", [(ts(0), ts(1), ts(10))]),
+        make_task("b-linux", [(ts(0), ts(5), ts(8))]),
+        make_task("b-linux", [(ts(2), None, None)]),
+        make_task("t-win", [(ts(3), ts(4), ts(6))]),
+    ]
+    timelines = build_timelines(tasks)
+    linux = timelines["b-linux"]
+    assert linux.peak_running == 2
+    assert linux.peak_queued == 2
+    assert linux.peak_running_time == parse_datetime(ts(5))
+    assert linux.at(parse_datetime(ts(0))) == (0, 2)
+    assert linux.at(parse_datetime(ts(6))) == (2, 1)
+    assert linux.at(parse_datetime(ts(11))) == (0, 1)
+    assert linux.at(parse_datetime("2019-01-01T00:00:00.000Z")) == (0, 0)
+    assert linux.busy_time() == datetime.timedelta(minutes=9)
+    assert timelines["t-win"].to_dict()["running"] == [0, 1, 0]
+
+
+def test_unchanged_steps_are_dropped():
+    tasks = [make_task("b-linux", [(ts(0), ts(1), ts(2))]), make_task("b-linux", [(ts(1), ts(1), ts(2))])]
+    timeline = build_timelines(tasks)["b-linux"]
+    assert timeline.running == [0, 2, 0]
+    assert timeline.queued == [1, 0, 0]
+
+
+@pytest.mark.parametrize("task_count", [200])
+def test_synthetic_graphs(task_count):
+    group = generate_task_group(task_count=task_count, runs_per_task=2)
+    graph = TaskGraph.from_data(group["groupid"], group["tasks"])
+    timelines = graphs_timelines([graph, graph])
+    single = graph.concurrency_timelines()
+    for worker_type, timeline in timelines.items():
+        assert timeline.peak_running == 2 * single[worker_type].peak_running
+        assert timeline.running[-1] == 0
+        assert timeline.queued[-1] == 0
@@ -0,0 +1,80 @@
+import json
+import os
+import random
+
+import pytest
+from taskhuddler.graph import TaskGraph
+from taskhuddler.timings import QuantileSketch, TimingAnalyzer, label_prefix
+
+DATA_FILES = ["completed.json", "continuation1.json", "continuation2.json", "failed.json", "unscheduled.json"]
+
+
+def get_graph():
+    tasks = list()
+    for filename in DATA_FILES:
+        with open(os.path.join(os.path.dirname(__file__), "data", filename)) as f:
+            tasks.extend(json.loads(f.read())["tasks"])
+    return TaskGraph.from_data("eShtp2faQgy4iZZOIhXvhw", tasks)
+
+
+def exact_quantile(values, q):
+    return sorted(values)[int(q * (len(values) - 1))]
+
+
+@pytest.mark.parametrize("q", [0.5, 0.9, 0.99])
+def test_sketch_relative_accuracy(q):
+    rng = random.Random(1)
+    values = [rng.lognormvariate(5, 1.5) for _ in range(5000)]
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+    assert sketch.quantile(q) == pytest.approx(exact_quantile(values, q), rel=0.02)
+    assert sketch.count == 5000
+    assert sketch.mean == pytest.approx(sum(values) / 5000)
+
+
+def test_sketch_merge():
+    whole, first, second = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for value in range(1, 1001):
+        whole.add(value)
+        (first if value % 2 else second).add(value)
+    assert first.merge(second).to_dict() == whole.to_dict()
+    with pytest.raises(ValueError):
+        QuantileSketch(0.01).merge(QuantileSketch(0.05))
+
+
+def test_sketch_empty_and_zero():
+    sketch = QuantileSketch()
+    assert sketch.quantile(0.5) is None
+    sketch.add(0.0)
+    assert sketch.quantile(0.5) == 0.0
+
+
+def test_label_prefix():
+    assert label_prefix("repackage-signing-ms-win32-nightly/opt") == "repackage-signing"
+    assert label_prefix("test-windows10-64-nightly/opt-web-platform-tests-e10s-3", parts=3) == "test-windows10-64"
+
+
+def test_analyzer_graph():
+    results = get_graph().timing_analyzer(group_by=("kind", "worker_type")).results()
+    test = results[("test", "gecko-t-win10-64")]
+    assert test["run_time"]["count"] == 1
+    assert test["run_time"]["p50"] == pytest.approx(852.561, rel=0.01)
+    assert test["queue_wait"]["p50"] == pytest.approx(0.65, rel=0.01)
+    assert ("nightly-l10n", "gecko-3-b-linux") in results
+
+
+def test_analyzer_state_and_merge():
+    graph = get_graph()
+    whole = TimingAnalyzer(group_by=("kind", "state")).add_graph(graph)
+    first = TimingAnalyzer(group_by=("kind", "state")).add_tasks(graph.tasklist[:3])
+    second = TimingAnalyzer(group_by=("kind", "state")).add_tasks(graph.tasklist[3:])
+    assert first.merge(second).results() == whole.results()
+    assert {row["state"] for row in whole.rows()} == {"completed", "failed"}
+    with pytest.raises(ValueError):
+        whole.merge(TimingAnalyzer())
+
+
+def test_analyzer_unknown_key():
+    with pytest.raises(ValueError):
+        TimingAnalyzer(group_by=("colour",))
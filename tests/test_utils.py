@@ -23,6 +23,8 @@ Range = utils.Range
             Range(start=parse("2017-06-10 10:50:00"), end=parse("2017-06-11 10:10:00")),
             False,
         ),
+        (Range(start=datetime(2017, 1, 10), end=datetime(2017, 5, 10)), Range(start=datetime(2017, 1, 10), end=datetime(2017, 5, 10)), True),
+        (Range(start=datetime(2017, 1, 10), end=datetime(2017, 5, 10)), Range(start=datetime(2017, 5, 10), end=datetime(2017, 9, 10)), True),
     ),
 )
 def test_should_merge(r1, r2, expected):
@@ -73,7 +75,16 @@ def test_merge_dates_bad_args(r1, r2):
                 Range(start=datetime(2017, 5, 14), end=datetime(2017, 6, 29)),
             ],
             [Range(start=datetime(2017, 1, 15), end=datetime(2017, 2, 25)), Range(start=datetime(2017, 5, 1), end=datetime(2017, 6, 29))],
-        )
+        ),
+        (
+            [
+                Range(start=datetime(2017, 1, 15), end=datetime(2017, 2, 15)),
+                Range(start=datetime(2017, 1, 15), end=datetime(2017, 2, 15)),
+                Range(start=datetime(2017, 2, 15), end=datetime(2017, 3, 1)),
+                Range(start=datetime(2017, 4, 1), end=datetime(2017, 4, 2)),
+            ],
+            [Range(start=datetime(2017, 1, 15), end=datetime(2017, 3, 1)), Range(start=datetime(2017, 4, 1), end=datetime(2017, 4, 2))],
+        ),
     ],
 )
 def test_merge_date_list(dt_list, expected):